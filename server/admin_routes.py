@@ -1,47 +1,69 @@
-from flask import jsonify, request
-from flask_jwt_extended import jwt_required
-import threading
+from flask import jsonify, request, Response
+from flask_jwt_extended import jwt_required, verify_jwt_in_request
+import hmac
 import logging
-from data_collector import collect_data_for_target
+from config import Config
+from instrumentation import registry
+from collection_scheduler import scheduler
+from analysis_queue import count_pending_analyses, count_pending_analyses_by_repository
 
 logger = logging.getLogger(__name__)
 
-data_collection_status = {"is_running": False, "last_run": None, "message": "Процесс не запускался"}
-
-def run_collection_wrapper(params):
-    data_collection_status["is_running"] = True
-    data_collection_status["message"] = "Процесс сбора данных запущен..."
-    logger.info("Процесс сбора данных запущен с параметрами: %s", params)
-    try:
-        result_message = collect_data_for_target(**params)
-        data_collection_status["last_run"] = "успешно"
-        data_collection_status["message"] = result_message
-    except Exception as e:
-        logger.error(f"Процесс сбора данных завершился с ошибкой: {e}", exc_info=True)
-        data_collection_status["last_run"] = "с ошибкой"
-        data_collection_status["message"] = f"Ошибка: {e}"
-    finally:
-        data_collection_status["is_running"] = False
-        logger.info("Процесс сбора данных завершен.")
+def _collection_status():
+    jobs = scheduler.jobs()
+    pending_by_repository = count_pending_analyses_by_repository()
+    active = [job for job in jobs if job.status in ('queued', 'running')]
+    last = scheduler.last_finished
+
+    if active:
+        message = f"Выполняется задач сбора: {sum(1 for job in active if job.status == 'running')}, в очереди: {sum(1 for job in active if job.status == 'queued')}"
+    elif last is not None:
+        message = last.message
+    else:
+        message = "Процесс не запускался"
+
+    return {
+        "is_running": bool(active),
+        "last_run": None if last is None else ("с ошибкой" if last.status == 'failed' else "успешно"),
+        "message": message,
+        "llm_pending": count_pending_analyses(),
+        "jobs": [
+            job.to_dict(pending_by_repository.get(job.progress.repository_id, 0) if job.progress.repository_id else None)
+            for job in reversed(jobs)
+        ],
+    }
 
 def register_admin_routes(app):
     @app.route('/api/admin/start-collection', methods=['POST'])
     @jwt_required()
     def start_collection():
-        if data_collection_status["is_running"]:
-            return jsonify({"message": "Процесс сбора данных уже запущен."}), 409
-        
+        # Принимает одну цель (поля в корне запроса) или список targets с общими учетными данными.
+        # Цели, уже покрытые активной задачей, не запускаются повторно
         data = request.get_json()
         if not data or 'sfera_username' not in data or 'sfera_password' not in data:
             return jsonify({"message": "Не предоставлены учетные данные Sfera"}), 400
-        
-        thread = threading.Thread(target=run_collection_wrapper, args=(data,), name="data_collector_thread")
-        thread.daemon = True
-        thread.start()
-        
-        return jsonify({"message": "Процесс анализа данных запущен в фоновом режиме."}), 202
+
+        try:
+            jobs = scheduler.submit(data)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+        return jsonify({
+            "message": "Процесс анализа данных запущен в фоновом режиме.",
+            "jobs": [job.id for job in jobs],
+        }), 202
 
     @app.route('/api/admin/collection-status', methods=['GET'])
     @jwt_required()
     def get_collection_status():
-        return jsonify(data_collection_status), 200
\ No newline at end of file
+        return jsonify(_collection_status()), 200
+
+    @app.route('/api/admin/metrics', methods=['GET'])
+    def get_metrics():
+        # Для сборщика Prometheus: принимает статический METRICS_TOKEN либо обычный JWT
+        # compare_digest принимает str только из ASCII, поэтому сравниваются байты: WSGI отдает заголовок
+        # декодированным как latin-1, обратное кодирование возвращает исходные байты запроса
+        token = request.headers.get('Authorization', '').removeprefix('Bearer ').encode('latin-1')
+        if not (Config.METRICS_TOKEN and hmac.compare_digest(token, Config.METRICS_TOKEN.encode('utf-8'))):
+            verify_jwt_in_request()
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
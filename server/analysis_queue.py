@@ -0,0 +1,236 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, or_
+from sqlalchemy.exc import SQLAlchemyError
+from config import Config
+from models import db, Commit, AnalysisJob
+from db_utils import insert_ignore
+import llm_analyzer
+from kpi_calculator import calculate_deterministic_kpi, calculate_final_score
+from llm_cache import evaluation_cache_key, get_cached_evaluation, store_evaluation, evict_lru
+from rollups import add_score_to_rollup
+from response_cache import bump_generation
+
+logger = logging.getLogger(__name__)
+
+_worker_lock = threading.Lock()
+_worker_thread = None
+_wakeup = threading.Event()
+_resumed = False
+
+EVALUATION_COLUMNS = (
+    'llm_score_size', 'llm_score_quality', 'llm_score_complexity', 'llm_score_comment',
+    'llm_total_score', 'llm_evaluation_text', 'final_commit_score',
+)
+
+def evaluation_columns(added_lines, deleted_lines, analysis_result):
+    scores = analysis_result["scores"]
+    deterministic_kpi = calculate_deterministic_kpi(added_lines or 0, deleted_lines or 0)
+    return {
+        'llm_score_size': scores.get('size'),
+        'llm_score_quality': scores.get('quality'),
+        'llm_score_complexity': scores.get('complexity'),
+        'llm_score_comment': scores.get('comment'),
+        'llm_total_score': scores.get('sum'),
+        'llm_evaluation_text': analysis_result.get("raw_text"),
+        'final_commit_score': calculate_final_score(deterministic_kpi, scores),
+    }
+
+def enqueue_analysis(shas):
+    # Вызывается в транзакции сохранения коммитов: коммит и его задача фиксируются вместе
+    now = datetime.now(timezone.utc)
+    rows = [{'commit_sha': sha, 'status': 'pending', 'attempts': 0, 'next_attempt_at': now, 'created_at': now} for sha in shas]
+    return insert_ignore(AnalysisJob, rows, index_elements=['commit_sha'])
+
+def count_pending_analyses():
+    return db.session.query(AnalysisJob).filter(AnalysisJob.status.in_(('pending', 'running'))).count()
+
+def count_pending_analyses_by_repository():
+    rows = db.session.query(Commit.repository_id, func.count(AnalysisJob.commit_sha))\
+        .join(Commit, Commit.sha == AnalysisJob.commit_sha)\
+        .filter(AnalysisJob.status.in_(('pending', 'running')))\
+        .group_by(Commit.repository_id).all()
+    return dict(rows)
+
+def recover_interrupted_jobs():
+    # Задачи, зависшие в running после перезапуска или падения процесса, возвращаются в очередь
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=Config.LLM_ANALYSIS_LOCK_TIMEOUT)
+    recovered = db.session.query(AnalysisJob).filter(
+        AnalysisJob.status == 'running',
+        or_(AnalysisJob.locked_at.is_(None), AnalysisJob.locked_at < stale_before),
+    ).update({'status': 'pending', 'locked_at': None}, synchronize_session=False)
+    db.session.commit()
+    if recovered:
+        logger.info(f"Возвращено в очередь LLM-анализа задач: {recovered}")
+    return recovered
+
+def _claim_jobs(limit):
+    now = datetime.now(timezone.utc)
+    jobs = db.session.query(AnalysisJob).filter(
+        AnalysisJob.status == 'pending',
+        or_(AnalysisJob.next_attempt_at.is_(None), AnalysisJob.next_attempt_at <= now),
+    ).order_by(AnalysisJob.created_at).limit(limit).with_for_update(skip_locked=True).all()
+    for job in jobs:
+        job.status = 'running'
+        job.locked_at = now
+        job.attempts += 1
+    db.session.commit()
+    return [job.commit_sha for job in jobs]
+
+def _finish_job(job, error=None):
+    if error is None:
+        job.status = 'done'
+        job.last_error = None
+    elif job.attempts >= Config.LLM_ANALYSIS_MAX_ATTEMPTS:
+        job.status = 'failed'
+        job.last_error = error
+        logger.error(f"LLM-анализ коммита {job.commit_sha[:7]} не удался после {job.attempts} попыток: {error}")
+    else:
+        job.status = 'pending'
+        job.last_error = error
+        delay = Config.LLM_ANALYSIS_RETRY_DELAY * (2 ** (job.attempts - 1))
+        job.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+    job.locked_at = None
+
+def _analyze_job(app, sha):
+    with app.app_context():
+        try:
+            job = db.session.get(AnalysisJob, sha)
+            commit = db.session.get(Commit, sha)
+            if job is None:
+                return 'skipped'
+            if commit is None or commit.commit_content is None:
+                job.status = 'failed'
+                job.last_error = "Коммит или его diff не найден"
+                job.locked_at = None
+                db.session.commit()
+                return job.status
+
+            cache_key = evaluation_cache_key(commit.commit_content, commit.message)
+            # Сборщик уже искал оценку этого коммита в кэше, повторная проверка в статистику не идет
+            analysis_result = get_cached_evaluation(cache_key, record=False)
+            if analysis_result is None:
+                analysis_result = llm_analyzer.analyze_commit_code(commit.commit_content, commit.message)
+                if not (analysis_result or {}).get("scores"):
+                    _finish_job(job, error="GigaChat не вернул оценку")
+                    db.session.commit()
+                    return job.status
+                store_evaluation(cache_key, analysis_result)
+
+            old_score = commit.final_commit_score
+            for column, value in evaluation_columns(commit.added_lines, commit.deleted_lines, analysis_result).items():
+                setattr(commit, column, value)
+            add_score_to_rollup(commit, old_score, commit.final_commit_score)
+
+            _finish_job(job)
+            db.session.commit()
+            bump_generation()
+            logger.info(f"Коммит {sha[:7]} успешно проанализирован.")
+            return 'done'
+        except Exception as e:
+            logger.error(f"Ошибка во время LLM-анализа коммита {sha[:7]}: {e}", exc_info=True)
+            db.session.rollback()
+            job = db.session.get(AnalysisJob, sha)
+            if job is not None:
+                _finish_job(job, error=str(e))
+                db.session.commit()
+            return 'error'
+        finally:
+            db.session.remove()
+
+def drain_pending_analyses(app, max_workers=None):
+    if not llm_analyzer.giga:
+        logger.warning("GigaChat не настроен, задачи LLM-анализа остаются в очереди.")
+        return {}
+
+    max_workers = max_workers or Config.LLM_ANALYSIS_WORKERS
+    results = {}
+    with app.app_context():
+        recover_interrupted_jobs()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm_analysis") as executor:
+        # Задачи забираются по мере освобождения потоков, чтобы один медленный ответ не держал всю пачку
+        in_flight = set()
+        while True:
+            free_slots = 2 * max_workers - len(in_flight)
+            if free_slots > 0:
+                with app.app_context():
+                    shas = _claim_jobs(free_slots)
+                    db.session.remove()
+                in_flight.update(executor.submit(_analyze_job, app, sha) for sha in shas)
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                status = future.result()
+                results[status] = results.get(status, 0) + 1
+    with app.app_context():
+        evict_lru()
+    logger.info(f"Очередь LLM-анализа обработана: {results}")
+    return results
+
+def _next_retry_delay(app):
+    # Через сколько секунд появится работа: отложенный повтор или истекшая блокировка чужой задачи
+    with app.app_context():
+        next_attempt_at = db.session.query(func.min(AnalysisJob.next_attempt_at)).filter(AnalysisJob.status == 'pending').scalar()
+        oldest_lock = db.session.query(func.min(AnalysisJob.locked_at)).filter(AnalysisJob.status == 'running').scalar()
+        db.session.remove()
+    candidates = []
+    if next_attempt_at is not None:
+        candidates.append(next_attempt_at)
+    if oldest_lock is not None:
+        candidates.append(oldest_lock + timedelta(seconds=Config.LLM_ANALYSIS_LOCK_TIMEOUT))
+    if not candidates:
+        return None
+    now = datetime.now(timezone.utc)
+    return max(0.0, min(((c if c.tzinfo else c.replace(tzinfo=timezone.utc)) - now).total_seconds() for c in candidates))
+
+def resume_analysis_queue(app):
+    # Вызывается один раз на процесс: после перезапуска продолжает разбор оставшейся очереди
+    global _resumed
+    with _worker_lock:
+        if _resumed:
+            return
+        _resumed = True
+    try:
+        with app.app_context():
+            recover_interrupted_jobs()
+            pending = count_pending_analyses()
+    except SQLAlchemyError as e:
+        logger.warning(f"Не удалось восстановить очередь LLM-анализа: {e}")
+        return
+    if pending:
+        logger.info(f"В очереди LLM-анализа {pending} задач, запускаем обработчик.")
+        start_analysis_worker(app)
+
+def start_analysis_worker(app):
+    # Один фоновый поток на процесс; пока он жив, новые задачи подхватываются им же
+    global _worker_thread
+    if not llm_analyzer.giga:
+        return False
+    with _worker_lock:
+        _wakeup.set()
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return False
+        _worker_thread = threading.Thread(target=_run_worker, args=(app,), name="llm_analysis_worker", daemon=True)
+        _worker_thread.start()
+        return True
+
+def _run_worker(app):
+    global _worker_thread
+    while True:
+        _wakeup.clear()
+        try:
+            drain_pending_analyses(app)
+            retry_delay = _next_retry_delay(app)
+        except Exception as e:
+            logger.error(f"Фоновый обработчик LLM-анализа завершился с ошибкой: {e}", exc_info=True)
+            retry_delay = Config.LLM_ANALYSIS_RETRY_DELAY
+        if retry_delay is not None:
+            _wakeup.wait(timeout=retry_delay)
+            continue
+        with _worker_lock:
+            if not _wakeup.is_set():
+                _worker_thread = None
+                return
@@ -12,11 +12,14 @@ from auth_routes import register_auth_routes
 from admin_routes import register_admin_routes
 from sfera_routes import register_sfera_routes
 from metrics_routes import register_metrics_routes
+from cli import register_cli_commands
+from profiling import init_profiling
+from analysis_queue import resume_analysis_queue
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
-CORS(app, resources={r"/api/*": {"origins": Config.CORS_ORIGINS}}, supports_credentials=True)
+CORS(app, resources={r"/api/*": {"origins": Config.CORS_ORIGINS}}, supports_credentials=True, expose_headers=['X-Next-Cursor', 'Server-Timing'])
 db.init_app(app)
 bcrypt.init_app(app)
 jwt = JWTManager(app)
@@ -38,6 +41,14 @@ register_auth_routes(app)
 register_admin_routes(app)
 register_sfera_routes(app)
 register_metrics_routes(app)
+register_cli_commands(app)
+init_profiling(app)
+
+
+@app.before_request
+def resume_background_jobs():
+    if Config.LLM_ANALYSIS_AUTOSTART:
+        resume_analysis_queue(app)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,47 @@
+import logging
+from sqlalchemy import select
+from models import db, Author, Commit
+from db_utils import chunked, insert_ignore
+
+logger = logging.getLogger(__name__)
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+def resolve_author_ids(names_by_email, known=None):
+    # Заводит недостающих авторов и возвращает словарь email -> id; known служит кэшем между вызовами
+    known = {} if known is None else known
+    missing = [email for email in names_by_email if email not in known]
+    if missing:
+        insert_ignore(Author, [{'email': email, 'name': names_by_email[email]} for email in missing], index_elements=['email'])
+        for chunk in chunked(missing, 500):
+            for author_id, email in db.session.execute(select(Author.id, Author.email).where(Author.email.in_(chunk))):
+                known[email] = author_id
+    return known
+
+def backfill_commit_authors(batch_size=1000):
+    # Проставляет author_id коммитам, сохраненным до появления таблицы авторов
+    author_ids = {}
+    updated = 0
+    last_sha = ''
+    while True:
+        rows = db.session.execute(
+            select(Commit.sha, Commit.author_email, Commit.author_name)
+            .where(Commit.author_id.is_(None), Commit.sha > last_sha)
+            .order_by(Commit.sha)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_sha = rows[-1][0]
+        names_by_email = {normalize_email(email): name for _, email, name in rows}
+        resolve_author_ids(names_by_email, author_ids)
+        mappings = [
+            {'sha': sha, 'author_id': author_ids[normalize_email(email)]}
+            for sha, email, _ in rows if normalize_email(email) in author_ids
+        ]
+        db.session.bulk_update_mappings(Commit, mappings)
+        db.session.commit()
+        updated += len(mappings)
+        logger.info(f"Проставлены авторы для {updated} коммитов")
+    return updated
@@ -0,0 +1,173 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.request import urlopen
+from benchmarks.common import peak_rss_kb, report_header, write_report
+from benchmarks.stub_servers import add_stub_arguments
+
+# Сквозной замер сбора данных: collect_data_for_target против локальных заглушек Sfera и GigaChat.
+# Заглушки работают в отдельном процессе, чтобы не делить GIL и память с измеряемым сборщиком.
+# Запуск из папки server/:
+#   python -m benchmarks.bench_ingestion --database-url sqlite:///bench_ingest.db --reset --commits 2000 --output ingest.json
+# Отчет: коммитов в секунду, запросов к Sfera и GigaChat на коммит, пиковый RSS процесса сборщика.
+
+STUB_OPTIONS = (
+    'projects', 'repos', 'branches', 'commits', 'feature_commits', 'latency_ms', 'jitter_ms', 'error_rate',
+    'throttle_rate', 'retry_after', 'llm_latency_ms', 'llm_jitter_ms', 'llm_error_rate', 'llm_throttle_rate', 'seed',
+)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Замер сбора данных на заглушках Sfera и GigaChat")
+    parser.add_argument('--database-url', default=os.getenv('BENCH_DATABASE_URL', 'sqlite:///bench_ingest.db'),
+                        help='SQLite или локальный PostgreSQL; рабочую базу указывать не следует')
+    parser.add_argument('--reset', action='store_true', help='Пересоздать таблицы перед замером')
+    parser.add_argument('--branch', default='main', help="Ветка для сбора; 'all' - все ветки репозитория")
+    parser.add_argument('--ingestion-mode', choices=('threads', 'async'), default=None)
+    parser.add_argument('--no-llm', action='store_true', help='Не подключать GigaChat: замеряется только загрузка коммитов')
+    parser.add_argument('--llm-timeout', type=float, default=600, help='Сколько ждать опустошения очереди LLM-анализа, секунды')
+    parser.add_argument('--output', help='Файл для JSON-результата; по умолчанию stdout')
+    add_stub_arguments(parser)
+    return parser.parse_args()
+
+def start_stub_process(args):
+    command = [sys.executable, '-m', 'benchmarks.stub_servers']
+    for option in STUB_OPTIONS:
+        command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    line = process.stdout.readline()
+    if not line:
+        process.kill()
+        sys.exit("Заглушки не запустились")
+    return process, json.loads(line)
+
+def stub_stats(base_url):
+    with urlopen(base_url.rstrip('/') + '/__stats', timeout=10) as response:
+        return json.loads(response.read())
+
+def _configure_environment(args, stubs):
+    # Config и llm_analyzer читают окружение при импорте, поэтому переменные задаются до импорта приложения.
+    # Повторы LLM-анализа ускорены, иначе при заданной доле ошибок GigaChat замер ждал бы минутами
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['SFERA_BASE_URL'] = stubs['sfera_base_url']
+    os.environ['LLM_ANALYSIS_AUTOSTART'] = 'false'
+    os.environ.setdefault('LLM_ANALYSIS_RETRY_DELAY', '0.2')
+    os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+    # Лог приложения пишется во временный каталог, а не в рабочую директорию
+    os.environ.setdefault('LOG_FILE', os.path.join(tempfile.gettempdir(), 'sphere-reporter-bench.log'))
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-that-is-long-enough')
+    if args.no_llm:
+        os.environ.pop('GIGACHAT_CREDENTIALS', None)
+    else:
+        os.environ['GIGACHAT_CREDENTIALS'] = 'c3R1YjpzdHVi'
+        os.environ['GIGACHAT_BASE_URL'] = stubs['gigachat_base_url']
+        os.environ['GIGACHAT_AUTH_URL'] = stubs['gigachat_auth_url']
+
+def _per_commit(value, commits):
+    return round(value / commits, 3) if commits else None
+
+def _wait_for_analysis(timeout):
+    from models import db
+    from analysis_queue import count_pending_analyses
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        pending = count_pending_analyses()
+        db.session.remove()
+        if not pending:
+            return 0
+        time.sleep(0.2)
+    return pending
+
+def main():
+    args = parse_args()
+    process, stubs = start_stub_process(args)
+    try:
+        _configure_environment(args, stubs)
+        from app import app
+        from models import db, Commit, AnalysisJob
+        from data_collector import collect_data_for_target, CollectionProgress
+        from instrumentation import registry
+
+        logging.getLogger('benchmarks').setLevel(logging.INFO)
+        report = report_header(args)
+        report['stub_commits_available'] = stubs['total_commits']
+        options = {'ingestion_mode': args.ingestion_mode} if args.ingestion_mode else {}
+
+        with app.app_context():
+            if args.reset:
+                db.drop_all()
+            db.create_all()
+            report['database'] = db.engine.dialect.name
+            commits_before = db.session.query(Commit).count()
+            db.session.remove()
+
+        started = time.perf_counter()
+        targets = []
+        for project_key in stubs['projects']:
+            for repo_name in stubs['repos']:
+                progress = CollectionProgress()
+                message = collect_data_for_target(
+                    'bench', 'bench', project_key, repo_name, args.branch, '2000-01-01T00:00:00Z', '2100-01-01T00:00:00Z',
+                    progress=progress, **options,
+                )
+                targets.append({'project_key': project_key, 'repo_name': repo_name, 'message': message,
+                                'pages': progress.pages, 'found': progress.found, 'saved': progress.saved,
+                                'failed': progress.failed, 'error': progress.error})
+        collection_seconds = time.perf_counter() - started
+        saved = sum(target['saved'] for target in targets)
+        sfera = stub_stats(stubs['sfera_base_url'])
+        sfera_requests = sum(value for key, value in sfera.items() if ':' not in key)
+
+        report['collection'] = {
+            'seconds': round(collection_seconds, 3),
+            'commits_saved': saved,
+            'commits_failed': sum(target['failed'] for target in targets),
+            'commits_per_second': round(saved / collection_seconds, 2) if collection_seconds else None,
+            'sfera_requests': sfera_requests,
+            'sfera_requests_per_commit': _per_commit(sfera_requests, saved),
+            'sfera_requests_by_endpoint': sfera,
+            'targets': targets,
+        }
+
+        if not args.no_llm:
+            # Очередь LLM-анализа разбирается фоновым обработчиком, запущенным сборщиком во время записи пачек
+            with app.app_context():
+                left = _wait_for_analysis(args.llm_timeout)
+                analysis = dict(db.session.query(AnalysisJob.status, db.func.count()).group_by(AnalysisJob.status).all())
+                db.session.remove()
+            total_seconds = time.perf_counter() - started
+            gigachat = stub_stats(stubs['gigachat_base_url'])
+            analyzed = analysis.get('done', 0)
+            report['analysis'] = {
+                'seconds_after_collection': round(total_seconds - collection_seconds, 3),
+                'end_to_end_seconds': round(total_seconds, 3),
+                'jobs_by_status': analysis,
+                'jobs_left_pending': left,
+                'commits_analyzed': analyzed,
+                'analyzed_per_second': round(analyzed / total_seconds, 2) if total_seconds else None,
+                'gigachat_requests': gigachat.get('chat', 0),
+                'gigachat_requests_per_commit': _per_commit(gigachat.get('chat', 0), analyzed),
+                'gigachat_requests_by_endpoint': gigachat,
+            }
+
+        report['commits_before'] = commits_before
+        report['peak_rss_kb'] = peak_rss_kb()
+        # Гистограммы этапов из instrumentation: где именно уходит время сбора
+        report['stage_metrics'] = [
+            line for line in registry.render().splitlines()
+            if line.startswith(('collector_', 'sfera_request_retries', 'llm_', 'cache_lookups')) and '_bucket' not in line
+        ]
+        write_report(report, args.output)
+        print(f"Сбор: {saved} коммитов за {collection_seconds:.1f} с, {report['collection']['commits_per_second']} коммитов/с, "
+              f"{report['collection']['sfera_requests_per_commit']} запросов к Sfera на коммит, пиковый RSS {report['peak_rss_kb']} КБ",
+              file=sys.stderr)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+if __name__ == '__main__':
+    main()
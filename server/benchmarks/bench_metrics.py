@@ -0,0 +1,206 @@
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from benchmarks.common import peak_rss_kb, report_header, write_report
+
+# Бенчмарк эндпоинтов /api/data/commits, dashboard_stats и user_summary на синтетических данных.
+# Запуск из папки server/:
+#   python -m benchmarks.bench_metrics --database-url sqlite:///bench.db --generate --commits 1000000 --output bench.json
+# Результат - JSON с p50/p90/p99, числом SQL-запросов и пиком выделенной памяти по каждому сценарию,
+# его удобно сравнивать между ветками до выкладки изменений схемы и запросов.
+
+DASHBOARD_MAX_QUERIES = 2
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарк эндпоинтов метрик на синтетических данных")
+    parser.add_argument('--database-url', default=os.getenv('BENCH_DATABASE_URL', 'sqlite:///bench.db'),
+                        help='SQLite или локальный PostgreSQL; рабочую базу указывать не следует')
+    parser.add_argument('--generate', action='store_true', help='Сгенерировать данные перед замерами')
+    parser.add_argument('--projects', type=int, default=3)
+    parser.add_argument('--repos-per-project', type=int, default=4)
+    parser.add_argument('--authors', type=int, default=200)
+    parser.add_argument('--commits', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--analyzed-share', type=float, default=0.9, help='Доля коммитов с LLM-оценкой')
+    parser.add_argument('--diff-share', type=float, default=0.0, help='Доля коммитов с сохраненным diff')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=50, help='Запросов на сценарий')
+    parser.add_argument('--warmup', type=int, default=3, help='Прогревочных запросов на сценарий, в замер не входят')
+    parser.add_argument('--only', action='append', default=[], help='Запустить только сценарии с этим префиксом имени')
+    parser.add_argument('--output', help='Файл для JSON-результата; по умолчанию stdout')
+    return parser.parse_args()
+
+def _configure_environment(args):
+    # Config читает окружение при импорте, поэтому переменные задаются до импорта приложения.
+    # Кэш ответов отключен: замеряются сами запросы к БД, а не попадания в кэш
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+    os.environ['LLM_ANALYSIS_AUTOSTART'] = 'false'
+    os.environ['PROFILING_ENABLED'] = 'false'
+    # Лог приложения пишется во временный каталог, а не в рабочую директорию
+    os.environ.setdefault('LOG_FILE', os.path.join(tempfile.gettempdir(), 'sphere-reporter-bench.log'))
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-that-is-long-enough')
+
+class QueryCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def _day_bounds(day):
+    # Так границы периода передает фронтенд: полночь и 23:59:59.999 местного времени в UTC
+    from rollups import REPORT_TZ
+    since = datetime.combine(day, datetime.min.time(), REPORT_TZ)
+    until = since + timedelta(days=1) - timedelta(milliseconds=1)
+    return since.astimezone(timezone.utc).isoformat(), until.astimezone(timezone.utc).isoformat()
+
+def build_scenarios(client, headers):
+    # Набор фильтров, которые реально встречаются в интерфейсе: весь проект, репозиторий, период,
+    # активный автор и автор из длинного хвоста, поиск по префиксу email
+    from sqlalchemy import func
+    from models import db, Commit, Repository, Author
+    from rollups import rollup_day
+
+    project_key, busiest = db.session.query(Commit.project_key, func.count()).group_by(Commit.project_key)\
+        .order_by(func.count().desc()).first()
+    repo_name = db.session.query(Repository.name).filter_by(project_key=project_key).order_by(Repository.name).first()[0]
+    authors = db.session.query(Author.email, func.count(Commit.sha)).join(Commit, Commit.author_id == Author.id)\
+        .filter(Commit.project_key == project_key).group_by(Author.email).order_by(func.count(Commit.sha).desc()).all()
+    top_author, tail_author = authors[0][0], authors[-1][0]
+    last_day = rollup_day(db.session.query(func.max(Commit.commit_date)).scalar())
+    since_30, _ = _day_bounds(last_day - timedelta(days=29))
+    since_90, _ = _day_bounds(last_day - timedelta(days=89))
+    _, until = _day_bounds(last_day)
+
+    first_page = client.get(f'/api/data/commits?project_key={project_key}', headers=headers)
+    cursor = first_page.headers.get('X-Next-Cursor', '')
+
+    project = {'project_key': project_key}
+    period_30 = {**project, 'since': since_30, 'until': until}
+    period_90 = {**project, 'since': since_90, 'until': until}
+    scenarios = [
+        ('commits.project', '/api/data/commits', project),
+        ('commits.project_next_page', '/api/data/commits', {**project, 'cursor': cursor}),
+        ('commits.repo_30d', '/api/data/commits', {**period_30, 'repo_name': repo_name}),
+        ('commits.top_author_90d', '/api/data/commits', {**period_90, 'author_email': top_author}),
+        ('commits.author_prefix', '/api/data/commits', {**project, 'author_email': top_author.split('@')[0], 'author_match': 'prefix'}),
+        ('dashboard.project', '/api/metrics/dashboard_stats', project),
+        ('dashboard.project_30d', '/api/metrics/dashboard_stats', period_30),
+        ('dashboard.repo_90d', '/api/metrics/dashboard_stats', {**period_90, 'repo_name': repo_name}),
+        ('dashboard.top_author_90d', '/api/metrics/dashboard_stats', {**period_90, 'author_email': top_author}),
+        ('user_summary.top_author', '/api/metrics/user_summary', {**project, 'author_email': top_author}),
+        ('user_summary.top_author_30d', '/api/metrics/user_summary', {**period_30, 'author_email': top_author}),
+        ('user_summary.tail_author', '/api/metrics/user_summary', {**project, 'author_email': tail_author}),
+    ]
+    context = {'project_key': project_key, 'project_commits': busiest, 'repo_name': repo_name,
+               'top_author': top_author, 'tail_author': tail_author, 'last_day': last_day.isoformat()}
+    return scenarios, context
+
+def run_scenario(client, headers, counter, path, params, requests, warmup):
+    for _ in range(warmup):
+        client.get(path, query_string=params, headers=headers)
+
+    latencies, queries, sizes = [], [], []
+    status = None
+    for _ in range(requests):
+        before = counter.count
+        started = time.perf_counter()
+        response = client.get(path, query_string=params, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count - before)
+        sizes.append(len(response.get_data()))
+        status = response.status_code
+
+    # Память меряется отдельным запросом: tracemalloc заметно замедляет выполнение и исказил бы задержки
+    tracemalloc.start()
+    client.get(path, query_string=params, headers=headers)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'status': status,
+        'requests': requests,
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p90_ms': round(_percentile(latencies, 90), 3),
+        'p99_ms': round(_percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'max_ms': round(max(latencies), 3),
+        'sql_queries_mean': round(statistics.fmean(queries), 2),
+        'sql_queries_max': max(queries),
+        'response_bytes': sizes[-1],
+        'peak_alloc_kb': round(peak / 1024, 1),
+    }
+
+def main():
+    args = parse_args()
+    _configure_environment(args)
+    from app import app
+    from models import db, Commit
+    from flask_jwt_extended import create_access_token
+    from benchmarks.synthetic_data import generate_dataset
+
+    logging.getLogger('benchmarks').setLevel(logging.INFO)
+    report = report_header(args)
+
+    with app.app_context():
+        db.create_all()
+        report['database'] = db.engine.dialect.name
+        if args.generate:
+            started = time.perf_counter()
+            report['dataset'] = generate_dataset(
+                projects=args.projects, repos_per_project=args.repos_per_project, authors=args.authors,
+                commits=args.commits, days=args.days, analyzed_share=args.analyzed_share,
+                diff_share=args.diff_share, seed=args.seed,
+            )
+            report['dataset']['generation_seconds'] = round(time.perf_counter() - started, 1)
+        report['total_commits'] = db.session.query(Commit).count()
+        if not report['total_commits']:
+            sys.exit("База пуста: запустите с --generate")
+
+        client = app.test_client()
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity='benchmark')}
+        counter = QueryCounter(db.engine)
+        scenarios, report['scenario_context'] = build_scenarios(client, headers)
+        db.session.remove()
+
+        results = []
+        for name, path, params in scenarios:
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            result = {'name': name, 'path': path, 'params': params}
+            result.update(run_scenario(client, headers, counter, path, params, args.requests, args.warmup))
+            results.append(result)
+            print(f"{name:32} p50 {result['p50_ms']:9.2f} мс  p99 {result['p99_ms']:9.2f} мс  SQL {result['sql_queries_max']}", file=sys.stderr)
+        report['results'] = results
+
+    # dashboard_stats должен обходиться одним SQL-запросом (двумя при первом обращении к репозиторию)
+    dashboard = [result for result in results if result['name'].startswith('dashboard.')]
+    report['checks'] = {
+        'dashboard_max_queries': {
+            'limit': DASHBOARD_MAX_QUERIES,
+            'observed': max((result['sql_queries_max'] for result in dashboard), default=None),
+            'passed': all(result['sql_queries_max'] <= DASHBOARD_MAX_QUERIES for result in dashboard),
+        },
+    }
+    report['peak_rss_kb'] = peak_rss_kb()
+
+    write_report(report, args.output)
+    if not report['checks']['dashboard_max_queries']['passed']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
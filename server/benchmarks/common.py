@@ -0,0 +1,39 @@
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def peak_rss_kb():
+    # ru_maxrss в Linux в килобайтах, в macOS в байтах; в Windows модуля resource нет
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def report_header(args):
+    return {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'arguments': {key: value for key, value in vars(args).items() if key != 'output'},
+    }
+
+def write_report(report, path=None):
+    output = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
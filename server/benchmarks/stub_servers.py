@@ -0,0 +1,335 @@
+import argparse
+import base64
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Локальные заглушки API Sfera и GigaChat для офлайн-замеров сбора данных.
+# Отдают те же структуры, что читают SferaAPI и llm_analyzer, с настраиваемой задержкой, разбросом, долей ошибок 5xx и 429.
+# Запуск отдельным процессом из папки server/:
+#   python -m benchmarks.stub_servers --commits 5000 --latency-ms 20
+# первой строкой печатается JSON с адресами для SFERA_BASE_URL, GIGACHAT_BASE_URL и GIGACHAT_AUTH_URL.
+# GET /__stats на любой заглушке возвращает счетчики запросов по эндпоинтам.
+
+AUTHORS = [(f"Разработчик {index}", f"dev{index}@stub.local") for index in range(20)]
+AUTHOR_WEIGHTS = [1.0 / (index + 1) for index in range(len(AUTHORS))]
+
+class FaultProfile:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=0.5):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+
+    def delay(self):
+        delay_ms = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def failure(self):
+        # Возвращает код ответа-сбоя или None
+        roll = random.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, data, status=200, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        parsed = urlparse(self.path)
+        if parsed.path.rstrip('/').endswith('__stats'):
+            return self._send_json(self.server.stub.stats())
+        if method == 'POST':
+            # Тело нужно дочитать, иначе соединение keep-alive не переиспользуется
+            self.request_body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        stub = self.server.stub
+        endpoint = stub.endpoint(method, parsed.path)
+        stub.count(endpoint)
+        stub.faults.delay()
+        status = stub.faults.failure()
+        if status is not None:
+            stub.count(f"{endpoint}:{status}")
+            return self._send_json({"error": "stub failure"}, status, {'Retry-After': str(stub.faults.retry_after)} if status == 429 else None)
+        data = stub.respond(endpoint, parsed.path, parse_qs(parsed.query), self)
+        if data is None:
+            return self._send_json({"error": "not found"}, 404)
+        self._send_json(data)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+class _StubServer:
+    def __init__(self, faults, host='127.0.0.1', port=0):
+        self.faults = faults
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _StubHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.thread = None
+
+    @property
+    def root_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, endpoint):
+        with self._lock:
+            self._counts[endpoint] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name=type(self).__name__, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class SferaStub(_StubServer):
+    # Репозитории с детерминированной историей: ветка main из commits коммитов (новые первыми),
+    # у остальных веток по feature_commits собственных коммитов поверх истории main
+    def __init__(self, faults, projects=1, repos=1, branches=1, commits=1000, feature_commits=20,
+                 files_per_commit=3, interval_minutes=30, seed=42, host='127.0.0.1', port=0):
+        super().__init__(faults, host, port)
+        self.projects = [f"STUB{index + 1}" for index in range(projects)]
+        self.repos = [f"repo-{index + 1}" for index in range(repos)]
+        self.branches = ['main'] + [f"feature-{index}" for index in range(1, branches)]
+        self.commits = commits
+        self.feature_commits = feature_commits
+        self.files_per_commit = files_per_commit
+        self.interval = timedelta(minutes=interval_minutes)
+        self.seed = seed
+        self.end = datetime.now(timezone.utc).replace(microsecond=0)
+
+    @property
+    def base_url(self):
+        return f"{self.root_url}/api/v2/"
+
+    def endpoint(self, method, path):
+        parts = self._parts(path)
+        if parts == ['projects']:
+            return 'projects'
+        if len(parts) == 3 and parts[2] == 'repos':
+            return 'repos'
+        if len(parts) == 5 and parts[4] == 'branches':
+            return 'branches'
+        if len(parts) == 5 and parts[4] == 'commits':
+            return 'commits'
+        if len(parts) == 6 and parts[4] == 'commits':
+            return 'commit_details'
+        if len(parts) == 7 and parts[6] == 'diff':
+            return 'commit_diff'
+        return 'other'
+
+    @staticmethod
+    def _parts(path):
+        parts = path.strip('/').split('/')
+        return parts[parts.index('projects'):] if 'projects' in parts else parts
+
+    def total_commits(self):
+        repositories = len(self.projects) * len(self.repos)
+        return repositories * (self.commits + self.feature_commits * (len(self.branches) - 1))
+
+    def _history_length(self, branch):
+        return self.commits + (self.feature_commits if branch != 'main' else 0)
+
+    def _history_entry(self, project, repo, branch, index):
+        # Собственные коммиты ветки новее общей истории; дата коммита main не зависит от ветки, через которую он получен
+        own = self.feature_commits if branch != 'main' else 0
+        if index < own:
+            return hashlib.sha1(f"{self.seed}/{project}/{repo}/{branch}/{index}".encode()).hexdigest(), index
+        main_index = index - own
+        return hashlib.sha1(f"{self.seed}/{project}/{repo}/main/{main_index}".encode()).hexdigest(), self.feature_commits + main_index
+
+    def _commit(self, sha, position):
+        rng = random.Random(sha)
+        name, email = rng.choices(AUTHORS, weights=AUTHOR_WEIGHTS)[0]
+        return {
+            "hash": sha,
+            "message": f"STUB-{position}: изменение {sha[:7]}\n\nОписание изменения",
+            "author": {"name": name, "email": email},
+            "created_at": (self.end - self.interval * position).isoformat(),
+        }
+
+    def _file_changes(self, sha):
+        rng = random.Random(sha)
+        return [
+            (f"src/module_{rng.randrange(200)}.py", rng.randint(1, 60), rng.randint(0, 20))
+            for _ in range(rng.randint(1, self.files_per_commit))
+        ]
+
+    def _diff(self, sha):
+        # SHA внутри diff делает его уникальным, иначе кэш LLM-оценок исказил бы число обращений к GigaChat
+        parts = []
+        for path, added, deleted in self._file_changes(sha):
+            parts.append(f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -1,{deleted} +1,{added} @@\n")
+            parts.extend(f"-old {sha[:7]} {index}\n" for index in range(deleted))
+            parts.extend(f"+new {sha[:7]} {index}\n" for index in range(added))
+        return ''.join(parts)
+
+    def respond(self, endpoint, path, query, handler):
+        parts = self._parts(path)
+        if endpoint == 'projects':
+            return {"data": [{"key": key, "name": key} for key in self.projects]}
+        if endpoint == 'repos':
+            return {"data": [{"name": repo} for repo in self.repos]} if parts[1] in self.projects else None
+        if endpoint == 'branches':
+            return {"data": [
+                {"name": branch, "last_commit": {"created_at": (self.end + timedelta(minutes=index)).isoformat()}}
+                for index, branch in enumerate(self.branches)
+            ]}
+        if endpoint == 'commits':
+            branch = query.get('rev', ['main'])[0]
+            if branch not in self.branches:
+                return None
+            limit = int(query.get('limit', ['100'])[0])
+            cursor = int(query.get('cursor', ['0'])[0])
+            stop = min(cursor + limit, self._history_length(branch))
+            page = [self._commit(*self._history_entry(parts[1], parts[3], branch, index)) for index in range(cursor, stop)]
+            next_cursor = stop if stop < self._history_length(branch) else None
+            return {"data": page, "page": {"next_cursor": str(next_cursor) if next_cursor else None}}
+        if endpoint == 'commit_details':
+            changes = self._file_changes(parts[5])
+            return {"data": {"hash": parts[5], "stats": {
+                "additions": sum(added for _, added, _ in changes), "deletions": sum(deleted for _, _, deleted in changes),
+            }}}
+        if endpoint == 'commit_diff':
+            return {"data": {"content": base64.b64encode(self._diff(parts[5]).encode('utf-8')).decode('ascii')}}
+        return None
+
+class GigaChatStub(_StubServer):
+    # OAuth-эндпоинт и chat/completions в формате, который разбирает llm_analyzer.parse_evaluation
+    def __init__(self, faults, host='127.0.0.1', port=0):
+        super().__init__(faults, host, port)
+        self._tokens = Counter()
+
+    @property
+    def base_url(self):
+        return f"{self.root_url}/api/v1"
+
+    @property
+    def auth_url(self):
+        return f"{self.root_url}/api/v2/oauth"
+
+    def endpoint(self, method, path):
+        if path.rstrip('/').endswith('oauth'):
+            return 'oauth'
+        if path.rstrip('/').endswith('chat/completions'):
+            return 'chat'
+        return 'other'
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats.update({f"tokens_{kind}": value for kind, value in self._tokens.items()})
+        return stats
+
+    def respond(self, endpoint, path, query, handler):
+        if endpoint == 'oauth':
+            return {"access_token": "stub-token", "expires_at": int((time.time() + 1800) * 1000)}
+        if endpoint != 'chat':
+            return None
+        request = json.loads(handler.request_body or b'{}')
+        prompt = ''.join(message.get('content', '') for message in request.get('messages', []))
+        rng = random.Random(prompt)
+        scores = [rng.randint(1, 5) for _ in range(4)]
+        content = (f"Размер: {scores[0]}\nКачество: {scores[1]}\nСложность: {scores[2]}\nКомментарий: {scores[3]}\n"
+                   f"Сумма: {sum(scores)}\nОбщий комментарий: Разбейте изменение на более мелкие коммиты.")
+        # Грубая оценка токенов: около четырех символов на токен
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        with self._lock:
+            self._tokens['prompt'] += usage["prompt_tokens"]
+            self._tokens['completion'] += usage["completion_tokens"]
+        return {
+            "choices": [{"message": {"role": "assistant", "content": content}, "index": 0, "finish_reason": "stop"}],
+            "created": int(time.time()), "model": request.get('model', 'GigaChat-Max'), "object": "chat.completion",
+            "usage": usage,
+        }
+
+def add_stub_arguments(parser):
+    parser.add_argument('--projects', type=int, default=1)
+    parser.add_argument('--repos', type=int, default=1, help='Репозиториев в каждом проекте')
+    parser.add_argument('--branches', type=int, default=1, help='Веток в репозитории, включая main')
+    parser.add_argument('--commits', type=int, default=1000, help='Коммитов в истории main каждого репозитория')
+    parser.add_argument('--feature-commits', type=int, default=20, help='Собственных коммитов у каждой ветки кроме main')
+    parser.add_argument('--latency-ms', type=float, default=10.0, help='Задержка ответа Sfera')
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов Sfera 503')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Доля ответов Sfera 429')
+    parser.add_argument('--retry-after', type=float, default=0.5, help='Retry-After в ответах 429, секунды')
+    parser.add_argument('--llm-latency-ms', type=float, default=300.0, help='Задержка ответа GigaChat')
+    parser.add_argument('--llm-jitter-ms', type=float, default=100.0)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help='Доля ответов GigaChat 503')
+    parser.add_argument('--llm-throttle-rate', type=float, default=0.0, help='Доля ответов GigaChat 429')
+    parser.add_argument('--seed', type=int, default=42)
+
+def start_stubs(args, sfera_port=0, gigachat_port=0):
+    sfera = SferaStub(
+        FaultProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate, args.retry_after),
+        projects=args.projects, repos=args.repos, branches=args.branches, commits=args.commits,
+        feature_commits=args.feature_commits, seed=args.seed, port=sfera_port,
+    ).start()
+    gigachat = GigaChatStub(
+        FaultProfile(args.llm_latency_ms, args.llm_jitter_ms, args.llm_error_rate, args.llm_throttle_rate, args.retry_after),
+        port=gigachat_port,
+    ).start()
+    return sfera, gigachat
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушки API Sfera и GigaChat")
+    add_stub_arguments(parser)
+    parser.add_argument('--sfera-port', type=int, default=0)
+    parser.add_argument('--gigachat-port', type=int, default=0)
+    args = parser.parse_args()
+    sfera, gigachat = start_stubs(args, args.sfera_port, args.gigachat_port)
+    print(json.dumps({
+        "sfera_base_url": sfera.base_url,
+        "gigachat_base_url": gigachat.base_url,
+        "gigachat_auth_url": gigachat.auth_url,
+        "total_commits": sfera.total_commits(),
+        "projects": sfera.projects,
+        "repos": sfera.repos,
+    }, ensure_ascii=False), flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sfera.stop()
+        gigachat.stop()
+
+if __name__ == '__main__':
+    sys.exit(main())
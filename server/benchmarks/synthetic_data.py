@@ -0,0 +1,166 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from models import db, Project, Repository, Commit, CommitContent, CommitFile
+from db_utils import insert_ignore, insert_ignore_returning
+from authors import resolve_author_ids
+from kpi_calculator import calculate_deterministic_kpi_array, calculate_final_score_array
+from rollups import add_commits_to_rollups, time_bucket
+
+logger = logging.getLogger(__name__)
+
+# Синтетический набор данных для бенчмарков: активность авторов и популярность файлов распределены по Ципфу,
+# коммиты чаще приходятся на будни и рабочие часы, доля коммитов без LLM-оценки настраивается.
+# Генерация детерминирована seed, повторный запуск с тем же seed ничего не дублирует.
+HOUR_WEIGHTS = np.array([1, 1, 1, 1, 1, 1, 2, 4, 8, 14, 18, 18, 12, 16, 18, 18, 16, 12, 8, 6, 5, 4, 3, 2], dtype=np.float64)
+WEEKDAY_WEIGHTS = np.array([1, 1, 1, 1, 0.9, 0.2, 0.15], dtype=np.float64)
+EXTENSIONS = ('.py', '.ts', '.tsx', '.java', '.sql', '.md', '.yml', '.json')
+COMPONENTS = ('api', 'core', 'ui', 'auth', 'billing', 'reports', 'search', 'infra', 'db', 'utils')
+VERBS = ('Исправлена', 'Добавлена', 'Переработана', 'Ускорена', 'Удалена', 'Обновлена')
+
+def project_keys(projects):
+    return [f"BENCH{index + 1}" for index in range(projects)]
+
+def author_email(rank):
+    return f"dev{rank}@bench.local"
+
+def _zipf_weights(size, exponent):
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    return weights / weights.sum()
+
+def _create_structure(projects, repos_per_project, authors):
+    keys = project_keys(projects)
+    insert_ignore(Project, [{'key': key, 'name': key, 'description': f"Синтетический проект {key}"} for key in keys], index_elements=['key'])
+    repositories = []
+    for project_index, key in enumerate(keys):
+        for repo_index in range(repos_per_project):
+            repositories.append({'id': 900000000 + project_index * 1000 + repo_index, 'name': f"repo-{repo_index + 1}", 'project_key': key})
+    insert_ignore(Repository, repositories, index_elements=['id'])
+    author_ids = resolve_author_ids({author_email(rank): f"Разработчик {rank}" for rank in range(authors)})
+    db.session.commit()
+    return repositories, [author_ids[author_email(rank)] for rank in range(authors)]
+
+def _evaluation_text(size, quality, complexity, comment):
+    return (f"Размер: {size}\nКачество: {quality}\nСложность: {complexity}\nКомментарий: {comment}\n"
+            f"Сумма: {size + quality + complexity + comment}\nОбщий комментарий: синтетическая оценка")
+
+def _diff_text(files):
+    parts = []
+    for path, added, deleted in files:
+        parts.append(f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -1,{deleted} +1,{added} @@\n")
+        parts.append(''.join(f"-old line {index}\n" for index in range(deleted)))
+        parts.append(''.join(f"+new line {index}\n" for index in range(added)))
+    return ''.join(parts)
+
+def generate_dataset(projects=3, repos_per_project=4, authors=200, commits=100000, days=365, files_per_commit=3,
+                     path_pool=2000, analyzed_share=0.9, diff_share=0.0, seed=42, batch_size=10000, end=None):
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=days)
+    repositories, author_ids = _create_structure(projects, repos_per_project, authors)
+
+    author_weights = _zipf_weights(authors, 1.1)
+    # У каждого автора основной проект, в чужие репозитории уходит небольшая доля коммитов
+    home_project = rng.integers(0, projects, size=authors)
+    repos_by_project = np.arange(len(repositories)).reshape(projects, repos_per_project)
+    day_weights = WEEKDAY_WEIGHTS[[(start + timedelta(days=day)).weekday() for day in range(days)]]
+    day_weights /= day_weights.sum()
+    hour_weights = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+    paths = [
+        f"src/{COMPONENTS[index % len(COMPONENTS)]}/module_{index}{EXTENSIONS[index % len(EXTENSIONS)]}"
+        for index in range(path_pool)
+    ]
+    path_weights = _zipf_weights(path_pool, 1.0)
+
+    inserted_total = files_total = 0
+    for offset in range(0, commits, batch_size):
+        size = min(batch_size, commits - offset)
+        authors_idx = rng.choice(authors, size=size, p=author_weights)
+        own_project = rng.random(size) < 0.85
+        project_idx = np.where(own_project, home_project[authors_idx], rng.integers(0, projects, size=size))
+        repo_idx = repos_by_project[project_idx, rng.integers(0, repos_per_project, size=size)]
+        seconds = (rng.choice(days, size=size, p=day_weights) * 86400
+                   + rng.choice(24, size=size, p=hour_weights) * 3600 + rng.integers(0, 3600, size=size))
+        added = np.minimum(rng.lognormal(3.0, 1.3, size=size).astype(np.int64), 5000)
+        deleted = (added * rng.random(size) * 0.6).astype(np.int64)
+        difficulty, quality, kpi_size = calculate_deterministic_kpi_array(added, deleted)
+        llm = rng.integers(1, 6, size=(size, 4))
+        llm_sums = llm.sum(axis=1)
+        final = calculate_final_score_array(added, deleted, llm_sums)
+        analyzed = rng.random(size) < analyzed_share
+        with_diff = rng.random(size) < diff_share
+        file_counts = rng.integers(1, files_per_commit * 2, size=size)
+        file_bounds = np.concatenate(([0], np.cumsum(file_counts)))
+        file_paths = rng.choice(path_pool, size=int(file_bounds[-1]), p=path_weights)
+        file_shares = rng.random(int(file_bounds[-1])) + 0.1
+        shas = [rng.bytes(20).hex() for _ in range(size)]
+
+        rows, files_by_sha = [], {}
+        for i in range(size):
+            repository = repositories[repo_idx[i]]
+            commit_date = start + timedelta(seconds=int(seconds[i]))
+            rank = int(authors_idx[i])
+            row = {
+                'sha': shas[i],
+                'message': f"BENCH-{offset + i}: {VERBS[i % len(VERBS)]} логика {COMPONENTS[rank % len(COMPONENTS)]}",
+                'author_name': f"Разработчик {rank}",
+                'author_email': author_email(rank),
+                'author_id': author_ids[rank],
+                'commit_date': commit_date,
+                'time_bucket': time_bucket(commit_date),
+                'added_lines': int(added[i]),
+                'deleted_lines': int(deleted[i]),
+                'repository_id': repository['id'],
+                'project_key': repository['project_key'],
+                'kpi_difficulty': float(difficulty[i]),
+                'kpi_quality': float(quality[i]),
+                'kpi_size': int(kpi_size[i]),
+                'llm_score_size': None, 'llm_score_quality': None, 'llm_score_complexity': None, 'llm_score_comment': None,
+                'llm_total_score': None, 'llm_evaluation_text': None, 'final_commit_score': None,
+            }
+            if analyzed[i]:
+                scores = [int(value) for value in llm[i]]
+                row.update(
+                    llm_score_size=scores[0], llm_score_quality=scores[1], llm_score_complexity=scores[2], llm_score_comment=scores[3],
+                    llm_total_score=int(llm_sums[i]), llm_evaluation_text=_evaluation_text(*scores), final_commit_score=float(final[i]),
+                )
+            rows.append(row)
+
+            # Повторно выпавший путь в одном коммите объединяется, доли строк делятся пропорционально весам
+            shares = {}
+            for index, weight in zip(file_paths[file_bounds[i]:file_bounds[i + 1]].tolist(), file_shares[file_bounds[i]:file_bounds[i + 1]].tolist()):
+                shares[index] = shares.get(index, 0.0) + weight
+            total = sum(shares.values())
+            files_by_sha[shas[i]] = [
+                (paths[index], int(added[i] * weight / total), int(deleted[i] * weight / total)) for index, weight in sorted(shares.items())
+            ]
+
+        inserted = set(insert_ignore_returning(Commit, rows, key='sha'))
+        file_rows = [
+            {
+                'commit_sha': row['sha'], 'path': path, 'extension': os.path.splitext(path)[1],
+                'added_lines': file_added, 'deleted_lines': file_deleted,
+                'project_key': row['project_key'], 'repository_id': row['repository_id'],
+                'author_id': row['author_id'], 'commit_date': row['commit_date'],
+            }
+            for row in rows if row['sha'] in inserted
+            for path, file_added, file_deleted in files_by_sha[row['sha']]
+        ]
+        insert_ignore(CommitFile, file_rows, index_elements=['commit_sha', 'path'])
+        content_rows = [
+            CommitContent.row_for(row['sha'], _diff_text(files_by_sha[row['sha']]))
+            for row, diff in zip(rows, with_diff) if diff and row['sha'] in inserted
+        ]
+        insert_ignore(CommitContent, content_rows, index_elements=['sha'])
+        add_commits_to_rollups(row for row in rows if row['sha'] in inserted)
+        db.session.commit()
+        inserted_total += len(inserted)
+        files_total += len(file_rows)
+        logger.info(f"Синтетические данные: записано коммитов {inserted_total} из {commits}")
+
+    return {
+        'projects': projects, 'repositories': len(repositories), 'authors': authors,
+        'commits_requested': commits, 'commits_inserted': inserted_total, 'commit_files': files_total,
+        'days': days, 'start': start.isoformat(), 'end': end.isoformat(), 'seed': seed,
+    }
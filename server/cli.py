@@ -0,0 +1,84 @@
+import click
+from analysis_queue import drain_pending_analyses
+from authors import backfill_commit_authors
+from rollups import rebuild_rollups
+from file_index import reindex_commit_files
+import exporter
+from kpi_recompute import recompute_kpis
+from content_backfill import backfill_commit_contents
+
+def register_cli_commands(app):
+
+    @app.cli.command('analyze-pending')
+    @click.option('--workers', type=int, default=None, help='Число параллельных запросов к GigaChat')
+    def analyze_pending(workers):
+        """Обработать очередь LLM-анализа коммитов."""
+        results = drain_pending_analyses(app, max_workers=workers)
+        click.echo(f"Результаты: {results}")
+
+    @app.cli.command('backfill-authors')
+    @click.option('--batch-size', type=int, default=1000, help='Размер пачки коммитов')
+    def backfill_authors(batch_size):
+        """Заполнить таблицу авторов для ранее сохраненных коммитов."""
+        updated = backfill_commit_authors(batch_size)
+        click.echo(f"Обновлено коммитов: {updated}")
+
+    @app.cli.command('rebuild-rollups')
+    @click.option('--batch-size', type=int, default=5000, help='Сколько коммитов читать из БД за раз')
+    def rebuild_rollups_command(batch_size):
+        """Пересчитать дневные агрегаты метрик по всем коммитам."""
+        rows = rebuild_rollups(batch_size)
+        click.echo(f"Строк агрегатов: {rows}")
+
+    @app.cli.command('backfill-commit-content')
+    @click.option('--batch-size', type=int, default=500, help='Сколько коммитов переносить за раз')
+    @click.option('--drop-column', is_flag=True, help='После переноса удалить колонку commits.commit_content')
+    def backfill_commit_content(batch_size, drop_column):
+        """Перенести diff из commits.commit_content в таблицу commit_contents."""
+        copied = backfill_commit_contents(batch_size, drop_column)
+        click.echo(f"Перенесено diff: {copied}")
+
+    @app.cli.command('reindex-files')
+    @click.option('--batch-size', type=int, default=500, help='Сколько коммитов обрабатывать за раз')
+    def reindex_files(batch_size):
+        """Заново разобрать сохраненные diff в таблицу commit_files."""
+        indexed = reindex_commit_files(batch_size)
+        click.echo(f"Обработано коммитов: {indexed}")
+
+    @app.cli.command('export-commits')
+    @click.argument('output', type=click.Path(dir_okay=False))
+    @click.option('--format', 'export_format', type=click.Choice(exporter.EXPORT_FORMATS), default='csv')
+    @click.option('--project-key', default=None)
+    @click.option('--repo-name', default=None)
+    @click.option('--author-email', default=None)
+    @click.option('--since', default=None, help='ISO-дата начала периода')
+    @click.option('--until', default=None, help='ISO-дата конца периода')
+    @click.option('--include-diff', is_flag=True, help='Добавить текст diff')
+    @click.option('--batch-size', type=int, default=5000, help='Сколько коммитов читать из БД за раз')
+    def export_commits(output, export_format, project_key, repo_name, author_email, since, until, include_diff, batch_size):
+        """Выгрузить коммиты с KPI и оценками в CSV, Arrow IPC или Parquet."""
+        if export_format != 'csv' and not exporter.columnar_available():
+            raise click.ClickException("Для форматов arrow и parquet нужен pyarrow")
+        args = {key: value for key, value in {
+            'project_key': project_key, 'repo_name': repo_name, 'author_email': author_email, 'since': since, 'until': until,
+        }.items() if value}
+        batches = exporter.iter_export_batches(args, include_diff=include_diff, batch_size=batch_size)
+        if export_format == 'parquet':
+            exporter.write_parquet(batches, output, include_diff)
+        elif export_format == 'arrow':
+            with open(output, 'wb') as f:
+                for chunk in exporter.iter_arrow_ipc(batches, include_diff):
+                    f.write(chunk)
+        else:
+            with open(output, 'w', encoding='utf-8', newline='') as f:
+                for chunk in exporter.iter_csv(batches, include_diff):
+                    f.write(chunk)
+        click.echo(f"Выгрузка сохранена в {output}")
+
+    @app.cli.command('recompute-kpis')
+    @click.option('--batch-size', type=int, default=10000, help='Сколько коммитов читать из БД за раз')
+    @click.option('--dry-run', is_flag=True, help='Только посчитать, сколько коммитов изменится')
+    def recompute_kpis_command(batch_size, dry_run):
+        """Пересчитать детерминированные KPI и итоговые оценки всех коммитов."""
+        processed, changed = recompute_kpis(batch_size, dry_run)
+        click.echo(f"Обработано коммитов: {processed}, изменено: {changed}")
@@ -0,0 +1,208 @@
+import logging
+import threading
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from dateutil import parser
+from config import Config
+from authors import normalize_email
+from sfera_api import SferaAPI
+from data_collector import collect_data_for_target, CollectionProgress
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+# Параметры запуска, которые не относятся к цели сбора и передаются коллектору как есть
+_PASSTHROUGH_PARAMS = ('ingestion_mode', 'sync_mode')
+
+class CollectionJob:
+    def __init__(self, target, credentials, options):
+        self.id = uuid.uuid4().hex[:12]
+        self.target = target
+        self.credentials = credentials
+        self.options = options
+        self.status = 'queued'
+        self.message = "В очереди"
+        self.progress = CollectionProgress()
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def project_key(self):
+        return self.target['project_key']
+
+    @property
+    def dedup_key(self):
+        # Режимы сбора входят в ключ: полный запуск не должен слиться с инкрементальным и пройти как он
+        t = self.target
+        options = (self.options.get('ingestion_mode', Config.COLLECTOR_INGESTION_MODE), self.options.get('sync_mode', Config.COLLECTOR_SYNC_MODE))
+        return (t['project_key'], t.get('repo_name') or '', t.get('branch_name') or '', normalize_email(t.get('target_email'))) + options
+
+    def covers(self, since, until):
+        return self.target['since_dt'] <= since and until <= self.target['until_dt']
+
+    def overlaps(self, since, until):
+        return self.target['since_dt'] <= until and since <= self.target['until_dt']
+
+    def to_dict(self, llm_pending=None):
+        t = self.target
+        return {
+            "id": self.id,
+            "project_key": t['project_key'],
+            "repo_name": t.get('repo_name'),
+            "branch_name": t.get('branch_name'),
+            "since": t['since'],
+            "until": t['until'],
+            "target_email": t.get('target_email'),
+            "status": self.status,
+            "message": self.message,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "progress": {
+                "pages_fetched": self.progress.pages,
+                "commits_found": self.progress.found,
+                "commits_saved": self.progress.saved,
+                "commits_failed": self.progress.failed,
+                "llm_queued": self.progress.queued_for_analysis,
+                "llm_pending": llm_pending,
+            },
+        }
+
+def _parse_target(raw, defaults):
+    target = {key: raw.get(key, defaults.get(key)) for key in ('project_key', 'repo_name', 'branch_name', 'since', 'until', 'target_email')}
+    if not target['project_key'] or not target['since'] or not target['until']:
+        raise ValueError("Для каждой цели нужны project_key, since и until")
+    try:
+        target['since_dt'] = parser.isoparse(target['since'])
+        target['until_dt'] = parser.isoparse(target['until'])
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Некорректный период сбора: {e}") from e
+    if target['since_dt'] > target['until_dt']:
+        raise ValueError("Начало периода позже его конца")
+    return target
+
+class CollectionScheduler:
+    # Очередь задач сбора: общий лимит параллельных задач, лимит на проект и обход проектов по кругу,
+    # чтобы большой проект не занимал все слоты. Одинаковые цели с перекрывающимся периодом объединяются.
+    def __init__(self, max_concurrent, max_per_project, history_size):
+        self.max_concurrent = max_concurrent
+        self.max_per_project = max_per_project
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._queues = OrderedDict()
+        self._running = {}
+        self.last_finished = None
+
+    def submit(self, data):
+        # data: учетные данные Sfera и либо одна цель в корне запроса, либо список targets.
+        # Цель без repo_name раскрывается в задачи по всем репозиториям проекта.
+        credentials = (data['sfera_username'], data['sfera_password'])
+        options = {key: data[key] for key in _PASSTHROUGH_PARAMS if key in data}
+        raw_targets = data.get('targets') or [data]
+        targets = [_parse_target(raw, data) for raw in raw_targets]
+        with self._lock:
+            jobs = [self._enqueue(target, credentials, options) for target in targets]
+            self._dispatch()
+        return jobs
+
+    def _enqueue(self, target, credentials, options):
+        job = CollectionJob(target, credentials, options)
+        since, until = target['since_dt'], target['until_dt']
+        for existing in self._jobs.values():
+            if existing.status not in ACTIVE_STATUSES or existing.dedup_key != job.dedup_key:
+                continue
+            if existing.covers(since, until):
+                return existing
+            if existing.status == 'queued' and existing.overlaps(since, until):
+                # Еще не начатая задача расширяется до объединения периодов
+                if since < existing.target['since_dt']:
+                    existing.target.update(since=target['since'], since_dt=since)
+                if until > existing.target['until_dt']:
+                    existing.target.update(until=target['until'], until_dt=until)
+                return existing
+
+        self._jobs[job.id] = job
+        self._queues.setdefault(job.project_key, deque()).append(job)
+        self._trim_history()
+        return job
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_size)]:
+            del self._jobs[job_id]
+
+    def _next_job(self):
+        for project_key in list(self._queues):
+            queue = self._queues[project_key]
+            running_in_project = sum(1 for job in self._running.values() if job.project_key == project_key)
+            if running_in_project >= self.max_per_project:
+                continue
+            job = queue.popleft()
+            # Проект уходит в конец круга, следующий слот достанется другому проекту
+            del self._queues[project_key]
+            if queue:
+                self._queues[project_key] = queue
+            return job
+        return None
+
+    def _dispatch(self):
+        while len(self._running) < self.max_concurrent:
+            job = self._next_job()
+            if job is None:
+                return
+            job.status = 'running'
+            job.message = "Выполняется"
+            job.started_at = datetime.now(timezone.utc)
+            self._running[job.id] = job
+            threading.Thread(target=self._run, args=(job,), name=f"collection_{job.id}", daemon=True).start()
+
+    def _run(self, job):
+        logger.info("Задача сбора %s запущена: %s", job.id, {k: v for k, v in job.target.items() if not k.endswith('_dt')})
+        try:
+            if job.target.get('repo_name'):
+                job.message = collect_data_for_target(
+                    *job.credentials, job.target['project_key'], job.target['repo_name'], job.target.get('branch_name'),
+                    job.target['since'], job.target['until'], job.target.get('target_email'),
+                    progress=job.progress, **job.options,
+                )
+                job.status = 'failed' if job.progress.error else 'done'
+            else:
+                job.message = self._expand_project(job)
+                job.status = 'done'
+        except Exception as e:
+            logger.error(f"Задача сбора {job.id} завершилась с ошибкой: {e}", exc_info=True)
+            job.status = 'failed'
+            job.message = f"Ошибка: {e}"
+        finally:
+            # Учетные данные Sfera не хранятся в истории завершенных задач
+            job.credentials = None
+            job.finished_at = datetime.now(timezone.utc)
+            with self._lock:
+                self._running.pop(job.id, None)
+                self.last_finished = job
+                self._dispatch()
+            logger.info("Задача сбора %s завершена: %s", job.id, job.status)
+
+    def _expand_project(self, job):
+        api = SferaAPI(*job.credentials)
+        repos = [repo.get('name') for repo in api.get_project_repos(job.project_key) if repo.get('name')]
+        base = {key: value for key, value in job.target.items() if key != 'repo_name'}
+        with self._lock:
+            for repo_name in repos:
+                self._enqueue(dict(base, repo_name=repo_name), job.credentials, job.options)
+        return f"Поставлено в очередь репозиториев: {len(repos)}"
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def is_running(self):
+        with self._lock:
+            return any(job.status in ACTIVE_STATUSES for job in self._jobs.values())
+
+scheduler = CollectionScheduler(
+    Config.COLLECTOR_MAX_CONCURRENT_JOBS, Config.COLLECTOR_MAX_JOBS_PER_PROJECT, Config.COLLECTOR_JOB_HISTORY,
+)
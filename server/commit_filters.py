@@ -0,0 +1,69 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import select, tuple_
+from models import Author, Commit, Repository
+from authors import normalize_email
+
+def author_ids_query(author_email, match='exact'):
+    # Поиск идет по небольшой таблице авторов, а коммиты отбираются по индексу (author_id, commit_date)
+    email = normalize_email(author_email)
+    if match == 'prefix':
+        condition = Author.email.startswith(email, autoescape=True)
+    elif match == 'contains':
+        condition = Author.email.contains(email, autoescape=True)
+    else:
+        condition = Author.email == email
+    return select(Author.id).where(condition)
+
+def author_filter(author_email, match='exact', model=Commit):
+    return model.author_id.in_(author_ids_query(author_email, match))
+
+# Репозитории не удаляются и не переименовываются, поэтому найденный id можно кэшировать на время жизни процесса
+_repository_ids = {}
+
+def resolve_repository_id(project_key, repo_name):
+    key = (project_key, repo_name)
+    if key not in _repository_ids:
+        repo = Repository.query.filter_by(name=repo_name, project_key=project_key).first()
+        if repo is None:
+            return None
+        _repository_ids[key] = repo.id
+    return _repository_ids[key]
+
+def apply_commit_filters(query, args, model=Commit):
+    # model - Commit или таблица с теми же полями фильтрации (project_key, repository_id, author_id, commit_date)
+    project_key = args.get('project_key')
+    repo_name = args.get('repo_name')
+    author_email = args.get('author_email')
+    since = args.get('since')
+    until = args.get('until')
+
+    if project_key:
+        query = query.filter(model.project_key == project_key)
+    if repo_name:
+        repository_id = resolve_repository_id(project_key, repo_name)
+        if repository_id:
+            query = query.filter(model.repository_id == repository_id)
+    if author_email:
+        query = query.filter(author_filter(author_email, args.get('author_match', 'exact'), model))
+    if since:
+        query = query.filter(model.commit_date >= since)
+    if until:
+        query = query.filter(model.commit_date <= until)
+
+    return query
+
+def encode_cursor(commit):
+    # Непрозрачный курсор: позиция последнего отданного коммита в порядке (commit_date, sha) по убыванию
+    payload = json.dumps([commit.commit_date.isoformat(), commit.sha]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+def apply_commit_cursor(query, cursor):
+    # ValueError для поврежденного курсора
+    try:
+        commit_date, sha = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        commit_date = datetime.fromisoformat(commit_date)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Некорректный курсор: {e}") from e
+    return query.filter(tuple_(Commit.commit_date, Commit.sha) < (commit_date, sha))
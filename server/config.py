@@ -9,6 +9,9 @@ class Config:
     
     # --- НОВАЯ ПЕРЕМЕННАЯ ---
     GIGACHAT_CREDENTIALS = os.getenv('GIGACHAT_CREDENTIALS')
+    # Переопределение адресов GigaChat, например для локальной заглушки из benchmarks/stub_servers.py
+    GIGACHAT_BASE_URL = os.getenv('GIGACHAT_BASE_URL')
+    GIGACHAT_AUTH_URL = os.getenv('GIGACHAT_AUTH_URL')
 
     REPORT_DIR = os.path.abspath("reports")
     LLM_REPORT_DIR = os.path.abspath("llm_reports")
@@ -17,8 +20,51 @@ class Config:
         '.java', '.cpp', '.c', '.cs', '.go', '.php',
         '.rb', '.swift', '.kt', '.scala'
     }
+    SFERA_BASE_URL = os.getenv('SFERA_BASE_URL', 'https://gateway-codemetrics.saas.sferaplatform.ru/app/sourcecode/api/api/v2/')
+    SFERA_REQUEST_TIMEOUT = float(os.getenv('SFERA_REQUEST_TIMEOUT', '30'))
+    SFERA_MAX_RETRIES = int(os.getenv('SFERA_MAX_RETRIES', '5'))
+    SFERA_BACKOFF_BASE = float(os.getenv('SFERA_BACKOFF_BASE', '0.5'))
+    SFERA_BACKOFF_MAX = float(os.getenv('SFERA_BACKOFF_MAX', '60'))
+    SFERA_RATE_LIMIT = float(os.getenv('SFERA_RATE_LIMIT', '20'))
+    SFERA_RATE_LIMIT_MAX = float(os.getenv('SFERA_RATE_LIMIT_MAX', '100'))
+    SFERA_FETCH_WORKERS = int(os.getenv('SFERA_FETCH_WORKERS', '8'))
+    SFERA_MAX_CONNECTIONS_PER_HOST = int(os.getenv('SFERA_MAX_CONNECTIONS_PER_HOST', '8'))
+    SFERA_ASYNC_CONCURRENCY = int(os.getenv('SFERA_ASYNC_CONCURRENCY', '100'))
+    COLLECTOR_INGESTION_MODE = os.getenv('COLLECTOR_INGESTION_MODE', 'threads')
+    COLLECTOR_SYNC_MODE = os.getenv('COLLECTOR_SYNC_MODE', 'full')
+    COLLECTOR_PAGE_SIZE = int(os.getenv('COLLECTOR_PAGE_SIZE', '100'))
+    COLLECTOR_DB_BATCH_SIZE = int(os.getenv('COLLECTOR_DB_BATCH_SIZE', '200'))
+    COLLECTOR_MAX_CONCURRENT_JOBS = int(os.getenv('COLLECTOR_MAX_CONCURRENT_JOBS', '4'))
+    COLLECTOR_MAX_JOBS_PER_PROJECT = int(os.getenv('COLLECTOR_MAX_JOBS_PER_PROJECT', '2'))
+    COLLECTOR_JOB_HISTORY = int(os.getenv('COLLECTOR_JOB_HISTORY', '200'))
+
+    LLM_ANALYSIS_WORKERS = int(os.getenv('LLM_ANALYSIS_WORKERS', '4'))
+    LLM_ANALYSIS_MAX_ATTEMPTS = int(os.getenv('LLM_ANALYSIS_MAX_ATTEMPTS', '5'))
+    LLM_ANALYSIS_RETRY_DELAY = float(os.getenv('LLM_ANALYSIS_RETRY_DELAY', '60'))
+    LLM_ANALYSIS_LOCK_TIMEOUT = float(os.getenv('LLM_ANALYSIS_LOCK_TIMEOUT', '900'))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '50000'))
+    LLM_ANALYSIS_AUTOSTART = os.getenv('LLM_ANALYSIS_AUTOSTART', 'True').lower() == 'true'
+
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+    RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '300'))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '512'))
+
+    # Границы суток для дневных агрегатов; после смены нужно выполнить flask rebuild-rollups
+    REPORT_TIMEZONE = os.getenv('REPORT_TIMEZONE', 'Europe/Moscow')
+
+    # Статический токен для сборщика Prometheus; без него /api/admin/metrics доступен только с JWT
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+    PROFILING_SLOW_REQUEST_MS = float(os.getenv('PROFILING_SLOW_REQUEST_MS', '500'))
+    PROFILING_SLOW_QUERY_MS = float(os.getenv('PROFILING_SLOW_QUERY_MS', '100'))
+    # Доля запросов под cProfile; дамп сохраняется только для медленных
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+    PROFILING_DIR = os.getenv('PROFILING_DIR', 'profiles')
+
     CORS_ORIGINS = ["http://localhost:3000"]
     DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
+    LOG_FILE = os.getenv('LOG_FILE', 'app.log')
 
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
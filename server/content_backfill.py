@@ -0,0 +1,42 @@
+import logging
+from sqlalchemy import column, inspect, select, table, text
+from models import db, CommitContent
+from db_utils import insert_ignore
+
+logger = logging.getLogger(__name__)
+
+# Колонка commits.commit_content из схемы до переноса diff в commit_contents
+_legacy_commits = table('commits', column('sha'), column('commit_content'))
+
+def has_legacy_content_column():
+    return any(c['name'] == 'commit_content' for c in inspect(db.engine).get_columns('commits'))
+
+def backfill_commit_contents(batch_size=500, drop_column=False):
+    # Переносит diff старых коммитов в commit_contents. Выполняется до миграции, удаляющей колонку,
+    # иначе автосгенерированный DROP COLUMN уничтожит все сохраненные diff
+    if not has_legacy_content_column():
+        logger.info("Колонки commits.commit_content нет, переносить нечего")
+        return 0
+    CommitContent.__table__.create(db.engine, checkfirst=True)
+
+    copied = 0
+    last_sha = ''
+    while True:
+        rows = db.session.execute(
+            select(_legacy_commits.c.sha, _legacy_commits.c.commit_content)
+            .where(_legacy_commits.c.sha > last_sha, _legacy_commits.c.commit_content.isnot(None))
+            .order_by(_legacy_commits.c.sha)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_sha = rows[-1][0]
+        copied += insert_ignore(CommitContent, [CommitContent.row_for(sha, content) for sha, content in rows], index_elements=['sha'])
+        db.session.commit()
+        logger.info(f"Перенесены diff {copied} коммитов")
+
+    if drop_column:
+        db.session.execute(text("ALTER TABLE commits DROP COLUMN commit_content"))
+        db.session.commit()
+        logger.info("Колонка commits.commit_content удалена")
+    return copied
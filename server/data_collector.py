@@ -1,138 +1,580 @@
+import asyncio
+import contextvars
 import logging
 import hashlib
 import base64
-from sfera_api import SferaAPI
-from models import db, Project, Repository, Commit
+import binascii
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from sfera_api import SferaAPI, commit_in_window
+from sfera_async_api import AsyncSferaAPI
+from datetime import datetime, timezone
+from models import db, Project, Repository, Commit, CommitContent, CommitFile, SyncState
+from db_utils import chunked, insert_ignore, insert_ignore_returning
+from instrumentation import COLLECTOR_BRANCH_PAGES, COLLECTOR_COMMITS, COLLECTOR_STAGE_SECONDS
+from rollups import add_commits_to_rollups, time_bucket
+from file_index import file_rows_for_commit
+from response_cache import bump_generation
+from authors import normalize_email, resolve_author_ids
 from dateutil import parser
-from llm_analyzer import analyze_commit_code
-from kpi_calculator import calculate_deterministic_kpi, calculate_final_score
+from kpi_calculator import calculate_deterministic_kpi
+from analysis_queue import EVALUATION_COLUMNS, enqueue_analysis, evaluation_columns, start_analysis_worker
+from llm_cache import evaluation_cache_key, get_cached_evaluations
 
 logger = logging.getLogger(__name__)
 
+def _fetch_commit_payload(api, project_key, repo_name, sha):
+    commit_details_response = api.get_commit_details(project_key, repo_name, sha)
+    if not commit_details_response or 'data' not in commit_details_response:
+        return None
+    diff_response = api.get_commit_diff(project_key, repo_name, sha)
+    return commit_details_response, diff_response
+
+async def _fetch_commit_payload_async(api, project_key, repo_name, sha):
+    commit_details_response, diff_response = await asyncio.gather(
+        api.get_commit_details(project_key, repo_name, sha),
+        api.get_commit_diff(project_key, repo_name, sha),
+    )
+    if not commit_details_response or 'data' not in commit_details_response:
+        return None
+    return commit_details_response, diff_response
+
+def _aware(value):
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+class CollectionProgress:
+    # Счетчики одного запуска сбора; планировщик читает их для статуса задачи
+    def __init__(self):
+        self.repository_id = None
+        self.pages = 0
+        self.found = 0
+        self.failed = 0
+        self.saved = 0
+        self.queued_for_analysis = 0
+        self.error = None
+
+def _select_new_commits(page_commits, queued_shas):
+    # Одна выборка IN (...) на страницу вместо запроса на каждый коммит
+    shas = {c.get('hash') for c in page_commits if c.get('hash')} - queued_shas
+    known_shas = {sha for (sha,) in db.session.query(Commit.sha).filter(Commit.sha.in_(shas))} if shas else set()
+    page = []
+    for commit_data in page_commits:
+        sha = commit_data.get('hash')
+        if sha in shas and sha not in known_shas and sha not in queued_shas:
+            queued_shas.add(sha)
+            page.append(commit_data)
+    return page
+
+def _iter_new_commit_pages(commits, page_size, queued_shas, stats, branch_sync):
+    # Страницы формируются лениво: проверка по БД следующей страницы идет, пока загружается текущая
+    for page_commits in chunked(commits, page_size):
+        stats.pages += 1
+        stats.found += len(page_commits)
+        branch_sync.observe(page_commits)
+        page = _select_new_commits(page_commits, queued_shas)
+        yield page
+        if branch_sync.reached_synced_history(page_commits, page):
+            return
+
+async def _iter_new_commit_pages_async(commits, page_size, queued_shas, stats, branch_sync, db_thread):
+    page_commits = []
+    async for commit_data in commits:
+        page_commits.append(commit_data)
+        if len(page_commits) >= page_size:
+            stats.pages += 1
+            stats.found += len(page_commits)
+            branch_sync.observe(page_commits)
+            page = await db_thread.run(_select_new_commits, page_commits, queued_shas)
+            yield page
+            if branch_sync.reached_synced_history(page_commits, page):
+                return
+            page_commits = []
+    if page_commits:
+        stats.pages += 1
+        stats.found += len(page_commits)
+        branch_sync.observe(page_commits)
+        yield await db_thread.run(_select_new_commits, page_commits, queued_shas)
+
+def _parent_hashes(commit_data):
+    # Родители коммита из ответа Sfera: строки или объекты с hash. None, если их нет в ответе
+    parents = commit_data.get('parents')
+    if not isinstance(parents, list):
+        return None
+    hashes = [parent if isinstance(parent, str) else (parent or {}).get('hash') for parent in parents]
+    return None if not all(hashes) else hashes
+
+class _SharedHistory:
+    # Коммиты веток, пройденных в этом запуске до since. Все их предки не старше since тоже пройдены,
+    # поэтому следующую ветку можно не листать дальше, когда вся ее непросмотренная история - предки этих коммитов
+    def __init__(self):
+        self.known = set()
+
+    def walk(self):
+        return _BranchWalk(self.known)
+
+    def add(self, walk):
+        if walk.complete:
+            self.known |= walk.listed
+
+class _BranchWalk:
+    # Листание одной ветки: просмотренные коммиты и еще не встреченные родители. Все непросмотренные коммиты
+    # ветки - предки этих родителей, так что порядок выдачи Sfera (по дате, а не по топологии) здесь не важен
+    def __init__(self, known):
+        self.known = known
+        self.listed = set()
+        self.pending = set()
+        self.has_parents = True
+        self.complete = False
+
+    def observe(self, page_commits):
+        for commit_data in page_commits:
+            sha = commit_data.get('hash')
+            parents = _parent_hashes(commit_data)
+            if not sha or parents is None:
+                # Без родителей конец общей истории не определить, ветка листается до since
+                self.has_parents = False
+                continue
+            self.listed.add(sha)
+            self.pending.discard(sha)
+            self.pending.update(parent for parent in parents if parent not in self.listed)
+
+    def joined_known_history(self):
+        return self.has_parents and bool(self.listed) and self.pending <= self.known
+
+def _iter_branch_commits(pages, walk, since_dt, until_dt, author_email):
+    # Фильтр по периоду и автору применяется после учета страницы: родительские связи нужны по всей истории
+    for page_commits in pages:
+        walk.observe(page_commits)
+        yield from (c for c in page_commits if commit_in_window(c, since_dt, until_dt, author_email))
+        if walk.joined_known_history():
+            logger.info("  -> Оставшаяся история ветки уже загружена с других веток. Прекращаем загрузку страниц.")
+            break
+    # Сюда доходит только ветка, пролистанная до конца; остановка по водяному знаку история не пополняет
+    walk.complete = True
+
+async def _iter_branch_commits_async(pages, walk, since_dt, until_dt, author_email):
+    async for page_commits in pages:
+        walk.observe(page_commits)
+        for commit_data in page_commits:
+            if commit_in_window(commit_data, since_dt, until_dt, author_email):
+                yield commit_data
+        if walk.joined_known_history():
+            logger.info("  -> Оставшаяся история ветки уже загружена с других веток. Прекращаем загрузку страниц.")
+            break
+    walk.complete = True
+
+class _BranchSync:
+    # Водяной знак ветки: самый новый синхронизированный коммит и нижняя граница просмотренной истории.
+    # В инкрементальном режиме листание останавливается за водяным знаком, если прошлые запуски покрыли since.
+    def __init__(self, project_key, repo_name, branch, sync_mode, since_dt, until_dt):
+        self.key = (project_key, repo_name, branch or '')
+        self.sync_mode = sync_mode
+        self.since_dt = _aware(since_dt)
+        # Окно, закрытое в прошлом (догрузка старого периода), ничего не говорит о коммитах после until
+        # и водяной знак не сдвигает
+        self.open_window = _aware(until_dt) >= datetime.now(timezone.utc)
+        self.newest = None
+        state = db.session.get(SyncState, self.key)
+        self.last_commit_sha = state.last_commit_sha if state else None
+        self.last_commit_date = _aware(state.last_commit_date) if state and state.last_commit_date else None
+        self.synced_since = _aware(state.synced_since) if state and state.synced_since else None
+        self._stop_before = self._stop_date()
+
+    def _stop_date(self):
+        # Дата водяного знака, за которой листание можно прекратить, или None для полного обхода
+        if self.sync_mode != 'incremental' or not self.last_commit_sha or self.last_commit_date is None:
+            return None
+        if self.synced_since is None or self.since_dt < self.synced_since:
+            logger.info(f"Период {'/'.join(self.key)} раньше синхронизированной истории, ветка листается целиком")
+            return None
+        logger.info(f"Инкрементальная синхронизация {'/'.join(self.key)} от коммита {self.last_commit_sha[:7]}")
+        return self.last_commit_date
+
+    def reached_synced_history(self, page_commits, new_commits):
+        # История отдается по дате, а не по топологии: за общим или слитым коммитом могут идти более старые
+        # коммиты только этой ветки. Поэтому останавливаемся лишь на странице, где все коммиты уже сохранены
+        # и не новее водяного знака.
+        if self._stop_before is None or new_commits:
+            return False
+        if all(_aware(parser.isoparse(c['created_at'])) <= self._stop_before for c in page_commits):
+            logger.info(f"  -> {'/'.join(self.key)}: страница целиком из уже синхронизированной истории. Прекращаем загрузку страниц.")
+            return True
+        return False
+
+    def observe(self, page_commits):
+        if self.newest is None and page_commits:
+            self.newest = page_commits[0]
+
+    def _new_synced_since(self):
+        # Новый проход покрыл историю от текущего момента до since. Если он дошел до прежнего водяного знака,
+        # покрытие сливается с прежним, иначе между ними возможен разрыв и граница берется из этого прохода
+        if self.synced_since is not None and self.last_commit_date is not None and self.since_dt <= self.last_commit_date:
+            return min(self.synced_since, self.since_dt)
+        return self.since_dt
+
+    def save(self):
+        if self.newest is None or not self.open_window:
+            return
+        state = db.session.get(SyncState, self.key)
+        if state is None:
+            project_key, repo_name, branch = self.key
+            state = SyncState(project_key=project_key, repo_name=repo_name, branch=branch)
+            db.session.add(state)
+        state.last_commit_sha = self.newest['hash']
+        state.last_commit_date = parser.isoparse(self.newest['created_at'])
+        state.synced_since = self._new_synced_since()
+        state.updated_at = datetime.now(timezone.utc)
+        db.session.commit()
+
+def _iter_prefetched(executor, api, project_key, repo_name, pages):
+    # Детали и diff следующей страницы загружаются в пуле, пока основной поток сохраняет текущую
+    in_flight = []
+    for page in pages:
+        submitted = [
+            (commit_data, executor.submit(_fetch_commit_payload, api, project_key, repo_name, commit_data['hash']))
+            for commit_data in page
+        ]
+        yield from in_flight
+        in_flight = submitted
+    yield from in_flight
+
+def _branch_updated_at(branch):
+    # Формат ветки в API Sfera не зафиксирован, поэтому дата последнего изменения ищется в нескольких полях
+    last_commit = branch.get('last_commit') or branch.get('commit') or {}
+    for value in (branch.get('updated_at'), last_commit.get('created_at'), last_commit.get('date')):
+        if value:
+            try:
+                return parser.isoparse(value)
+            except (TypeError, ValueError):
+                continue
+    return None
+
+def _order_branches(branches_from_api):
+    # Сначала самые свежие ветки: обычно их история включает общих предков, и листание остальных веток
+    # останавливается на уже пройденной истории (см. _BranchWalk)
+    named = [b for b in branches_from_api if b.get('name')]
+    dated = sorted((b for b in named if _branch_updated_at(b)), key=_branch_updated_at, reverse=True)
+    undated = [b for b in named if not _branch_updated_at(b)]
+    return [b['name'] for b in dated + undated]
+
+def _get_or_create_repository(project_key, repo_name):
+    # Параллельные задачи сбора одного проекта могут создавать записи одновременно, поэтому вставка без конфликта
+    if not db.session.get(Project, project_key):
+        insert_ignore(Project, [{'key': project_key, 'name': project_key, 'description': f"Project {project_key}"}], index_elements=['key'])
+        db.session.commit()
+
+    repo_unique_str = f"{project_key}/{repo_name}"
+    repo_id = int(hashlib.sha1(repo_unique_str.encode('utf-8')).hexdigest(), 16) % (10**9)
+
+    repository = db.session.get(Repository, repo_id)
+    if not repository:
+        insert_ignore(Repository, [{'id': repo_id, 'name': repo_name, 'project_key': project_key}], index_elements=['id'])
+        db.session.commit()
+        repository = db.session.get(Repository, repo_id)
+    return repository
+
+def _build_commit_row(commit_data, payload, repository_id, project_key):
+    commit_details_response, diff_response = payload
+    stats = commit_details_response['data'].get('stats', {})
+    diff_content_base64 = (diff_response or {}).get('data', {}).get('content', '')
+    sha = commit_data.get('hash')
+
+    row = {
+        'sha': sha,
+        'message': commit_data.get('message', ''),
+        'author_name': commit_data.get('author', {}).get('name', 'N/A'),
+        'author_email': commit_data.get('author', {}).get('email', 'N/A'),
+        'commit_date': parser.isoparse(commit_data.get('created_at')),
+        'commit_content': None,
+        'added_lines': stats.get('additions', 0),
+        'deleted_lines': stats.get('deletions', 0),
+        'repository_id': repository_id,
+        'project_key': project_key,
+    }
+
+    row['time_bucket'] = time_bucket(row['commit_date'])
+
+    deterministic_kpi = calculate_deterministic_kpi(row['added_lines'], row['deleted_lines'])
+    row['kpi_difficulty'] = deterministic_kpi.get('difficulty')
+    row['kpi_quality'] = deterministic_kpi.get('quality')
+    row['kpi_size'] = deterministic_kpi.get('size')
+    row.update(dict.fromkeys(EVALUATION_COLUMNS))
+
+    try:
+        with COLLECTOR_STAGE_SECONDS.time(stage='diff_decode'):
+            row['commit_content'] = base64.b64decode(diff_content_base64).decode('utf-8', errors='ignore')
+    except (binascii.Error, ValueError) as e:
+        logger.error(f"Не удалось декодировать diff коммита {sha[:7]}: {e}")
+    return row
+
+class _CommitBatchWriter:
+    # Копит строки коммитов и пишет их пачками с фиксацией транзакции на каждую пачку.
+    # Вместе с коммитами ставятся задачи LLM-анализа, оценку заполнит фоновый обработчик очереди.
+    def __init__(self, app, batch_size, progress=None):
+        self.app = app
+        self.batch_size = batch_size
+        self.progress = progress
+        self.rows = []
+        self.saved = 0
+        self.queued_for_analysis = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.author_ids = {}
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        with COLLECTOR_STAGE_SECONDS.time(stage='db_write'):
+            to_analyze = self._apply_cached_evaluations()
+            self._assign_authors()
+            content_rows = [CommitContent.row_for(row['sha'], row['commit_content']) for row in self.rows if row['commit_content'] is not None]
+            commit_rows = [{k: v for k, v in row.items() if k != 'commit_content'} for row in self.rows]
+            inserted = set(insert_ignore_returning(Commit, commit_rows, key='sha'))
+            self.saved += len(inserted)
+            insert_ignore(CommitContent, content_rows, index_elements=['sha'])
+            file_rows = [
+                file_row
+                for row in self.rows if row['sha'] in inserted and row['commit_content'] is not None
+                for file_row in file_rows_for_commit(row, row['commit_content'])
+            ]
+            insert_ignore(CommitFile, file_rows, index_elements=['commit_sha', 'path'])
+            add_commits_to_rollups(row for row in commit_rows if row['sha'] in inserted)
+            self.queued_for_analysis += enqueue_analysis(row['sha'] for row in to_analyze)
+        with COLLECTOR_STAGE_SECONDS.time(stage='db_commit'):
+            db.session.commit()
+        COLLECTOR_COMMITS.inc(len(inserted), result='saved')
+        COLLECTOR_COMMITS.inc(len(commit_rows) - len(inserted), result='existing')
+        if inserted:
+            bump_generation()
+        if self.progress is not None:
+            self.progress.saved = self.saved
+            self.progress.queued_for_analysis = self.queued_for_analysis
+        self.rows = []
+        # Без автозапуска очередь разбирается только командой flask analyze-pending
+        if Config.LLM_ANALYSIS_AUTOSTART:
+            start_analysis_worker(self.app)
+
+    def _assign_authors(self):
+        names_by_email = {normalize_email(row['author_email']): row['author_name'] for row in self.rows}
+        resolve_author_ids(names_by_email, self.author_ids)
+        for row in self.rows:
+            row['author_id'] = self.author_ids.get(normalize_email(row['author_email']))
+
+    def _apply_cached_evaluations(self):
+        # Одинаковые diff (cherry-pick, тот же коммит в другой ветке) оцениваются из кэша без обращения к GigaChat
+        keys = {
+            row['sha']: evaluation_cache_key(row['commit_content'], row['message'])
+            for row in self.rows if row['commit_content'] is not None
+        }
+        cached = get_cached_evaluations(keys.values())
+        to_analyze = []
+        for row in self.rows:
+            key = keys.get(row['sha'])
+            if key is None:
+                continue
+            if key in cached:
+                row.update(evaluation_columns(row['added_lines'], row['deleted_lines'], cached[key]))
+                self.cache_hits += 1
+            else:
+                to_analyze.append(row)
+                self.cache_misses += 1
+        return to_analyze
+
+def _summary_message(stats, writer):
+    msg = (f"Анализ завершен. Найдено {stats.found} коммитов. "
+           f"Добавлено в базу: {writer.saved}.")
+    if writer.queued_for_analysis:
+        msg += f" Поставлено в очередь LLM-анализа: {writer.queued_for_analysis}."
+    if writer.cache_hits or writer.cache_misses:
+        msg += f" Кэш LLM-оценок: попаданий {writer.cache_hits}, промахов {writer.cache_misses}."
+    if stats.failed:
+        msg += f" Не удалось загрузить: {stats.failed} (будут загружены при следующем запуске)."
+    return msg
+
 def collect_data_for_target(sfera_username, sfera_password, project_key, repo_name, branch_name, since, until, target_email=None, **kwargs):
+    if kwargs.get('ingestion_mode', Config.COLLECTOR_INGESTION_MODE) == 'async':
+        return asyncio.run(collect_data_for_target_async(
+            sfera_username, sfera_password, project_key, repo_name, branch_name, since, until, target_email, **kwargs
+        ))
+
     from app import app
+    stats = kwargs.get('progress') or CollectionProgress()
     with app.app_context():
         db.session.remove()
         
         logger.info("=== Начало сбора данных ===")
+        executor = None
         try:
             api = SferaAPI(username=sfera_username, password=sfera_password)
-            
-            project = db.session.query(Project).filter_by(key=project_key).first()
-            if not project:
-                project = Project(key=project_key, name=project_key, description=f"Project {project_key}")
-                db.session.add(project)
-                db.session.commit()
-
-            repo_unique_str = f"{project_key}/{repo_name}"
-            repo_id = int(hashlib.sha1(repo_unique_str.encode('utf-8')).hexdigest(), 16) % (10**9)
-
-            repository = db.session.query(Repository).filter_by(id=repo_id).first()
-            if not repository:
-                repository = Repository(id=repo_id, name=repo_name, project_key=project_key)
-                db.session.add(repository)
-                db.session.commit()
+            executor = ThreadPoolExecutor(max_workers=Config.SFERA_FETCH_WORKERS, thread_name_prefix="sfera_fetch")
+            repository = _get_or_create_repository(project_key, repo_name)
+            stats.repository_id = repository.id
 
             branches_to_scan = [branch_name]
             if branch_name == 'all':
                 branches_from_api = api.get_repo_branches(project_key, repo_name)
-                branches_to_scan = [b.get('name') for b in branches_from_api if b.get('name')]
+                branches_to_scan = _order_branches(branches_from_api)
 
             since_dt = parser.isoparse(since)
             until_dt = parser.isoparse(until)
+            sync_mode = kwargs.get('sync_mode', Config.COLLECTOR_SYNC_MODE)
             
-            total_commits_found_in_range = 0
-            total_newly_saved_commits = 0
+            writer = _CommitBatchWriter(app, Config.COLLECTOR_DB_BATCH_SIZE, stats)
+            # SHA, поставленные на загрузку в этом запуске: общие коммиты веток загружаются один раз
+            queued_shas = set()
+            shared_history = _SharedHistory()
 
             for b_name in branches_to_scan:
-                commits_from_api = api.get_repo_commits(project_key, repo_name, branch=b_name, since_dt=since_dt)
-                
-                if not commits_from_api:
-                    continue
-
-                commits_in_range = []
-                for commit_data in commits_from_api:
-                    commit_date_str = commit_data.get('created_at')
-                    if not commit_date_str: continue
+                branch_sync = _BranchSync(project_key, repo_name, b_name, sync_mode, since_dt, until_dt)
+                failed_before = stats.failed
+                pages_before = stats.pages
+                walk = shared_history.walk()
+                commits_stream = _iter_branch_commits(
+                    api.iter_repo_commit_pages(project_key, repo_name, branch=b_name, since_dt=since_dt),
+                    walk, since_dt, until_dt, target_email,
+                )
+                pages = _iter_new_commit_pages(commits_stream, Config.COLLECTOR_PAGE_SIZE, queued_shas, stats, branch_sync)
+                for commit_data, future in _iter_prefetched(executor, api, project_key, repo_name, pages):
                     sha = commit_data.get('hash')
-                    if not sha: continue
-                    
-                    commit_dt = parser.isoparse(commit_date_str)
-                    if since_dt <= commit_dt <= until_dt:
-                        is_valid = True
-                        if target_email and commit_data.get('author', {}).get('email', '').lower() != target_email.lower():
-                            is_valid = False
-                        
-                        if is_valid:
-                            commits_in_range.append(commit_data)
+                    try:
+                        payload = future.result()
+                    except Exception as e:
+                        logger.error(f"Ошибка загрузки деталей коммита {sha[:7]}: {e}")
+                        stats.failed += 1
+                        COLLECTOR_COMMITS.inc(result='failed')
+                        continue
+                    if payload is None:
+                        stats.failed += 1
+                        COLLECTOR_COMMITS.inc(result='failed')
+                        continue
+
+                    writer.add(_build_commit_row(commit_data, payload, repository.id, project_key))
                 
-                total_commits_found_in_range += len(commits_in_range)
+                writer.flush()
+                shared_history.add(walk)
+                COLLECTOR_BRANCH_PAGES.observe(stats.pages - pages_before)
+                if not target_email and stats.failed == failed_before:
+                    branch_sync.save()
 
-                for i, commit_data in enumerate(commits_in_range):
-                    sha = commit_data.get('hash')
-                    if not sha: continue
+            msg = _summary_message(stats, writer)
+            logger.info(msg)
+            return msg
 
-                    if db.session.query(Commit).filter_by(sha=sha).first():
-                        continue
-                        
-                    commit_details_response = api.get_commit_details(project_key, repo_name, sha)
-                    if not commit_details_response or 'data' not in commit_details_response:
-                        continue
-                    
-                    stats = commit_details_response['data'].get('stats', {})
-                    diff_response = api._get(f"projects/{project_key}/repos/{repo_name}/commits/{sha}/diff", params=None)
-                    diff_content_base64 = diff_response.get('data', {}).get('content', '')
-
-                    new_commit = Commit(
-                        sha=sha,
-                        message=commit_data.get('message', ''),
-                        author_name=commit_data.get('author', {}).get('name', 'N/A'),
-                        author_email=commit_data.get('author', {}).get('email', 'N/A'),
-                        commit_date=parser.isoparse(commit_data.get('created_at')),
-                        added_lines=stats.get('additions', 0),
-                        deleted_lines=stats.get('deletions', 0),
-                        repository_id=repository.id,
-                        project_key=project_key,
-                    )
+        except Exception as e:
+            logger.error(f"КРИТИЧЕСКАЯ ОШИБКА во время сбора данных: {e}", exc_info=True)
+            db.session.rollback()
+            stats.error = str(e)
+            return f"Ошибка: {e}"
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
 
-                    deterministic_kpi = calculate_deterministic_kpi(new_commit.added_lines, new_commit.deleted_lines)
-                    new_commit.kpi_difficulty = deterministic_kpi.get('difficulty')
-                    new_commit.kpi_quality = deterministic_kpi.get('quality')
-                    new_commit.kpi_size = deterministic_kpi.get('size')
+class _DbThread:
+    # Синхронный SQLAlchemy в корутинах блокировал бы цикл событий и все запросы к Sfera в полете.
+    # Поэтому все обращения асинхронного сбора к БД идут через один поток: запись страницы идет параллельно
+    # с загрузкой следующей, а сессия не используется из двух потоков одновременно. Время записи по-прежнему
+    # видно в collector_stage_seconds{stage="db_write"}.
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="collector_db")
+        self.context = contextvars.copy_context()
 
-                    try:
-                        diff_content = base64.b64decode(diff_content_base64).decode('utf-8', errors='ignore')
-                        new_commit.commit_content = diff_content
-                        
-                        analysis_result = analyze_commit_code(diff_content, new_commit.message)
-                        
-                        if analysis_result and "scores" in analysis_result and analysis_result["scores"]:
-                            scores = analysis_result["scores"]
-                            new_commit.llm_score_size = scores.get('size')
-                            new_commit.llm_score_quality = scores.get('quality')
-                            new_commit.llm_score_complexity = scores.get('complexity')
-                            new_commit.llm_score_comment = scores.get('comment')
-                            new_commit.llm_total_score = scores.get('sum')
-                            new_commit.llm_evaluation_text = analysis_result.get("raw_text")
-                            
-                            new_commit.final_commit_score = calculate_final_score(deterministic_kpi, scores)
-                            logger.info(f"Коммит {sha[:7]} успешно проанализирован.")
-                    except Exception as e:
-                        logger.error(f"Ошибка во время LLM-анализа коммита {sha[:7]}: {e}")
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.context.run, fn, *args)
 
-                    db.session.add(new_commit)
-                    total_newly_saved_commits += 1
-                
-                db.session.commit()
-                db.session.remove()
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
 
-            msg = (f"Анализ завершен. Найдено {total_commits_found_in_range} коммитов. "
-                   f"Добавлено в базу: {total_newly_saved_commits}.")
-            
+def _add_fetched_rows(writer, fetched, repository_id, project_key):
+    for commit_data, payload in fetched:
+        writer.add(_build_commit_row(commit_data, payload, repository_id, project_key))
+
+async def _persist_fetched_async(in_flight, repository_id, project_key, writer, stats, db_thread):
+    fetched = []
+    for commit_data, task in in_flight:
+        sha = commit_data.get('hash')
+        try:
+            payload = await task
+        except Exception as e:
+            logger.error(f"Ошибка загрузки деталей коммита {sha[:7]}: {e}")
+            stats.failed += 1
+            COLLECTOR_COMMITS.inc(result='failed')
+            continue
+        if payload is None:
+            stats.failed += 1
+            COLLECTOR_COMMITS.inc(result='failed')
+            continue
+        fetched.append((commit_data, payload))
+
+    if fetched:
+        await db_thread.run(_add_fetched_rows, writer, fetched, repository_id, project_key)
+
+async def collect_data_for_target_async(sfera_username, sfera_password, project_key, repo_name, branch_name, since, until, target_email=None, **kwargs):
+    from app import app
+    stats = kwargs.get('progress') or CollectionProgress()
+    with app.app_context():
+        db.session.remove()
+
+        logger.info("=== Начало асинхронного сбора данных ===")
+        db_thread = _DbThread()
+        try:
+            async with AsyncSferaAPI(username=sfera_username, password=sfera_password) as api:
+                repository_id = await db_thread.run(lambda: _get_or_create_repository(project_key, repo_name).id)
+                stats.repository_id = repository_id
+
+                branches_to_scan = [branch_name]
+                if branch_name == 'all':
+                    branches_from_api = await api.get_repo_branches(project_key, repo_name)
+                    branches_to_scan = _order_branches(branches_from_api)
+
+                since_dt = parser.isoparse(since)
+                until_dt = parser.isoparse(until)
+                sync_mode = kwargs.get('sync_mode', Config.COLLECTOR_SYNC_MODE)
+
+                writer = _CommitBatchWriter(app, Config.COLLECTOR_DB_BATCH_SIZE, stats)
+                # SHA, поставленные на загрузку в этом запуске: общие коммиты веток загружаются один раз
+                queued_shas = set()
+                shared_history = _SharedHistory()
+
+                for b_name in branches_to_scan:
+                    branch_sync = await db_thread.run(_BranchSync, project_key, repo_name, b_name, sync_mode, since_dt, until_dt)
+                    failed_before = stats.failed
+                    pages_before = stats.pages
+                    walk = shared_history.walk()
+                    commits_stream = _iter_branch_commits_async(
+                        api.iter_repo_commit_pages(project_key, repo_name, branch=b_name, since_dt=since_dt),
+                        walk, since_dt, until_dt, target_email,
+                    )
+                    # Задачи создаются на страницу вперед: запросы следующей страницы идут, пока сохраняется текущая
+                    in_flight = []
+                    pages = _iter_new_commit_pages_async(commits_stream, Config.COLLECTOR_PAGE_SIZE, queued_shas, stats, branch_sync, db_thread)
+                    async for page in pages:
+                        submitted = [
+                            (commit_data, asyncio.create_task(_fetch_commit_payload_async(api, project_key, repo_name, commit_data['hash'])))
+                            for commit_data in page
+                        ]
+                        await _persist_fetched_async(in_flight, repository_id, project_key, writer, stats, db_thread)
+                        in_flight = submitted
+                    await _persist_fetched_async(in_flight, repository_id, project_key, writer, stats, db_thread)
+
+                    await db_thread.run(writer.flush)
+                    shared_history.add(walk)
+                    COLLECTOR_BRANCH_PAGES.observe(stats.pages - pages_before)
+                    if not target_email and stats.failed == failed_before:
+                        await db_thread.run(branch_sync.save)
+
+            msg = _summary_message(stats, writer)
             logger.info(msg)
             return msg
 
         except Exception as e:
             logger.error(f"КРИТИЧЕСКАЯ ОШИБКА во время сбора данных: {e}", exc_info=True)
-            db.session.rollback()
-            return f"Ошибка: {e}"
\ No newline at end of file
+            await db_thread.run(db.session.rollback)
+            stats.error = str(e)
+            return f"Ошибка: {e}"
+        finally:
+            db_thread.shutdown()
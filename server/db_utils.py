@@ -0,0 +1,85 @@
+from itertools import islice
+from sqlalchemy import insert, update, case, and_
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def _dialect_insert(connection, table):
+    if connection.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    if connection.dialect.name == 'sqlite':
+        return sqlite.insert(table)
+    return None
+
+def insert_ignore(model, rows, index_elements, chunk_size=500):
+    # INSERT ... ON CONFLICT DO NOTHING для SQLite и PostgreSQL, обычная вставка пачками для прочих СУБД
+    if not rows:
+        return 0
+    connection = db.session.connection()
+    table = model.__table__
+    statement = _dialect_insert(connection, table)
+    if statement is not None:
+        statement = statement.on_conflict_do_nothing(index_elements=index_elements)
+    else:
+        statement = insert(table)
+
+    inserted = 0
+    for chunk in chunked(rows, chunk_size):
+        result = connection.execute(statement, chunk)
+        inserted += result.rowcount if result.rowcount >= 0 else len(chunk)
+    return inserted
+
+def insert_ignore_returning(model, rows, key, chunk_size=500):
+    # То же, что insert_ignore, но возвращает ключи действительно вставленных строк
+    if not rows:
+        return []
+    connection = db.session.connection()
+    table = model.__table__
+    statement = _dialect_insert(connection, table)
+    if statement is None:
+        insert_ignore(model, rows, [key], chunk_size)
+        return [row[key] for row in rows]
+
+    statement = statement.on_conflict_do_nothing(index_elements=[key]).returning(table.c[key])
+    inserted = []
+    for chunk in chunked(rows, chunk_size):
+        inserted.extend(connection.execute(statement, chunk).scalars())
+    return inserted
+
+def upsert_add(model, rows, index_elements, add_columns, max_columns=(), chunk_size=500):
+    # Вставляет строки, а при конфликте прибавляет add_columns к существующим значениям и берет максимум по max_columns.
+    # Ключи внутри одного вызова должны быть уникальны.
+    if not rows:
+        return
+    connection = db.session.connection()
+    table = model.__table__
+    statement = _dialect_insert(connection, table)
+    if statement is None:
+        for row in rows:
+            key_condition = and_(*(table.c[name] == row[name] for name in index_elements))
+            values = {name: table.c[name] + row[name] for name in add_columns}
+            values.update({
+                name: case((table.c[name].is_(None), row[name]), (table.c[name] < row[name], row[name]), else_=table.c[name])
+                for name in max_columns if row.get(name) is not None
+            })
+            if connection.execute(update(table).where(key_condition).values(values)).rowcount == 0:
+                connection.execute(insert(table), [row])
+        return
+
+    excluded = statement.excluded
+    set_ = {name: table.c[name] + excluded[name] for name in add_columns}
+    set_.update({
+        name: case(
+            (table.c[name].is_(None), excluded[name]),
+            (excluded[name] > table.c[name], excluded[name]),
+            else_=table.c[name],
+        )
+        for name in max_columns
+    })
+    statement = statement.on_conflict_do_update(index_elements=index_elements, set_=set_)
+    for chunk in chunked(rows, chunk_size):
+        connection.execute(statement, chunk)
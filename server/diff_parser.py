@@ -0,0 +1,91 @@
+import os
+import re
+from dataclasses import dataclass
+
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@")
+
+@dataclass
+class FileChange:
+    path: str
+    extension: str
+    added_lines: int = 0
+    deleted_lines: int = 0
+
+def _strip_prefix(path):
+    path = path.strip()
+    if path.startswith('"') and path.endswith('"'):
+        path = path[1:-1]
+    if path.startswith(('a/', 'b/')):
+        path = path[2:]
+    return path
+
+def _path_from_git_header(line):
+    # diff --git a/path b/path: путь берется из правой части, для путей с пробелами это надежнее
+    _, _, rest = line.partition('diff --git ')
+    marker = rest.rfind(' b/')
+    return _strip_prefix(rest[marker + 1:] if marker != -1 else rest)
+
+def parse_diff(diff_text, allowed_extensions=None):
+    # Разбирает unified diff на файлы с числом добавленных и удаленных строк
+    files = []
+    current = None
+    # Сколько строк старой и новой версии осталось в текущем hunk: по ним видно, где hunk кончается,
+    # даже если следующий файл идет без заголовка diff --git
+    old_left = new_left = 0
+    old_path = None
+    seen_hunk = False
+
+    def start(path):
+        nonlocal current, seen_hunk
+        current = FileChange(path=path, extension=os.path.splitext(path)[1].lower())
+        files.append(current)
+        seen_hunk = False
+
+    for line in (diff_text or '').splitlines():
+        if (old_left > 0 or new_left > 0) and current is not None and not line.startswith('diff --git '):
+            if line.startswith('+'):
+                current.added_lines += 1
+                new_left -= 1
+            elif line.startswith('-'):
+                current.deleted_lines += 1
+                old_left -= 1
+            elif line.startswith('\\'):
+                pass
+            else:
+                old_left -= 1
+                new_left -= 1
+            continue
+        if line.startswith('diff --git '):
+            start(_path_from_git_header(line))
+            old_left = new_left = 0
+            old_path = None
+        elif line.startswith('--- '):
+            old_path = _strip_prefix(line[4:])
+        elif line.startswith('+++ '):
+            new_path = _strip_prefix(line[4:])
+            path = old_path if new_path == '/dev/null' else new_path
+            if current is None or seen_hunk:
+                start(path)
+            elif path and path != '/dev/null' and path != current.path:
+                current.path = path
+                current.extension = os.path.splitext(path)[1].lower()
+        elif line.startswith('rename to ') and current is not None:
+            current.path = line[len('rename to '):].strip()
+            current.extension = os.path.splitext(current.path)[1].lower()
+        elif line.startswith('@@'):
+            match = _HUNK_HEADER.match(line)
+            if match:
+                old_left = int(match.group(1) or 1)
+                new_left = int(match.group(2) or 1)
+                seen_hunk = True
+
+    merged = {}
+    for change in files:
+        if allowed_extensions is not None and change.extension not in allowed_extensions:
+            continue
+        if change.path in merged:
+            merged[change.path].added_lines += change.added_lines
+            merged[change.path].deleted_lines += change.deleted_lines
+        else:
+            merged[change.path] = change
+    return list(merged.values())
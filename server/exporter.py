@@ -0,0 +1,124 @@
+import csv
+import io
+import zlib
+from datetime import timezone
+from models import db, Commit, CommitContent
+from commit_filters import apply_commit_filters
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+EXPORT_COLUMNS = (
+    'sha', 'project_key', 'repository_id', 'author_name', 'author_email', 'commit_date', 'message',
+    'added_lines', 'deleted_lines', 'kpi_difficulty', 'kpi_quality', 'kpi_size',
+    'llm_score_size', 'llm_score_quality', 'llm_score_complexity', 'llm_score_comment', 'llm_total_score',
+    'final_commit_score',
+)
+EXPORT_FORMATS = ('csv', 'arrow', 'parquet')
+
+def columnar_available():
+    return pa is not None
+
+def export_columns(include_diff=False):
+    return EXPORT_COLUMNS + ('diff',) if include_diff else EXPORT_COLUMNS
+
+def _decode_diff(encoding, data):
+    if data is None:
+        return None
+    raw = zlib.decompress(data) if encoding == 'zlib' else data
+    return raw.decode('utf-8')
+
+def iter_export_batches(args, include_diff=False, batch_size=5000):
+    # Читает выборку проекциями колонок серверным курсором: память не зависит от размера выгрузки.
+    # diff читаются только по запросу, из отдельной таблицы
+    columns = [getattr(Commit, name) for name in EXPORT_COLUMNS]
+    if include_diff:
+        columns += [CommitContent.encoding, CommitContent.data]
+    query = apply_commit_filters(db.session.query(*columns), args)
+    if include_diff:
+        query = query.outerjoin(CommitContent, CommitContent.sha == Commit.sha)
+    query = query.order_by(Commit.commit_date, Commit.sha).yield_per(batch_size)
+
+    batch = []
+    for row in query:
+        values = list(row[:len(EXPORT_COLUMNS)])
+        commit_date = values[5]
+        values[5] = (commit_date if commit_date.tzinfo else commit_date.replace(tzinfo=timezone.utc)).astimezone(timezone.utc)
+        if include_diff:
+            values.append(_decode_diff(row[-2], row[-1]))
+        batch.append(values)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def iter_csv(batches, include_diff=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(export_columns(include_diff))
+    for batch in batches:
+        for values in batch:
+            values[5] = values[5].isoformat()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _arrow_schema(include_diff):
+    fields = [
+        ('sha', pa.string()), ('project_key', pa.string()), ('repository_id', pa.int64()),
+        ('author_name', pa.string()), ('author_email', pa.string()), ('commit_date', pa.timestamp('us', tz='UTC')),
+        ('message', pa.string()), ('added_lines', pa.int64()), ('deleted_lines', pa.int64()),
+        ('kpi_difficulty', pa.float64()), ('kpi_quality', pa.float64()), ('kpi_size', pa.int64()),
+        ('llm_score_size', pa.int64()), ('llm_score_quality', pa.int64()), ('llm_score_complexity', pa.int64()),
+        ('llm_score_comment', pa.int64()), ('llm_total_score', pa.int64()), ('final_commit_score', pa.float64()),
+    ]
+    if include_diff:
+        fields.append(('diff', pa.string()))
+    return pa.schema(fields)
+
+def _record_batch(batch, schema):
+    return pa.record_batch([pa.array(column, type=field.type) for column, field in zip(zip(*batch), schema)], schema=schema)
+
+class _ChunkSink(io.RawIOBase):
+    # Файлоподобный приемник: накопленные байты забираются после каждой записанной пачки
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def iter_arrow_ipc(batches, include_diff=False):
+    # Arrow IPC stream: читается pyarrow.ipc.open_stream, pandas и polars
+    schema = _arrow_schema(include_diff)
+    sink = _ChunkSink()
+    with pa_ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(_record_batch(batch, schema))
+            yield sink.drain()
+    yield sink.drain()
+
+def write_parquet(batches, path, include_diff=False):
+    schema = _arrow_schema(include_diff)
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            writer.write_batch(_record_batch(batch, schema))
+            rows += len(batch)
+    return rows
@@ -0,0 +1,56 @@
+import logging
+from sqlalchemy import select
+from config import Config
+from models import db, Commit, CommitContent, CommitFile
+from db_utils import insert_ignore
+from diff_parser import parse_diff
+
+logger = logging.getLogger(__name__)
+
+def file_rows_for_commit(commit_row, diff_text):
+    # diff разбирается один раз при сохранении коммита, метрики читают только commit_files
+    return [
+        {
+            'commit_sha': commit_row['sha'],
+            'path': change.path,
+            'extension': change.extension,
+            'added_lines': change.added_lines,
+            'deleted_lines': change.deleted_lines,
+            'project_key': commit_row['project_key'],
+            'repository_id': commit_row['repository_id'],
+            'author_id': commit_row.get('author_id'),
+            'commit_date': commit_row['commit_date'],
+        }
+        for change in parse_diff(diff_text, Config.ALLOWED_EXTENSIONS)
+    ]
+
+def reindex_commit_files(batch_size=500):
+    # Полная переиндексация по сохраненным diff: для старых коммитов или после смены ALLOWED_EXTENSIONS
+    db.session.query(CommitFile).delete(synchronize_session=False)
+    db.session.commit()
+    indexed = 0
+    last_sha = ''
+    while True:
+        commits = db.session.execute(
+            select(Commit.sha, Commit.project_key, Commit.repository_id, Commit.author_id, Commit.commit_date)
+            .where(Commit.sha > last_sha)
+            .order_by(Commit.sha)
+            .limit(batch_size)
+        ).mappings().all()
+        if not commits:
+            break
+        last_sha = commits[-1]['sha']
+        contents = {
+            content.sha: content.text
+            for content in CommitContent.query.filter(CommitContent.sha.in_([c['sha'] for c in commits]))
+        }
+        rows = []
+        for commit in commits:
+            if commit['sha'] in contents:
+                rows.extend(file_rows_for_commit(commit, contents[commit['sha']]))
+        insert_ignore(CommitFile, rows, index_elements=['commit_sha', 'path'])
+        db.session.commit()
+        db.session.expunge_all()
+        indexed += len(commits)
+        logger.info(f"Проиндексированы файлы {indexed} коммитов")
+    return indexed
@@ -0,0 +1,140 @@
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Метрики процесса в текстовом формате Prometheus. Значения живут в памяти процесса и сбрасываются при перезапуске,
+# при нескольких воркерах gunicorn каждый отдает свои
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+def _format_labels(label_names, values, extra=()):
+    pairs = list(zip(label_names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+class Histogram:
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', _format_value(bound))])} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}"
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+SFERA_REQUEST_SECONDS = registry.register(Histogram(
+    'sfera_request_duration_seconds', 'Длительность запроса к API Sfera с учетом повторов', ('endpoint', 'outcome'),
+))
+SFERA_RETRIES = registry.register(Counter(
+    'sfera_request_retries_total', 'Повторы запросов к API Sfera после временных ошибок', ('reason',),
+))
+COLLECTOR_BRANCH_PAGES = registry.register(Histogram(
+    'collector_branch_pages', 'Число загруженных страниц коммитов на ветку за один сбор', buckets=COUNT_BUCKETS,
+))
+COLLECTOR_STAGE_SECONDS = registry.register(Histogram(
+    'collector_stage_duration_seconds', 'Длительность этапов сбора: декодирование diff, запись пачки, фиксация транзакции', ('stage',),
+))
+COLLECTOR_COMMITS = registry.register(Counter(
+    'collector_commits_total', 'Коммиты, обработанные сборщиком', ('result',),
+))
+LLM_REQUEST_SECONDS = registry.register(Histogram(
+    'llm_request_duration_seconds', 'Длительность запроса оценки к GigaChat', ('outcome',),
+))
+LLM_TOKENS = registry.register(Counter(
+    'llm_tokens_total', 'Токены, израсходованные на оценку коммитов', ('kind',),
+))
+CACHE_LOOKUPS = registry.register(Counter(
+    'cache_lookups_total', 'Обращения к кэшам LLM-оценок и ответов API', ('cache', 'result'),
+))
+
+_ENDPOINT_PATTERNS = (
+    (re.compile(r'^projects/?$'), 'projects'),
+    (re.compile(r'^projects/[^/]+/repos/?$'), 'repos'),
+    (re.compile(r'^projects/[^/]+/repos/[^/]+/branches/?$'), 'branches'),
+    (re.compile(r'^projects/[^/]+/repos/[^/]+/commits/?$'), 'commits'),
+    (re.compile(r'^projects/[^/]+/repos/[^/]+/commits/[^/]+/diff/?$'), 'commit_diff'),
+    (re.compile(r'^projects/[^/]+/repos/[^/]+/commits/[^/]+/?$'), 'commit_details'),
+)
+
+def endpoint_label(endpoint):
+    # Ключи проектов, имена репозиториев и SHA в метку не попадают, иначе число рядов неограниченно
+    for pattern, label in _ENDPOINT_PATTERNS:
+        if pattern.match(endpoint):
+            return label
+    return 'other'
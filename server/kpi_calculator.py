@@ -1,4 +1,5 @@
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -38,4 +39,78 @@ def calculate_final_score(deterministic_scores: dict, llm_scores: dict) -> float
         return deterministic_sum
 
     final_score = (deterministic_sum + llm_sum) / 2
-    return round(final_score, 2)
\ No newline at end of file
+    return round(final_score, 2)
+
+# Векторные версии для массового пересчета. Значения берутся из таблиц, построенных скалярными функциями,
+# поэтому результат совпадает с ними до бита, включая округление.
+# Размер таблицы - число строк, с которого KPI перестает меняться. Он ищется при импорте, чтобы после
+# изменения коэффициентов формулы таблицы не обрезали значения молча.
+LLM_SUM_LIMIT = 40
+KPI_SEARCH_MAX_LINES = 1 << 20
+
+def _kpi_signature(lines):
+    kpi = calculate_deterministic_kpi(lines, 0)
+    return kpi["difficulty"], kpi["quality"], kpi["size"]
+
+def _find_saturation(max_lines=KPI_SEARCH_MAX_LINES):
+    # Наименьшее число строк, начиная с которого KPI постоянен; None, если до max_lines насыщения нет
+    hi = 1
+    while _kpi_signature(hi) != _kpi_signature(hi * 10) or _kpi_signature(hi) != _kpi_signature(hi * 1000):
+        hi *= 2
+        if hi > max_lines:
+            return None
+    saturated = _kpi_signature(hi)
+    limit = hi
+    while limit > 0 and _kpi_signature(limit - 1) == saturated:
+        limit -= 1
+    return limit
+
+KPI_LINES_LIMIT = _find_saturation()
+# Без насыщения таблица покрывает частые размеры коммитов, остальные считаются скалярной функцией
+KPI_SATURATED = KPI_LINES_LIMIT is not None
+if not KPI_SATURATED:
+    logger.warning("KPI не выходит на насыщение, векторный расчет больших коммитов пойдет по скалярной формуле")
+    KPI_LINES_LIMIT = 4096
+
+def _build_tables():
+    kpis = [calculate_deterministic_kpi(lines, 0) for lines in range(KPI_LINES_LIMIT + 1)]
+    difficulty = np.array([kpi["difficulty"] for kpi in kpis], dtype=np.float64)
+    quality = np.array([kpi["quality"] for kpi in kpis], dtype=np.float64)
+    size = np.array([kpi["size"] for kpi in kpis], dtype=np.int64)
+    final = np.array(
+        [[calculate_final_score(kpi, {"sum": llm_sum}) for llm_sum in range(LLM_SUM_LIMIT + 1)] for kpi in kpis],
+        dtype=np.float64,
+    )
+    return difficulty, quality, size, final
+
+_DIFFICULTY, _QUALITY, _SIZE, _FINAL = _build_tables()
+
+def _lines_count(added_lines, deleted_lines):
+    # Отрицательного числа строк не бывает, поэтому нижняя граница таблицы - 0
+    return np.maximum(np.asarray(added_lines, dtype=np.int64) + np.asarray(deleted_lines, dtype=np.int64), 0)
+
+def _outside_table(lines):
+    return np.flatnonzero(lines > KPI_LINES_LIMIT) if not KPI_SATURATED else np.empty(0, dtype=np.int64)
+
+def calculate_deterministic_kpi_array(added_lines, deleted_lines):
+    lines = _lines_count(added_lines, deleted_lines)
+    index = np.minimum(lines, KPI_LINES_LIMIT)
+    difficulty, quality, size = _DIFFICULTY[index], _QUALITY[index], _SIZE[index]
+    for i in _outside_table(lines):
+        kpi = calculate_deterministic_kpi(int(lines[i]), 0)
+        difficulty[i], quality[i], size[i] = kpi["difficulty"], kpi["quality"], kpi["size"]
+    return difficulty, quality, size
+
+def calculate_final_score_array(added_lines, deleted_lines, llm_sums):
+    lines = _lines_count(added_lines, deleted_lines)
+    index = np.minimum(lines, KPI_LINES_LIMIT)
+    llm_sums = np.asarray(llm_sums, dtype=np.int64)
+    in_table = (llm_sums >= 0) & (llm_sums <= LLM_SUM_LIMIT)
+    if not KPI_SATURATED:
+        in_table &= lines <= KPI_LINES_LIMIT
+    scores = np.empty(len(lines), dtype=np.float64)
+    scores[in_table] = _FINAL[index[in_table], llm_sums[in_table]]
+    for i in np.flatnonzero(~in_table):
+        kpi = calculate_deterministic_kpi(int(lines[i]), 0)
+        scores[i] = calculate_final_score(kpi, {"sum": int(llm_sums[i])})
+    return scores
@@ -0,0 +1,75 @@
+import logging
+import numpy as np
+from sqlalchemy import select, update
+from models import db, Commit
+from kpi_calculator import calculate_deterministic_kpi_array, calculate_final_score_array
+from rollups import apply_score_changes
+
+logger = logging.getLogger(__name__)
+
+def _as_float(values):
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+def _changed(old, new):
+    return ~((old == new) | (np.isnan(old) & np.isnan(new)))
+
+def _optional(value):
+    return None if np.isnan(value) else float(value)
+
+def recompute_kpis(batch_size=10000, dry_run=False):
+    # Пересчет детерминированных KPI и итоговой оценки всех коммитов после изменения формулы.
+    # Коммиты читаются пачками по ключу, считаются векторно, изменившиеся строки пишутся пакетным UPDATE.
+    # Итоговая оценка есть только у проанализированных коммитов (llm_evaluation_text заполнен).
+    processed = changed_total = 0
+    last_sha = ''
+    while True:
+        rows = db.session.execute(
+            select(
+                Commit.sha, Commit.added_lines, Commit.deleted_lines, Commit.llm_total_score,
+                Commit.llm_evaluation_text.isnot(None),
+                Commit.kpi_difficulty, Commit.kpi_quality, Commit.kpi_size, Commit.final_commit_score,
+                Commit.commit_date, Commit.repository_id, Commit.author_id, Commit.project_key,
+            ).where(Commit.sha > last_sha).order_by(Commit.sha).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_sha = rows[-1][0]
+        (shas, added, deleted, llm_sums, analyzed,
+         old_difficulty, old_quality, old_size, old_final, *rollup_keys) = zip(*rows)
+
+        added = np.array([value or 0 for value in added], dtype=np.int64)
+        deleted = np.array([value or 0 for value in deleted], dtype=np.int64)
+        analyzed = np.array(analyzed, dtype=bool)
+        difficulty, quality, size = calculate_deterministic_kpi_array(added, deleted)
+        final = calculate_final_score_array(added, deleted, [value or 0 for value in llm_sums])
+        final[~analyzed] = np.nan
+
+        old_final = _as_float(old_final)
+        changed = (
+            _changed(_as_float(old_difficulty), difficulty)
+            | _changed(_as_float(old_quality), quality)
+            | _changed(_as_float(old_size), size.astype(np.float64))
+            | _changed(old_final, final)
+        )
+        indexes = np.flatnonzero(changed)
+        if len(indexes) and not dry_run:
+            db.session.execute(update(Commit), [
+                {
+                    'sha': shas[i],
+                    'kpi_difficulty': float(difficulty[i]),
+                    'kpi_quality': float(quality[i]),
+                    'kpi_size': int(size[i]),
+                    'final_commit_score': _optional(final[i]),
+                }
+                for i in indexes
+            ])
+            commit_dates, repository_ids, author_ids, project_keys = rollup_keys
+            apply_score_changes(
+                (commit_dates[i], repository_ids[i], author_ids[i], project_keys[i], _optional(old_final[i]), _optional(final[i]))
+                for i in indexes if _changed(old_final[i:i + 1], final[i:i + 1])[0]
+            )
+            db.session.commit()
+        processed += len(rows)
+        changed_total += len(indexes)
+        logger.info(f"Пересчет KPI: обработано {processed}, изменено {changed_total}")
+    return processed, changed_total
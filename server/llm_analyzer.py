@@ -1,17 +1,27 @@
 import logging
 import re
+import time
 from gigachat import GigaChat
 from config import Config
+from instrumentation import LLM_REQUEST_SECONDS, LLM_TOKENS
 
 logger = logging.getLogger(__name__)
 
+# Увеличивать при любом изменении промпта: от версии зависит ключ кэша оценок
+PROMPT_VERSION = 1
+MAX_DIFF_CHARS = 4000
+
 giga = None
 if Config.GIGACHAT_CREDENTIALS:
     try:
+        endpoints = {
+            key: value for key, value in (('base_url', Config.GIGACHAT_BASE_URL), ('auth_url', Config.GIGACHAT_AUTH_URL)) if value
+        }
         giga = GigaChat(
             credentials=Config.GIGACHAT_CREDENTIALS,
             verify_ssl_certs=False,
-            model="GigaChat-Max"
+            model="GigaChat-Max",
+            **endpoints
         )
         logger.info("GigaChat клиент успешно инициализирован.")
     except Exception as e:
@@ -43,8 +53,8 @@ def analyze_commit_code(diff_content: str, commit_message: str) -> dict:
     if not giga:
         return {}
 
-    if len(diff_content) > 4000:
-        diff_content = diff_content[:4000] + "\n... [содержимое обрезано]"
+    if len(diff_content) > MAX_DIFF_CHARS:
+        diff_content = diff_content[:MAX_DIFF_CHARS] + "\n... [содержимое обрезано]"
 
     prompt = f"""Ты строгий тимлид, который точен в оценках. Не усредняй баллы и следуй критериям буквально. Оцени следующий коммит СТРОГО по указанным критериям:
 
@@ -91,8 +101,14 @@ def analyze_commit_code(diff_content: str, commit_message: str) -> dict:
     Сумма: X+Y+Z+U
     Общий комментарий: [здесь дай конкретные рекомендации по улучшению коммита]"""
 
+    started = time.perf_counter()
     try:
         response = giga.chat(prompt)
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome='ok')
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            LLM_TOKENS.inc(usage.prompt_tokens or 0, kind='prompt')
+            LLM_TOKENS.inc(usage.completion_tokens or 0, kind='completion')
         evaluation_text = response.choices[0].message.content
         logger.info(f"GigaChat вернул оценку:\n{evaluation_text}")
         
@@ -104,5 +120,6 @@ def analyze_commit_code(diff_content: str, commit_message: str) -> dict:
             "recommendation": parsed_data.get("recommendation")
         }
     except Exception as e:
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome='error')
         logger.error(f"Ошибка при взаимодействии с GigaChat: {e}", exc_info=True)
         return {}
\ No newline at end of file
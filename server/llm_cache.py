@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import re
+import threading
+from datetime import datetime, timezone
+from sqlalchemy import func
+from config import Config
+from models import db, LLMEvaluationCache
+from db_utils import chunked, insert_ignore
+from instrumentation import CACHE_LOOKUPS
+from llm_analyzer import PROMPT_VERSION, MAX_DIFF_CHARS
+
+logger = logging.getLogger(__name__)
+
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+def normalize_diff(diff_content: str) -> str:
+    # У cherry-pick и того же коммита в другой ветке отличаются строки index и номера строк в hunk,
+    # на оценку они не влияют и в ключ не входят. У revert строки +/- поменяны местами, ключ у него свой
+    lines = []
+    for line in diff_content.replace('\r\n', '\n').split('\n'):
+        if line.startswith('index '):
+            continue
+        lines.append(_HUNK_HEADER.sub('@@', line.rstrip()))
+    return '\n'.join(lines)[:MAX_DIFF_CHARS]
+
+def evaluation_cache_key(diff_content: str, commit_message: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"v{PROMPT_VERSION}\0".encode('utf-8'))
+    digest.update(normalize_diff(diff_content).encode('utf-8'))
+    digest.update(b"\0")
+    digest.update((commit_message or '').strip().encode('utf-8'))
+    return digest.hexdigest()
+
+def _record(hits, misses):
+    CACHE_LOOKUPS.inc(hits, cache='llm_evaluation', result='hit')
+    CACHE_LOOKUPS.inc(misses, cache='llm_evaluation', result='miss')
+    with _stats_lock:
+        _stats["hits"] += hits
+        _stats["misses"] += misses
+
+def cache_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+def get_cached_evaluations(keys, record=True) -> dict:
+    # record=False для повторной проверки того же коммита: промах уже учтен при сборе
+    keys = set(keys)
+    if not keys:
+        return {}
+    found = {}
+    for chunk in chunked(keys, 500):
+        for entry in db.session.query(LLMEvaluationCache).filter(LLMEvaluationCache.key.in_(chunk)):
+            found[entry.key] = {"scores": entry.scores, "raw_text": entry.raw_text}
+    if found:
+        db.session.query(LLMEvaluationCache).filter(LLMEvaluationCache.key.in_(list(found))).update(
+            {"hits": LLMEvaluationCache.hits + 1, "last_used_at": datetime.now(timezone.utc)},
+            synchronize_session=False,
+        )
+    if record:
+        _record(len(found), len(keys) - len(found))
+    return found
+
+def get_cached_evaluation(key: str, record=True):
+    return get_cached_evaluations([key], record).get(key)
+
+def store_evaluation(key: str, analysis_result: dict):
+    now = datetime.now(timezone.utc)
+    insert_ignore(LLMEvaluationCache, [{
+        "key": key,
+        "prompt_version": PROMPT_VERSION,
+        "scores": analysis_result.get("scores"),
+        "raw_text": analysis_result.get("raw_text"),
+        "hits": 0,
+        "created_at": now,
+        "last_used_at": now,
+    }], index_elements=['key'])
+
+def evict_lru(max_entries=None):
+    # Удаляет давно не использованные оценки сверх лимита, а также оценки старых версий промпта
+    max_entries = max_entries if max_entries is not None else Config.LLM_CACHE_MAX_ENTRIES
+    removed = db.session.query(LLMEvaluationCache).filter(
+        LLMEvaluationCache.prompt_version != PROMPT_VERSION
+    ).delete(synchronize_session=False)
+
+    total = db.session.query(func.count(LLMEvaluationCache.key)).scalar()
+    if total > max_entries:
+        oldest = db.session.query(LLMEvaluationCache.key).order_by(LLMEvaluationCache.last_used_at).limit(total - max_entries)
+        removed += db.session.query(LLMEvaluationCache).filter(
+            LLMEvaluationCache.key.in_(oldest.scalar_subquery())
+        ).delete(synchronize_session=False)
+    db.session.commit()
+    if removed:
+        logger.info(f"Из кэша LLM-оценок удалено записей: {removed}")
+    return removed
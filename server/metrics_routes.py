@@ -1,44 +1,30 @@
 from flask import jsonify, request
 from flask_jwt_extended import jwt_required
+from response_cache import cached_response
 from sqlalchemy import func, distinct
 from collections import defaultdict, Counter
 from datetime import datetime, timedelta
 import re
-import numpy as np
 
-from models import db, Commit, Repository
+from models import db, Commit, CommitFile
+from commit_filters import apply_commit_filters
+from rollups import totals_by_author
 
 def register_metrics_routes(app):
 
     def apply_filters_to_query(query):
-        project_key = request.args.get('project_key')
-        repo_name = request.args.get('repo_name')
-        author_email = request.args.get('author_email')
-        since = request.args.get('since')
-        until = request.args.get('until')
-
-        if project_key:
-            query = query.filter(Commit.project_key == project_key)
-        if repo_name:
-            repo = Repository.query.filter_by(name=repo_name, project_key=project_key).first()
-            if repo:
-                query = query.filter(Commit.repository_id == repo.id)
-        if author_email:
-            query = query.filter(Commit.author_email.ilike(f"%{author_email}%"))
-        if since:
-            query = query.filter(Commit.commit_date >= since)
-        if until:
-            query = query.filter(Commit.commit_date <= until)
-        
-        return query
+        return apply_commit_filters(query, request.args)
 
     @app.route('/api/metrics/dashboard_stats', methods=['GET'])
     @jwt_required()
+    @cached_response
     def get_dashboard_stats():
-        base_query = db.session.query(Commit)
-        filtered_query = apply_filters_to_query(base_query)
+        try:
+            totals = {author_id: entry for author_id, entry in totals_by_author(request.args).items() if entry['commit_count']}
+        except ValueError:
+            return jsonify({"error": "Некорректный формат даты"}), 400
 
-        total_commits = filtered_query.count()
+        total_commits = sum(entry['commit_count'] for entry in totals.values())
         
         if total_commits == 0:
             return jsonify({
@@ -47,76 +33,71 @@ def register_metrics_routes(app):
                 "commit_activity": {"labels": [], "data": []}
             }), 200
 
-        summary_data = filtered_query.with_entities(
-            func.sum(Commit.added_lines + Commit.deleted_lines),
-            func.count(distinct(Commit.author_name)),
-            func.max(Commit.commit_date)
-        ).first()
-
+        last_commit_date = max(entry['last_commit_at'] for entry in totals.values())
         summary = {
             "total_commits": total_commits,
-            "total_lines_changed": int(summary_data[0]) if summary_data[0] else 0,
-            "active_contributors": summary_data[1] or 0,
-            "last_commit_date": summary_data[2].isoformat() if summary_data[2] else None,
+            "total_lines_changed": sum(entry['added_lines'] + entry['deleted_lines'] for entry in totals.values()),
+            "active_contributors": len(totals),
+            "last_commit_date": last_commit_date.isoformat() if last_commit_date else None,
         }
         
-        # Получаем всех контрибьюторов для выпадающего списка
-        all_contributors_query = filtered_query.with_entities(
-            Commit.author_name, Commit.author_email
-        ).distinct().all()
+        named = {author_id: entry for author_id, entry in totals.items() if author_id is not None and entry['email'] is not None}
         
-        top_contributors_query = filtered_query.with_entities(
-            Commit.author_name,
-            func.avg(Commit.final_commit_score).label('avg_kpi'),
-            func.count(Commit.sha).label('commit_count')
-        ).filter(Commit.final_commit_score.isnot(None))\
-         .group_by(Commit.author_name)\
-         .order_by(func.avg(Commit.final_commit_score).desc())\
-         .limit(5).all()
+        scored = sorted(
+            ((entry['name'], entry['score_sum'] / entry['score_count'], entry['score_count'])
+             for entry in named.values() if entry['score_count']),
+            key=lambda item: item[1], reverse=True,
+        )[:5]
         
         max_possible_score = 17.5
         top_contributors = [
-            {"author": author, "average_kpi": int((avg_kpi / max_possible_score) * 100) if avg_kpi else 0, "commits": count}
-            for author, avg_kpi, count in top_contributors_query
+            {"author": name, "average_kpi": int((avg_kpi / max_possible_score) * 100) if avg_kpi else 0, "commits": count}
+            for name, avg_kpi, count in scored
         ]
         
         return jsonify({
             "summary": summary, 
             "top_contributors": top_contributors,
-            "all_contributors": [{"name": name, "email": email} for name, email in all_contributors_query]
+            # Все контрибьюторы для выпадающего списка
+            "all_contributors": [{"name": entry['name'], "email": entry['email']} for entry in named.values()]
         }), 200
 
     @app.route('/api/metrics/user_summary', methods=['GET'])
     @jwt_required()
+    @cached_response
     def get_user_summary():
         author_email = request.args.get('author_email')
         if not author_email:
             return jsonify({"error": "author_email is required"}), 400
 
-        base_query = db.session.query(Commit).filter(Commit.author_email.ilike(f"%{author_email}%"))
-        query_with_filters = apply_filters_to_query(base_query)
-        
-        user_commits = query_with_filters.all()
+        # Одна агрегирующая строка вместо загрузки всех коммитов автора
+        score_columns = {
+            "качество": Commit.llm_score_quality,
+            "сложность": Commit.llm_score_complexity,
+            "комментарий": Commit.llm_score_comment,
+        }
+        aggregates = [func.count(Commit.sha), func.avg(Commit.final_commit_score)]
+        for column in score_columns.values():
+            aggregates += [func.avg(column), func.count(func.nullif(column, 0))]
+        row = apply_filters_to_query(db.session.query(*aggregates)).one()
+        total_commits, avg_score = row[0], row[1]
 
-        if not user_commits:
+        if not total_commits:
             return jsonify({"summary": {"total_commits": 0}, "recommendation": "Нет данных для анализа."}), 200
 
         # Сводка KPI
-        scores = [c.final_commit_score for c in user_commits if c.final_commit_score is not None]
-        avg_score = np.mean(scores) if scores else 0
         max_possible_score = 17.5
-        avg_kpi_100 = int((avg_score / max_possible_score) * 100)
+        avg_kpi_100 = int(((avg_score or 0) / max_possible_score) * 100)
         
         summary = {
-            "total_commits": len(user_commits),
+            "total_commits": total_commits,
             "average_kpi": avg_kpi_100
         }
 
-        # Генерация рекомендации
+        # Генерация рекомендации: категории без ненулевых оценок считаются максимальными
         avg_llm_scores = {
-            "качество": np.mean([c.llm_score_quality for c in user_commits if c.llm_score_quality is not None]) if any(c.llm_score_quality for c in user_commits) else 5,
-            "сложность": np.mean([c.llm_score_complexity for c in user_commits if c.llm_score_complexity is not None]) if any(c.llm_score_complexity for c in user_commits) else 5,
-            "комментарий": np.mean([c.llm_score_comment for c in user_commits if c.llm_score_comment is not None]) if any(c.llm_score_comment for c in user_commits) else 5,
+            category: row[2 + 2 * index] if row[3 + 2 * index] else 5
+            for index, category in enumerate(score_columns)
         }
         
         lowest_category = min(avg_llm_scores, key=avg_llm_scores.get)
@@ -128,4 +109,29 @@ def register_metrics_routes(app):
         }
         recommendation = f"Анализ коммитов за выбранный период показывает, что ваш средний KPI составляет {avg_kpi_100}/100. \n\n{recommendations_map.get(lowest_category, 'Продолжайте в том же духе!')}"
 
-        return jsonify({"summary": summary, "recommendation": recommendation}), 200
\ No newline at end of file
+        return jsonify({"summary": summary, "recommendation": recommendation}), 200
+
+    @app.route('/api/metrics/hotspots', methods=['GET'])
+    @jwt_required()
+    @cached_response
+    def get_hotspots():
+        changes = func.count(CommitFile.commit_sha).label('changes')
+        query = apply_commit_filters(db.session.query(CommitFile.path, changes), request.args, model=CommitFile)
+        hotspots = query.group_by(CommitFile.path).order_by(changes.desc(), CommitFile.path).limit(10).all()
+        return jsonify([{"file": path, "changes": count} for path, count in hotspots]), 200
+
+    @app.route('/api/metrics/temporal_patterns', methods=['GET'])
+    @jwt_required()
+    @cached_response
+    def get_temporal_patterns():
+        # ?weight=score суммирует итоговые оценки коммитов вместо их количества
+        weighted = request.args.get('weight') == 'score'
+        value = func.sum(Commit.final_commit_score) if weighted else func.count(Commit.sha)
+        query = apply_commit_filters(db.session.query(Commit.time_bucket, value), request.args)
+        rows = query.filter(Commit.time_bucket.isnot(None)).group_by(Commit.time_bucket).all()
+
+        days = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+        return jsonify([
+            {"day": days[bucket // 24], "hour": bucket % 24, "commits": round(total, 2) if weighted else total}
+            for bucket, total in sorted(rows) if total
+        ]), 200
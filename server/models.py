@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from datetime import datetime, timezone
+import zlib
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
@@ -28,19 +29,50 @@ class Project(db.Model):
 
 class Repository(db.Model):
     __tablename__ = 'repositories'
+    __table_args__ = (
+        db.Index('ix_repositories_project_name', 'project_key', 'name'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     project_key = db.Column(db.String(255), db.ForeignKey('projects.key'), nullable=False)
     commits = db.relationship('Commit', backref='repository', lazy=True)
 
+class Author(db.Model):
+    __tablename__ = 'authors'
+    __table_args__ = (
+        # Для поиска по префиксу email в PostgreSQL вне зависимости от collation
+        db.Index('ix_authors_email_pattern', 'email', postgresql_ops={'email': 'varchar_pattern_ops'}),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(255), unique=True, nullable=False)
+    name = db.Column(db.String(255), nullable=False)
+
+class SyncState(db.Model):
+    __tablename__ = 'sync_states'
+    project_key = db.Column(db.String(255), primary_key=True)
+    repo_name = db.Column(db.String(255), primary_key=True)
+    branch = db.Column(db.String(255), primary_key=True)
+    last_commit_sha = db.Column(db.String(40), nullable=True)
+    last_commit_date = db.Column(db.DateTime(timezone=True), nullable=True)
+    # Нижняя граница непрерывно просмотренной истории от last_commit_sha; NULL - покрытие неизвестно
+    synced_since = db.Column(db.DateTime(timezone=True), nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
 class Commit(db.Model):
     __tablename__ = 'commits'
+    __table_args__ = (
+        db.Index('ix_commits_project_repo_date', 'project_key', 'repository_id', 'commit_date'),
+        db.Index('ix_commits_author_date', 'author_id', 'commit_date'),
+        db.Index('ix_commits_commit_date_sha', 'commit_date', 'sha'),
+    )
     sha = db.Column(db.String(40), primary_key=True)
     message = db.Column(db.Text, nullable=False)
     author_name = db.Column(db.String(255), nullable=False)
     author_email = db.Column(db.String(255), nullable=True)
+    author_id = db.Column(db.Integer, db.ForeignKey('authors.id'), nullable=True)
     commit_date = db.Column(db.DateTime(timezone=True), nullable=False)
-    commit_content = db.Column(db.Text, nullable=True)
+    # weekday * 24 + hour в REPORT_TIMEZONE, считается при сохранении для тепловой карты
+    time_bucket = db.Column(db.SmallInteger, nullable=True)
     added_lines = db.Column(db.Integer, default=0)
     deleted_lines = db.Column(db.Integer, default=0)
     repository_id = db.Column(db.Integer, db.ForeignKey('repositories.id'), nullable=False)
@@ -55,10 +87,17 @@ class Commit(db.Model):
     llm_score_complexity = db.Column(db.Integer, nullable=True)
     llm_score_comment = db.Column(db.Integer, nullable=True)
     llm_total_score = db.Column(db.Integer, nullable=True)
-    llm_evaluation_text = db.Column(db.Text, nullable=True)
+    llm_evaluation_text = db.deferred(db.Column(db.Text, nullable=True))
     
     final_commit_score = db.Column(db.Float, nullable=True)
 
+    # diff хранится сжатым в отдельной таблице и загружается только при обращении
+    content = db.relationship('CommitContent', uselist=False, lazy='select')
+
+    @property
+    def commit_content(self):
+        return self.content.text if self.content else None
+
     def to_dict(self):
         max_possible_score = 17.5 
         score_100 = None
@@ -84,4 +123,82 @@ class Commit(db.Model):
             },
             'llm_recommendations': self.llm_evaluation_text
         })
-        return base_dict
\ No newline at end of file
+        return base_dict
+
+class CommitFile(db.Model):
+    __tablename__ = 'commit_files'
+    __table_args__ = (
+        db.Index('ix_commit_files_project_repo_date', 'project_key', 'repository_id', 'commit_date'),
+        db.Index('ix_commit_files_author_date', 'author_id', 'commit_date'),
+        db.Index('ix_commit_files_commit_date', 'commit_date'),
+    )
+    commit_sha = db.Column(db.String(40), db.ForeignKey('commits.sha'), primary_key=True)
+    path = db.Column(db.String(1024), primary_key=True)
+    extension = db.Column(db.String(32), nullable=False)
+    added_lines = db.Column(db.Integer, nullable=False, default=0)
+    deleted_lines = db.Column(db.Integer, nullable=False, default=0)
+    # Копии полей коммита, чтобы фильтры метрик работали без JOIN
+    project_key = db.Column(db.String(255), nullable=True)
+    repository_id = db.Column(db.Integer, nullable=False)
+    author_id = db.Column(db.Integer, nullable=True)
+    commit_date = db.Column(db.DateTime(timezone=True), nullable=False)
+
+class DailyCommitRollup(db.Model):
+    __tablename__ = 'daily_commit_rollups'
+    __table_args__ = (
+        db.Index('ix_daily_rollups_project_day', 'project_key', 'day'),
+        db.Index('ix_daily_rollups_author_day', 'author_id', 'day'),
+    )
+    day = db.Column(db.Date, primary_key=True)
+    repository_id = db.Column(db.Integer, db.ForeignKey('repositories.id'), primary_key=True)
+    author_id = db.Column(db.Integer, db.ForeignKey('authors.id'), primary_key=True)
+    project_key = db.Column(db.String(255), nullable=True)
+    commit_count = db.Column(db.Integer, nullable=False, default=0)
+    added_lines = db.Column(db.Integer, nullable=False, default=0)
+    deleted_lines = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0)
+    score_count = db.Column(db.Integer, nullable=False, default=0)
+    last_commit_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+class CommitContent(db.Model):
+    __tablename__ = 'commit_contents'
+    sha = db.Column(db.String(40), db.ForeignKey('commits.sha'), primary_key=True)
+    encoding = db.Column(db.String(10), nullable=False, default='zlib')
+    raw_size = db.Column(db.Integer, nullable=False, default=0)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+    @staticmethod
+    def row_for(sha, text):
+        raw = text.encode('utf-8')
+        return {'sha': sha, 'encoding': 'zlib', 'raw_size': len(raw), 'data': zlib.compress(raw, 6)}
+
+    @property
+    def text(self):
+        if self.encoding == 'zlib':
+            return zlib.decompress(self.data).decode('utf-8')
+        return self.data.decode('utf-8')
+
+class AnalysisJob(db.Model):
+    __tablename__ = 'analysis_jobs'
+    commit_sha = db.Column(db.String(40), db.ForeignKey('commits.sha'), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    locked_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        db.Index('ix_analysis_jobs_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+
+class LLMEvaluationCache(db.Model):
+    __tablename__ = 'llm_evaluation_cache'
+    key = db.Column(db.String(64), primary_key=True)
+    prompt_version = db.Column(db.Integer, nullable=False)
+    scores = db.Column(db.JSON, nullable=False)
+    raw_text = db.Column(db.Text, nullable=True)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    last_used_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc), index=True)
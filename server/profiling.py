@@ -0,0 +1,138 @@
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import Config
+from instrumentation import registry, Histogram, COUNT_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    'http_request_duration_seconds', 'Длительность обработки запроса к API', ('route', 'method', 'status'),
+))
+HTTP_REQUEST_SQL_STATEMENTS = registry.register(Histogram(
+    'http_request_sql_statements', 'Число SQL-запросов на один запрос к API', ('route',), buckets=COUNT_BUCKETS,
+))
+HTTP_REQUEST_SQL_SECONDS = registry.register(Histogram(
+    'http_request_sql_duration_seconds', 'Суммарное время SQL-запросов на один запрос к API', ('route',),
+))
+HTTP_RESPONSE_BYTES = registry.register(Histogram(
+    'http_response_size_bytes', 'Размер тела ответа API', ('route',), buckets=SIZE_BUCKETS,
+))
+
+# cProfile и sys.monitoring не допускают два активных профилировщика, поэтому профилируется один запрос за раз
+_profiler_lock = threading.Lock()
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def _request_params():
+    return request.args.to_dict(flat=False)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    elapsed = time.perf_counter() - started
+    stats = g.get('request_stats') if has_request_context() else None
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_time += elapsed
+    if elapsed * 1000 >= Config.PROFILING_SLOW_QUERY_MS:
+        logger.warning(
+            f"Медленный SQL-запрос {elapsed * 1000:.0f} мс"
+            + (f" в {request.method} {request.path} с параметрами {_request_params()}" if stats is not None else "")
+            + f": {' '.join(statement.split())[:2000]} | аргументы: {str(parameters)[:500]}"
+        )
+
+class _RequestStats:
+    # Счетчики одного запроса. Потоковый ответ выполняет SQL после after_request, пока отдается тело,
+    # поэтому счетчики живут в объекте, который переживает after_request
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+
+def _start_request():
+    g.request_stats = _RequestStats()
+    g.profiler = None
+    if Config.PROFILING_SAMPLE_RATE > 0 and random.random() < Config.PROFILING_SAMPLE_RATE and _profiler_lock.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+def _record_request(stats, profiler, route, method, path, params, status, content_length):
+    elapsed = time.perf_counter() - stats.started
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+
+    HTTP_REQUEST_SECONDS.observe(elapsed, route=route, method=method, status=status)
+    HTTP_REQUEST_SQL_STATEMENTS.observe(stats.sql_count, route=route)
+    HTTP_REQUEST_SQL_SECONDS.observe(stats.sql_time, route=route)
+    # У потоковых ответов размер заранее неизвестен
+    if content_length is not None:
+        HTTP_RESPONSE_BYTES.observe(content_length, route=route)
+
+    if elapsed * 1000 >= Config.PROFILING_SLOW_REQUEST_MS:
+        message = (f"Медленный запрос {method} {path}: {elapsed * 1000:.0f} мс, "
+                   f"SQL-запросов {stats.sql_count} ({stats.sql_time * 1000:.0f} мс), параметры {params}")
+        if profiler is not None:
+            message += f", профиль: {_dump_profile(profiler, route)}"
+        logger.warning(message)
+    return elapsed
+
+def _finish_request(response):
+    stats = g.get('request_stats')
+    if stats is None:
+        return response
+    profiler = g.pop('profiler', None)
+    route, method, path, params = _route_label(), request.method, request.path, _request_params()
+
+    if response.is_streamed:
+        # Тело и его SQL-запросы выполняются уже после after_request: метрики и журнал пишутся при закрытии
+        # ответа, а в Server-Timing остается только время до отправки заголовков, без неизвестного еще числа запросов
+        response.headers['Server-Timing'] = f'app;dur={(time.perf_counter() - stats.started) * 1000:.1f};desc="headers"'
+        response.call_on_close(lambda: _record_request(
+            stats, profiler, route, method, path, params, response.status_code, None,
+        ))
+        return response
+
+    elapsed = _record_request(stats, profiler, route, method, path, params, response.status_code, response.content_length)
+    response.headers['Server-Timing'] = f'app;dur={elapsed * 1000:.1f}, db;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries"'
+    return response
+
+def _teardown_request(exc):
+    # При необработанном исключении after_request не вызывается, профилировщик освобождается здесь
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+
+def _dump_profile(profiler, route):
+    name = route.strip('/').replace('/', '_').replace('<', '').replace('>', '').replace(':', '-') or 'root'
+    path = os.path.join(Config.PROFILING_DIR, f"{datetime.now():%Y%m%d_%H%M%S_%f}_{name}.prof")
+    profiler.dump_stats(path)
+    return path
+
+def init_profiling(app):
+    # Включается PROFILING_ENABLED: гистограммы по маршрутам в /api/admin/metrics, число и время SQL-запросов,
+    # журнал медленных запросов с параметрами фильтров и, при PROFILING_SAMPLE_RATE > 0, дампы cProfile медленных запросов
+    if not Config.PROFILING_ENABLED:
+        return
+    if Config.PROFILING_SAMPLE_RATE > 0 and not os.path.exists(Config.PROFILING_DIR):
+        os.makedirs(Config.PROFILING_DIR)
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
+    logger.warning("Профилирование запросов включено")
@@ -0,0 +1,98 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, current_app, make_response
+from config import Config
+from instrumentation import CACHE_LOOKUPS
+
+# Номер поколения данных. Начинается со времени запуска, чтобы ETag прошлого процесса не совпал с новым
+_generation_lock = threading.Lock()
+_generation = int(time.time() * 1000)
+
+def current_generation():
+    return _generation
+
+def bump_generation():
+    # Вызывается после фиксации новых данных: сбор коммитов, запись LLM-оценок
+    global _generation
+    with _generation_lock:
+        _generation += 1
+    response_cache.clear()
+
+class TTLCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+response_cache = TTLCache(Config.RESPONSE_CACHE_MAX_ENTRIES, Config.RESPONSE_CACHE_TTL)
+
+def _ttl_epoch():
+    return int(time.time() // Config.RESPONSE_CACHE_TTL)
+
+def _cache_key(generation, epoch):
+    # Порядок и пустые значения параметров не влияют на ответ, поэтому не влияют и на ключ
+    args = sorted((key, value) for key, values in request.args.lists() for value in values if value != '')
+    return f"{generation}:{epoch}:{request.path}?{args!r}"
+
+def cached_response(view):
+    # Кэширует успешные ответы GET-эндпоинтов до смены поколения данных или истечения TTL.
+    # ETag зависит только от ключа, поэтому 304 отдается без вычисления ответа. Поколение знает только об
+    # изменениях в этом процессе; данные, записанные CLI-командами, обработчиком LLM в другом процессе или
+    # другим воркером, меняют ключ через номер интервала TTL, то есть видны клиенту не позже чем через TTL.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not Config.RESPONSE_CACHE_ENABLED or Config.RESPONSE_CACHE_TTL <= 0:
+            return view(*args, **kwargs)
+        key = _cache_key(current_generation(), _ttl_epoch())
+        etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            CACHE_LOOKUPS.inc(cache='response', result='not_modified')
+            response = current_app.response_class(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+
+        entry = response_cache.get(key)
+        CACHE_LOOKUPS.inc(cache='response', result='miss' if entry is None else 'hit')
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            entry = (response.get_data(), response.mimetype, [
+                (name, value) for name, value in response.headers.items()
+                if name not in ('Content-Type', 'Content-Length')
+            ])
+            response_cache.set(key, entry)
+
+        body, mimetype, headers = entry
+        response = current_app.response_class(body, mimetype=mimetype, headers=headers)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
@@ -0,0 +1,214 @@
+import logging
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+from dateutil import parser
+from sqlalchemy import select, func, literal, case
+from config import Config
+from models import db, Author, Commit, DailyCommitRollup
+from db_utils import upsert_add
+from authors import backfill_commit_authors
+from commit_filters import apply_commit_filters, author_ids_query, resolve_repository_id
+
+logger = logging.getLogger(__name__)
+
+REPORT_TZ = ZoneInfo(Config.REPORT_TIMEZONE)
+ROLLUP_KEY = ('day', 'repository_id', 'author_id')
+ROLLUP_SUMS = ('commit_count', 'added_lines', 'deleted_lines', 'score_sum', 'score_count')
+# Фронтенд передает конец периода как 23:59:59.999 местного времени
+_END_OF_DAY = time(23, 59, 59, 999000)
+
+def _aware(value):
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def rollup_day(commit_date):
+    return _aware(commit_date).astimezone(REPORT_TZ).date()
+
+def time_bucket(commit_date):
+    # День недели и час коммита в часовом поясе отчетов одним числом: weekday * 24 + hour
+    local = _aware(commit_date).astimezone(REPORT_TZ)
+    return local.weekday() * 24 + local.hour
+
+def _day_start(day):
+    return datetime.combine(day, time.min, REPORT_TZ).astimezone(timezone.utc)
+
+def _empty_rollup(day, repository_id, author_id, project_key):
+    return {
+        'day': day, 'repository_id': repository_id, 'author_id': author_id, 'project_key': project_key,
+        'commit_count': 0, 'added_lines': 0, 'deleted_lines': 0, 'score_sum': 0.0, 'score_count': 0,
+        'last_commit_at': None,
+    }
+
+def _accumulate(totals, commit_date, repository_id, author_id, project_key, added_lines, deleted_lines, score):
+    key = (rollup_day(commit_date), repository_id, author_id)
+    entry = totals.get(key)
+    if entry is None:
+        entry = totals[key] = _empty_rollup(*key, project_key)
+    entry['commit_count'] += 1
+    entry['added_lines'] += added_lines or 0
+    entry['deleted_lines'] += deleted_lines or 0
+    if score is not None:
+        entry['score_sum'] += score
+        entry['score_count'] += 1
+    commit_date = _aware(commit_date).astimezone(timezone.utc)
+    if entry['last_commit_at'] is None or commit_date > entry['last_commit_at']:
+        entry['last_commit_at'] = commit_date
+
+def _save(totals):
+    upsert_add(DailyCommitRollup, list(totals.values()), ROLLUP_KEY, ROLLUP_SUMS, max_columns=('last_commit_at',))
+
+def add_commits_to_rollups(rows):
+    # Вызывается в транзакции сохранения коммитов только для действительно вставленных строк
+    totals = {}
+    for row in rows:
+        if row.get('author_id') is None:
+            continue
+        _accumulate(totals, row['commit_date'], row['repository_id'], row['author_id'], row['project_key'],
+                    row['added_lines'], row['deleted_lines'], row.get('final_commit_score'))
+    _save(totals)
+
+def apply_score_changes(changes):
+    # changes: (commit_date, repository_id, author_id, project_key, old_score, new_score)
+    totals = {}
+    for commit_date, repository_id, author_id, project_key, old_score, new_score in changes:
+        if author_id is None or old_score == new_score:
+            continue
+        key = (rollup_day(commit_date), repository_id, author_id)
+        entry = totals.get(key)
+        if entry is None:
+            entry = totals[key] = _empty_rollup(*key, project_key)
+        entry['score_sum'] += (new_score or 0) - (old_score or 0)
+        entry['score_count'] += (new_score is not None) - (old_score is not None)
+    _save(totals)
+
+def add_score_to_rollup(commit, old_score, new_score):
+    apply_score_changes([(commit.commit_date, commit.repository_id, commit.author_id, commit.project_key, old_score, new_score)])
+
+def rebuild_rollups(batch_size=5000):
+    # Полный пересчет агрегатов и time_bucket из коммитов: после загрузки старых данных или смены REPORT_TIMEZONE
+    backfill_commit_authors()
+    db.session.query(DailyCommitRollup).delete(synchronize_session=False)
+    totals = {}
+    last_sha = ''
+    while True:
+        rows = db.session.execute(
+            select(
+                Commit.sha, Commit.time_bucket, Commit.commit_date, Commit.repository_id, Commit.author_id,
+                Commit.project_key, Commit.added_lines, Commit.deleted_lines, Commit.final_commit_score,
+            ).where(Commit.sha > last_sha).order_by(Commit.sha).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_sha = rows[-1][0]
+        bucket_updates = []
+        for sha, bucket, *commit in rows:
+            if bucket != time_bucket(commit[0]):
+                bucket_updates.append({'sha': sha, 'time_bucket': time_bucket(commit[0])})
+            if commit[2] is not None:
+                _accumulate(totals, *commit)
+        db.session.bulk_update_mappings(Commit, bucket_updates)
+    _save(totals)
+    db.session.commit()
+    logger.info(f"Дневные агрегаты пересчитаны: {len(totals)} строк")
+    return len(totals)
+
+def _parse_bound(value):
+    return _aware(parser.isoparse(value)).astimezone(timezone.utc) if value else None
+
+def _whole_days(since, until):
+    # Первые и последние сутки, целиком попадающие в период; None означает отсутствие границы
+    first_day = last_day = None
+    if since:
+        local = since.astimezone(REPORT_TZ)
+        first_day = local.date() if local.time() == time.min else local.date() + timedelta(days=1)
+    if until:
+        local = until.astimezone(REPORT_TZ)
+        last_day = local.date() if local.time() >= _END_OF_DAY else local.date() - timedelta(days=1)
+    return first_day, last_day
+
+def _rollup_part(args, first_day, last_day):
+    query = db.session.query(
+        DailyCommitRollup.author_id.label('author_id'),
+        DailyCommitRollup.commit_count.label('commit_count'),
+        DailyCommitRollup.added_lines.label('added_lines'),
+        DailyCommitRollup.deleted_lines.label('deleted_lines'),
+        DailyCommitRollup.score_sum.label('score_sum'),
+        DailyCommitRollup.score_count.label('score_count'),
+        DailyCommitRollup.last_commit_at.label('last_commit_at'),
+    )
+    project_key = args.get('project_key')
+    if project_key:
+        query = query.filter(DailyCommitRollup.project_key == project_key)
+    if args.get('repo_name'):
+        repository_id = resolve_repository_id(project_key, args.get('repo_name'))
+        if repository_id:
+            query = query.filter(DailyCommitRollup.repository_id == repository_id)
+    if args.get('author_email'):
+        query = query.filter(DailyCommitRollup.author_id.in_(author_ids_query(args.get('author_email'), args.get('author_match', 'exact'))))
+    if first_day is not None:
+        query = query.filter(DailyCommitRollup.day >= first_day)
+    if last_day is not None:
+        query = query.filter(DailyCommitRollup.day <= last_day)
+    return query
+
+def _raw_part(args, since=None, before=None, until=None):
+    # Неполные сутки на краях периода считаются по самим коммитам
+    undated_args = {key: value for key, value in args.items() if key not in ('since', 'until')}
+    # Имена колонок совпадают с _rollup_part: подзапрос может состоять из одной этой части
+    query = apply_commit_filters(db.session.query(
+        Commit.author_id.label('author_id'),
+        literal(1).label('commit_count'),
+        func.coalesce(Commit.added_lines, 0).label('added_lines'),
+        func.coalesce(Commit.deleted_lines, 0).label('deleted_lines'),
+        func.coalesce(Commit.final_commit_score, 0.0).label('score_sum'),
+        case((Commit.final_commit_score.isnot(None), 1), else_=0).label('score_count'),
+        Commit.commit_date.label('last_commit_at'),
+    ), undated_args)
+    if since is not None:
+        query = query.filter(Commit.commit_date >= since)
+    if before is not None:
+        query = query.filter(Commit.commit_date < before)
+    if until is not None:
+        query = query.filter(Commit.commit_date <= until)
+    return query
+
+def totals_by_author(args):
+    # Сводка по авторам за период одним запросом: целые сутки из агрегатов, края периода из коммитов
+    since = _parse_bound(args.get('since'))
+    until = _parse_bound(args.get('until'))
+    first_day, last_day = _whole_days(since, until)
+    if first_day is not None and last_day is not None and first_day > last_day:
+        parts = [_raw_part(args, since=since, until=until)]
+    else:
+        parts = [_rollup_part(args, first_day, last_day)]
+        if since is not None and _day_start(first_day) > since:
+            parts.append(_raw_part(args, since=since, before=_day_start(first_day)))
+        if until is not None and _day_start(last_day + timedelta(days=1)) <= until:
+            parts.append(_raw_part(args, since=_day_start(last_day + timedelta(days=1)), until=until))
+
+    filtered = parts[0].union_all(*parts[1:]).subquery() if len(parts) > 1 else parts[0].subquery()
+    rows = db.session.query(
+        filtered.c.author_id,
+        Author.name,
+        Author.email,
+        func.sum(filtered.c.commit_count),
+        func.sum(filtered.c.added_lines),
+        func.sum(filtered.c.deleted_lines),
+        func.sum(filtered.c.score_sum),
+        func.sum(filtered.c.score_count),
+        func.max(filtered.c.last_commit_at),
+    ).outerjoin(Author, Author.id == filtered.c.author_id)\
+     .group_by(filtered.c.author_id, Author.name, Author.email).all()
+
+    return {
+        author_id: {
+            'name': name,
+            'email': email,
+            'commit_count': commit_count or 0,
+            'added_lines': added_lines or 0,
+            'deleted_lines': deleted_lines or 0,
+            'score_sum': score_sum or 0.0,
+            'score_count': score_count or 0,
+            'last_commit_at': _aware(last_commit_at) if last_commit_at else None,
+        }
+        for author_id, name, email, commit_count, added_lines, deleted_lines, score_sum, score_count, last_commit_at in rows
+    }
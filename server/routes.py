@@ -1,15 +1,36 @@
-from flask import jsonify, request
+from flask import jsonify, request, Response, stream_with_context
+import json
 from flask_jwt_extended import jwt_required
+from response_cache import cached_response
 import logging
 from models import Project, Repository, Commit
+from commit_filters import apply_commit_filters, apply_commit_cursor, encode_cursor
+from exporter import columnar_available, iter_export_batches, iter_csv, iter_arrow_ipc
 from sfera_api import SferaAPI
 from requests.exceptions import HTTPError
 
 logger = logging.getLogger(__name__)
 
+COMMITS_PAGE_SIZE = 100
+COMMITS_MAX_PAGE_SIZE = 1000
+COMMITS_STREAM_BATCH = 1000
+COMMITS_STREAM_MAX_LIMIT = 100000
+
+def _parse_limit(default, maximum):
+    # ValueError для нечислового или неположительного limit; слишком большой ограничивается сверху.
+    # Отрицательный LIMIT в SQLite снимает ограничение, поэтому в запрос он попасть не должен
+    value = request.args.get('limit')
+    if not value:
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit должен быть положительным числом")
+    return min(limit, maximum)
+
 def register_routes(app):
     @app.route('/api/data/projects', methods=['GET'])
     @jwt_required()
+    @cached_response
     def get_projects():
         try:
             projects = Project.query.order_by(Project.key).all()
@@ -22,6 +43,7 @@ def register_routes(app):
 
     @app.route('/api/data/repositories', methods=['GET'])
     @jwt_required()
+    @cached_response
     def get_repositories():
         project_key = request.args.get('project_key')
         if not project_key:
@@ -38,43 +60,71 @@ def register_routes(app):
             
     @app.route('/api/data/commits', methods=['GET'])
     @jwt_required()
+    @cached_response
     def get_commits():
+        # Постраничная выдача по курсору: следующий курсор возвращается в заголовке X-Next-Cursor,
+        # при format=ndjson отдается весь отфильтрованный набор потоком
         try:
-            project_key = request.args.get('project_key')
-            repo_name = request.args.get('repo_name')
-            author_email = request.args.get('author_email')
-            since = request.args.get('since')
-            until = request.args.get('until')
+            query = apply_commit_filters(Commit.query, request.args)
+            if request.args.get('cursor'):
+                query = apply_commit_cursor(query, request.args['cursor'])
+            query = query.order_by(Commit.commit_date.desc(), Commit.sha.desc())
 
-            query = Commit.query
-            if project_key:
-                query = query.filter(Commit.project_key == project_key)
-            if repo_name:
-                repo = Repository.query.filter_by(name=repo_name, project_key=project_key).first()
-                if repo:
-                    query = query.filter(Commit.repository_id == repo.id)
-            if author_email:
-                query = query.filter(Commit.author_email.ilike(f"%{author_email}%"))
-            if since:
-                query = query.filter(Commit.commit_date >= since)
-            if until:
-                query = query.filter(Commit.commit_date <= until)
+            if request.args.get('format') == 'ndjson':
+                limit = _parse_limit(None, COMMITS_STREAM_MAX_LIMIT)
+                if limit is not None:
+                    query = query.limit(limit)
+                rows = query.yield_per(COMMITS_STREAM_BATCH)
+                def generate():
+                    for commit in rows:
+                        yield json.dumps(commit.to_dict(), ensure_ascii=False) + '\n'
+                return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
-            commits = query.order_by(Commit.commit_date.desc()).limit(100).all()
-            return jsonify([c.to_dict() for c in commits]), 200
+            limit = _parse_limit(COMMITS_PAGE_SIZE, COMMITS_MAX_PAGE_SIZE)
+            commits = query.limit(limit + 1).all()
+            response = jsonify([c.to_dict() for c in commits[:limit]])
+            if len(commits) > limit:
+                response.headers['X-Next-Cursor'] = encode_cursor(commits[limit - 1])
+            return response, 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             logger.error(f"Ошибка получения коммитов по фильтрам: {e}", exc_info=True)
             return jsonify({"error": "Ошибка сервера при получении коммитов"}), 500
 
+    @app.route('/api/data/export', methods=['GET'])
+    @jwt_required()
+    def export_commits():
+        # Полная выгрузка отфильтрованных коммитов с KPI и оценками: format=csv (по умолчанию) или arrow
+        export_format = request.args.get('format', 'csv')
+        include_diff = request.args.get('include_diff', '').lower() in ('1', 'true')
+        if export_format not in ('csv', 'arrow'):
+            return jsonify({"error": "Поддерживаются форматы csv и arrow"}), 400
+        if export_format == 'arrow' and not columnar_available():
+            return jsonify({"error": "Выгрузка в Arrow недоступна: не установлен pyarrow"}), 501
+
+        batches = iter_export_batches(request.args, include_diff=include_diff)
+        if export_format == 'arrow':
+            body, mimetype, extension = iter_arrow_ipc(batches, include_diff), 'application/vnd.apache.arrow.stream', 'arrows'
+        else:
+            body, mimetype, extension = iter_csv(batches, include_diff), 'text/csv', 'csv'
+        response = Response(stream_with_context(body), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="commits.{extension}"'
+        return response
+
     @app.route('/api/data/commits/<string:sha>/details', methods=['GET'])
     @jwt_required()
+    @cached_response
     def get_commit_details(sha):
         try:
             commit = Commit.query.get(sha)
             if not commit:
                 return jsonify({"error": "Коммит не найден"}), 404
             
-            return jsonify(commit.to_detailed_dict()), 200
+            details = commit.to_detailed_dict()
+            if request.args.get('include_diff', '').lower() in ('1', 'true'):
+                details['diff'] = commit.commit_content
+            return jsonify(details), 200
         except Exception as e:
             logger.error(f"Ошибка получения деталей коммита {sha}: {e}", exc_info=True)
             return jsonify({"error": "Внутренняя ошибка сервера"}), 500
\ No newline at end of file
@@ -1,29 +1,209 @@
 import requests
 import time
+import random
 import logging
-from typing import List, Dict, Optional
-from datetime import datetime
+import threading
+from typing import Iterator, List, Dict, Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
 from dateutil import parser
+from requests.adapters import HTTPAdapter
 import urllib3
+from config import Config
+from instrumentation import SFERA_REQUEST_SECONDS, SFERA_RETRIES, endpoint_label
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 logger = logging.getLogger(__name__)
 
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class SferaTransientError(requests.exceptions.RequestException):
+    """Запрос к Sfera не удался после всех повторных попыток."""
+
+class AdaptiveRateLimiter:
+    # Token bucket: темп растет, пока задержки стабильны, снижается при их росте и вдвое падает на 429
+    def __init__(self, rate: float, max_rate: float, min_rate: float = 0.5):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.tokens = max(1.0, rate)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.latency_avg = None
+        self.latency_baseline = None
+        self.decreased_at = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        # Возвращает 0, если токен получен, иначе сколько секунд подождать перед новой попыткой
+        with self.lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            capacity = max(1.0, self.rate)
+            self.tokens = min(capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self.reserve()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def on_response(self, latency: float):
+        with self.lock:
+            if self.latency_avg is None:
+                self.latency_avg = self.latency_baseline = latency
+            else:
+                self.latency_avg = 0.8 * self.latency_avg + 0.2 * latency
+                self.latency_baseline = min(self.latency_baseline * 1.01, self.latency_avg)
+            now = time.monotonic()
+            if self.latency_avg > 2 * self.latency_baseline:
+                # Не чаще раза за время ответа, иначе пачка медленных ответов обнуляет темп
+                if now - self.decreased_at >= self.latency_avg:
+                    self.rate = max(self.min_rate, self.rate * 0.9)
+                    self.decreased_at = now
+            else:
+                self.rate = min(self.max_rate, self.rate + 0.5)
+
+    def on_throttle(self, retry_after: Optional[float]):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            logger.warning(f"Sfera ограничивает частоту запросов, новый темп: {self.rate:.2f} запр/с")
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    delay = Config.SFERA_BACKOFF_BASE * (2 ** attempt) + random.uniform(0, Config.SFERA_BACKOFF_BASE)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return min(delay, Config.SFERA_BACKOFF_MAX)
+
+def is_older_than(commit_data: Dict, since_dt: datetime) -> bool:
+    commit_date_str = commit_data.get('created_at')
+    if not commit_date_str:
+        return False
+    try:
+        return parser.isoparse(commit_date_str) < since_dt
+    except Exception:
+        return False
+
+def commit_in_window(commit_data: Dict, since_dt: Optional[datetime] = None, until_dt: Optional[datetime] = None,
+                     author_email: Optional[str] = None) -> bool:
+    commit_date_str = commit_data.get('created_at')
+    if not commit_date_str or not commit_data.get('hash'):
+        return False
+    commit_dt = parser.isoparse(commit_date_str)
+    if since_dt and commit_dt < since_dt:
+        return False
+    if until_dt and commit_dt > until_dt:
+        return False
+    if author_email and (commit_data.get('author', {}).get('email') or '').lower() != author_email.lower():
+        return False
+    return True
+
+class _HostTransport:
+    # Пул соединений, лимит параллельности и rate limiter, общие для всех клиентов одного хоста
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=Config.SFERA_MAX_CONNECTIONS_PER_HOST,
+            max_retries=0,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.verify = False
+        self.limit = threading.BoundedSemaphore(Config.SFERA_MAX_CONNECTIONS_PER_HOST)
+        self.rate_limiter = AdaptiveRateLimiter(Config.SFERA_RATE_LIMIT, Config.SFERA_RATE_LIMIT_MAX)
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+def _get_transport(url: str) -> _HostTransport:
+    host = urlparse(url).netloc
+    with _transports_lock:
+        if host not in _transports:
+            _transports[host] = _HostTransport()
+        return _transports[host]
+
+def get_rate_limiter(url: str) -> AdaptiveRateLimiter:
+    return _get_transport(url).rate_limiter
+
 class SferaAPI:
-    def __init__(self, username, password, base_url="https://gateway-codemetrics.saas.sferaplatform.ru/app/sourcecode/api/api/v2/"):
-        self.base_url = base_url
+    def __init__(self, username, password, base_url=None):
+        self.base_url = base_url or Config.SFERA_BASE_URL
         self.auth = (username, password)
-        self.delay = 0.1
+        self.transport = _get_transport(self.base_url)
         logger.info("SferaAPI клиент инициализирован успешно.")
 
+    def _request(self, full_url, params=None):
+        transport = self.transport
+        for attempt in range(Config.SFERA_MAX_RETRIES + 1):
+            transport.rate_limiter.acquire()
+            retry_after = None
+            try:
+                with transport.limit:
+                    started = time.monotonic()
+                    response = transport.session.get(full_url, auth=self.auth, params=params, timeout=Config.SFERA_REQUEST_TIMEOUT)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+                reason = 'connection'
+            else:
+                if response.status_code not in TRANSIENT_STATUS_CODES:
+                    transport.rate_limiter.on_response(time.monotonic() - started)
+                    return response
+                error = requests.exceptions.HTTPError(f"{response.status_code} для {full_url}", response=response)
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                reason = str(response.status_code)
+                if response.status_code == 429:
+                    transport.rate_limiter.on_throttle(retry_after)
+
+            if attempt == Config.SFERA_MAX_RETRIES:
+                raise SferaTransientError(f"Запрос к {full_url} не удался после {attempt + 1} попыток: {error}") from error
+            SFERA_RETRIES.inc(reason=reason)
+            delay = backoff_delay(attempt, retry_after)
+            logger.warning(f"Временная ошибка запроса к {full_url}: {error}. Повтор через {delay:.1f} с.")
+            time.sleep(delay)
+
     def _get(self, endpoint, params=None):
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            data = self._get_json(endpoint, params=params)
+            if data is not None:
+                outcome = 'ok'
+            return data
+        finally:
+            SFERA_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint_label(endpoint), outcome=outcome)
+
+    def _get_json(self, endpoint, params=None):
         try:
             full_url = self.base_url + endpoint
             logger.info(f"Отправка GET запроса к {full_url}")
             if params:
                 logger.info(f"Параметры запроса: {params}")
                 
-            response = requests.get(full_url, auth=self.auth, params=params, verify=False)
+            response = self._request(full_url, params=params)
             response.raise_for_status()
             
             data = response.json()
@@ -36,6 +216,8 @@ class SferaAPI:
                 
             return data
             
+        except SferaTransientError:
+            raise
         except requests.exceptions.RequestException as e:
             logger.error(f"Ошибка API запроса к {endpoint}: {e}")
             if e.response is not None:
@@ -60,10 +242,10 @@ class SferaAPI:
         response_json = self._get(f"projects/{project_key}/repos/{repo_name}/branches")
         return response_json.get('data', []) if response_json else []
 
-    def get_repo_commits(self, project_key: str, repo_name: str, branch: Optional[str] = None, since_dt: Optional[datetime] = None) -> List[Dict]:
+    def iter_repo_commit_pages(self, project_key: str, repo_name: str, branch: Optional[str] = None, since_dt: Optional[datetime] = None) -> Iterator[List[Dict]]:
         logger.info(f"Запрос коммитов для {project_key}/{repo_name} (ветка: {branch or 'default'})")
         
-        all_items = []
+        total_items = 0
         cursor = None
         
         while True:
@@ -84,32 +266,37 @@ class SferaAPI:
                 logger.info("  -> Получена пустая страница с коммитами, завершаем.")
                 break
                 
-            if items and len(all_items) == 0:
+            if total_items == 0:
                 logger.info("Пример структуры данных коммита:")
                 logger.info(str(items[0]))
             
-            all_items.extend(items)
-            logger.info(f"  -> Загружено {len(items)} коммитов. Всего: {len(all_items)}.")
+            total_items += len(items)
+            logger.info(f"  -> Загружено {len(items)} коммитов. Всего: {total_items}.")
+            yield items
             
-            if since_dt:
-                last_commit_in_page = items[-1]
-                last_commit_date_str = last_commit_in_page.get('created_at')
-                if last_commit_date_str:
-                    try:
-                        last_commit_dt = parser.isoparse(last_commit_date_str)
-                        if last_commit_dt < since_dt:
-                            logger.info(f"  -> Достигнуты коммиты старше {since_dt}. Прекращаем загрузку страниц.")
-                            break
-                    except Exception:
-                        pass
+            if since_dt and is_older_than(items[-1], since_dt):
+                logger.info(f"  -> Достигнуты коммиты старше {since_dt}. Прекращаем загрузку страниц.")
+                break
 
             cursor = response_json.get('page', {}).get('next_cursor')
             if not cursor:
                 logger.info("  -> Достигнут конец истории коммитов (нет next_cursor).")
                 break
-                
-            time.sleep(self.delay)
-            
+
+    def iter_repo_commits(self, project_key: str, repo_name: str, branch: Optional[str] = None, since_dt: Optional[datetime] = None,
+                          until_dt: Optional[datetime] = None, author_email: Optional[str] = None) -> Iterator[Dict]:
+        # Потоковый режим: страницы запрашиваются по мере потребления, фильтры применяются на лету
+        for items in self.iter_repo_commit_pages(project_key, repo_name, branch=branch, since_dt=since_dt):
+            for commit_data in items:
+                if commit_in_window(commit_data, since_dt, until_dt, author_email):
+                    yield commit_data
+
+    def get_repo_commits(self, project_key: str, repo_name: str, branch: Optional[str] = None, since_dt: Optional[datetime] = None) -> List[Dict]:
+        all_items = [
+            commit_data
+            for items in self.iter_repo_commit_pages(project_key, repo_name, branch=branch, since_dt=since_dt)
+            for commit_data in items
+        ]
         logger.info(f"  -> Всего получено {len(all_items)} коммитов от API перед финальной фильтрацией.")
         return all_items
 
@@ -124,4 +311,8 @@ class SferaAPI:
                     'additions': 0,
                     'deletions': 0
                 }
-        return response
\ No newline at end of file
+        return response
+
+    def get_commit_diff(self, project_key: str, repo_name: str, sha: str) -> Optional[Dict]:
+        logger.info(f"Запрос diff коммита {sha[:7]}...")
+        return self._get(f"projects/{project_key}/repos/{repo_name}/commits/{sha}/diff")
\ No newline at end of file
@@ -0,0 +1,161 @@
+import asyncio
+import time
+import logging
+from typing import AsyncIterator, List, Dict, Optional
+from datetime import datetime
+import httpx
+from config import Config
+from instrumentation import SFERA_REQUEST_SECONDS, SFERA_RETRIES, endpoint_label
+from sfera_api import (
+    TRANSIENT_STATUS_CODES, SferaTransientError, get_rate_limiter, parse_retry_after, backoff_delay,
+    commit_in_window, is_older_than
+)
+
+logger = logging.getLogger(__name__)
+
+class AsyncSferaAPI:
+    def __init__(self, username, password, base_url=None, concurrency=None):
+        self.base_url = base_url or Config.SFERA_BASE_URL
+        concurrency = concurrency or Config.SFERA_ASYNC_CONCURRENCY
+        self.client = httpx.AsyncClient(
+            auth=(username, password),
+            verify=False,
+            timeout=Config.SFERA_REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.rate_limiter = get_rate_limiter(self.base_url)
+        logger.info("AsyncSferaAPI клиент инициализирован успешно.")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _request(self, full_url, params=None):
+        for attempt in range(Config.SFERA_MAX_RETRIES + 1):
+            while (wait := self.rate_limiter.reserve()) > 0:
+                await asyncio.sleep(wait)
+            retry_after = None
+            try:
+                async with self.semaphore:
+                    started = time.monotonic()
+                    response = await self.client.get(full_url, params=params)
+            except httpx.TransportError as e:
+                error = e
+                reason = 'connection'
+            else:
+                if response.status_code not in TRANSIENT_STATUS_CODES:
+                    self.rate_limiter.on_response(time.monotonic() - started)
+                    return response
+                error = httpx.HTTPStatusError(f"{response.status_code} для {full_url}", request=response.request, response=response)
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                reason = str(response.status_code)
+                if response.status_code == 429:
+                    self.rate_limiter.on_throttle(retry_after)
+
+            if attempt == Config.SFERA_MAX_RETRIES:
+                raise SferaTransientError(f"Запрос к {full_url} не удался после {attempt + 1} попыток: {error}") from error
+            SFERA_RETRIES.inc(reason=reason)
+            delay = backoff_delay(attempt, retry_after)
+            logger.warning(f"Временная ошибка запроса к {full_url}: {error}. Повтор через {delay:.1f} с.")
+            await asyncio.sleep(delay)
+
+    async def _get(self, endpoint, params=None):
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            data = await self._get_json(endpoint, params=params)
+            if data is not None:
+                outcome = 'ok'
+            return data
+        finally:
+            SFERA_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint_label(endpoint), outcome=outcome)
+
+    async def _get_json(self, endpoint, params=None):
+        full_url = self.base_url + endpoint
+        logger.info(f"Отправка GET запроса к {full_url}")
+        try:
+            response = await self._request(full_url, params=params)
+            response.raise_for_status()
+            data = response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Ошибка API запроса к {endpoint}: {e}")
+            logger.error(f"Ответ сервера: {e.response.text}")
+            return None
+        except ValueError as e:
+            logger.error(f"Ошибка парсинга JSON ответа от {endpoint}: {e}")
+            return None
+
+        if not isinstance(data, dict):
+            logger.error(f"Неожиданный формат ответа от {endpoint}: {type(data)}")
+            return None
+        return data
+
+    async def get_projects(self) -> List[Dict]:
+        response_json = await self._get("projects")
+        return response_json.get('data', []) if response_json else []
+
+    async def get_project_repos(self, project_key: str) -> List[Dict]:
+        response_json = await self._get(f"projects/{project_key}/repos")
+        return response_json.get('data', []) if response_json else []
+
+    async def get_repo_branches(self, project_key: str, repo_name: str) -> List[Dict]:
+        response_json = await self._get(f"projects/{project_key}/repos/{repo_name}/branches")
+        return response_json.get('data', []) if response_json else []
+
+    async def iter_repo_commit_pages(self, project_key: str, repo_name: str, branch: Optional[str] = None, since_dt: Optional[datetime] = None) -> AsyncIterator[List[Dict]]:
+        logger.info(f"Запрос коммитов для {project_key}/{repo_name} (ветка: {branch or 'default'})")
+        cursor = None
+
+        while True:
+            params = {'limit': 100}
+            if cursor:
+                params['cursor'] = cursor
+            if branch:
+                params['rev'] = branch
+
+            response_json = await self._get(f"projects/{project_key}/repos/{repo_name}/commits", params=params)
+            if not response_json or 'data' not in response_json:
+                logger.warning(f"Ответ API по коммитам для {project_key}/{repo_name} не содержит данных.")
+                break
+
+            items = response_json.get('data', [])
+            if not items:
+                break
+            yield items
+
+            if since_dt and is_older_than(items[-1], since_dt):
+                break
+
+            cursor = response_json.get('page', {}).get('next_cursor')
+            if not cursor:
+                break
+
+    async def iter_repo_commits(self, project_key: str, repo_name: str, branch: Optional[str] = None, since_dt: Optional[datetime] = None,
+                                until_dt: Optional[datetime] = None, author_email: Optional[str] = None) -> AsyncIterator[Dict]:
+        async for items in self.iter_repo_commit_pages(project_key, repo_name, branch=branch, since_dt=since_dt):
+            for commit_data in items:
+                if commit_in_window(commit_data, since_dt, until_dt, author_email):
+                    yield commit_data
+
+    async def get_repo_commits(self, project_key: str, repo_name: str, branch: Optional[str] = None, since_dt: Optional[datetime] = None) -> List[Dict]:
+        all_items = []
+        async for items in self.iter_repo_commit_pages(project_key, repo_name, branch=branch, since_dt=since_dt):
+            all_items.extend(items)
+        logger.info(f"  -> Всего получено {len(all_items)} коммитов от API перед финальной фильтрацией.")
+        return all_items
+
+    async def get_commit_details(self, project_key: str, repo_name: str, sha: str) -> Optional[Dict]:
+        response = await self._get(f"projects/{project_key}/repos/{repo_name}/commits/{sha}")
+        if response:
+            response.setdefault('data', {})
+            response['data'].setdefault('stats', {'additions': 0, 'deletions': 0})
+        return response
+
+    async def get_commit_diff(self, project_key: str, repo_name: str, sha: str) -> Optional[Dict]:
+        return await self._get(f"projects/{project_key}/repos/{repo_name}/commits/{sha}/diff")
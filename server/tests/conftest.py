@@ -0,0 +1,60 @@
+import os
+import tempfile
+from contextlib import contextmanager
+import pytest
+
+# Config читает окружение при импорте, поэтому переменные задаются до импорта приложения
+_tmp_dir = tempfile.mkdtemp(prefix='sphere-reporter-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp_dir, 'test.db')
+os.environ['LLM_ANALYSIS_AUTOSTART'] = 'false'
+os.environ['GIGACHAT_CREDENTIALS'] = ''
+os.environ['RESPONSE_CACHE_ENABLED'] = 'true'
+os.environ['PROFILING_ENABLED'] = 'false'
+os.environ['LOG_FILE'] = os.path.join(_tmp_dir, 'app.log')
+os.environ['REPORT_TIMEZONE'] = 'Europe/Moscow'
+os.environ['JWT_SECRET_KEY'] = 'test-secret-key-that-is-long-enough-for-hs256'
+
+@pytest.fixture
+def app():
+    from app import app as flask_app
+    from models import db
+    from commit_filters import _repository_ids
+    from response_cache import response_cache
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        _repository_ids.clear()
+        response_cache.clear()
+        yield flask_app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def auth_headers(app):
+    from flask_jwt_extended import create_access_token
+    return {'Authorization': 'Bearer ' + create_access_token(identity='tester')}
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+@pytest.fixture
+def count_queries(app):
+    from sqlalchemy import event
+    from models import db
+
+    @contextmanager
+    def counting():
+        counter = _QueryCounter()
+        event.listen(db.engine, 'before_cursor_execute', counter)
+        try:
+            yield counter
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', counter)
+    return counting
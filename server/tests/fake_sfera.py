@@ -0,0 +1,72 @@
+import asyncio
+import base64
+import threading
+from datetime import datetime, timedelta, timezone
+from sfera_api import SferaAPI
+from sfera_async_api import AsyncSferaAPI
+
+def make_commit(sha, created_at, email='dev@example.com', message=None, parents=None):
+    commit = {
+        'hash': sha,
+        'created_at': created_at.isoformat(),
+        'message': message or f"Коммит {sha}",
+        'author': {'name': 'Dev', 'email': email},
+    }
+    if parents is not None:
+        commit['parents'] = [{'hash': parent} for parent in parents]
+    return commit
+
+def link_parents(history):
+    # Линейная история: каждый коммит - родитель предыдущего, самый старый - корень
+    for commit, parent in zip(history, history[1:] + [None]):
+        commit['parents'] = [{'hash': parent['hash']}] if parent else []
+    return history
+
+def linear_history(prefix, count, newest=None, step=timedelta(hours=1)):
+    # Коммиты от новых к старым, как их отдает Sfera
+    newest = newest or datetime.now(timezone.utc) - timedelta(minutes=5)
+    return [make_commit(f"{prefix}{index:04d}", newest - index * step) for index in range(count)]
+
+class FakeSfera(SferaAPI):
+    # Подменяет HTTP-запросы к Sfera ответами из истории в памяти, остальная логика клиента настоящая
+    def __init__(self, branches, page_size=100):
+        super().__init__('user', 'password', base_url='http://sfera.test/')
+        self.branches = branches
+        self.page_size = page_size
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def requested(self, kind):
+        return [params for endpoint_kind, params in self.requests if endpoint_kind == kind]
+
+    def _get(self, endpoint, params=None):
+        parts = endpoint.split('/')
+        kind = 'branches' if parts[-1] == 'branches' else 'commits' if parts[-1] == 'commits' \
+            else 'diff' if parts[-1] == 'diff' else 'details'
+        with self._lock:
+            self.requests.append((kind, dict(params or {})))
+        if kind == 'branches':
+            return {'data': [
+                {'name': name, 'last_commit': {'created_at': history[0]['created_at']}}
+                for name, history in self.branches.items() if history
+            ]}
+        if kind == 'commits':
+            history = self.branches[params['rev']]
+            start = int(params.get('cursor') or 0)
+            end = start + min(params.get('limit', self.page_size), self.page_size)
+            return {'data': history[start:end], 'page': {'next_cursor': str(end) if end < len(history) else None}}
+        if kind == 'details':
+            return {'data': {'stats': {'additions': 3, 'deletions': 1}}}
+        sha = parts[-2]
+        diff = f"diff --git a/src/{sha}.py b/src/{sha}.py\n--- a/src/{sha}.py\n+++ b/src/{sha}.py\n@@ -1 +1,3 @@\n-old\n+new {sha}\n+a\n+b\n"
+        return {'data': {'content': base64.b64encode(diff.encode('utf-8')).decode('ascii')}}
+
+class FakeAsyncSfera(AsyncSferaAPI):
+    # Асинхронный клиент поверх той же истории: запросы и их учет общие с синхронной подменой
+    def __init__(self, fake):
+        super().__init__('user', 'password', base_url='http://sfera.test/')
+        self.fake = fake
+
+    async def _get(self, endpoint, params=None):
+        await asyncio.sleep(0)
+        return self.fake._get(endpoint, params)
@@ -0,0 +1,101 @@
+import threading
+from datetime import datetime, timedelta, timezone
+import pytest
+import data_collector
+from models import db, Commit
+from tests.fake_sfera import FakeAsyncSfera, FakeSfera, linear_history, link_parents, make_commit
+
+NOW = datetime.now(timezone.utc)
+
+@pytest.fixture(params=['with_parents', 'without_parents'])
+def sfera(app, monkeypatch, request):
+    # main обновлялась последней и сканируется первой. feature: свой свежий коммит, слитая в нее прежняя main
+    # и более старые коммиты только этой ветки. Sfera отдает историю по дате, поэтому коммиты feature идут
+    # вперемешку с общими.
+    with_parents = request.param == 'with_parents'
+    shared = linear_history('m', 30, newest=NOW - timedelta(hours=2), step=timedelta(hours=2))
+    feature_only = [make_commit(f"f{index:04d}", NOW - timedelta(hours=3 + 2 * index)) for index in range(1, 12)]
+    head_parents = main_parents = None
+    if with_parents:
+        # Ветвление feature от самого старого общего коммита и слияние main обратно в feature
+        link_parents(shared)
+        link_parents(feature_only + [shared[-1]])
+        head_parents, main_parents = ['f0001', 'm0000'], ['m0000']
+    main = [make_commit('mhead', NOW - timedelta(minutes=10), parents=main_parents)] + shared
+    feature = sorted(
+        [make_commit('f0000', NOW - timedelta(hours=1), parents=head_parents)] + shared + feature_only,
+        key=lambda commit: commit['created_at'], reverse=True,
+    )
+    fake = FakeSfera({'main': main, 'feature': feature}, page_size=10)
+    fake.with_parents = with_parents
+    monkeypatch.setattr(data_collector.Config, 'COLLECTOR_PAGE_SIZE', 10)
+    monkeypatch.setattr(data_collector, 'SferaAPI', lambda username, password: fake)
+    monkeypatch.setattr(data_collector, 'AsyncSferaAPI', lambda username, password: FakeAsyncSfera(fake))
+    return fake
+
+def collect(sync_mode, ingestion_mode='threads'):
+    data_collector.collect_data_for_target(
+        'user', 'password', 'PRJ', 'repo', 'all', (NOW - timedelta(days=10)).isoformat(), (NOW + timedelta(hours=1)).isoformat(),
+        sync_mode=sync_mode, ingestion_mode=ingestion_mode,
+    )
+    db.session.remove()
+
+def all_shas(sfera):
+    return {commit['hash'] for history in sfera.branches.values() for commit in history}
+
+@pytest.mark.parametrize('ingestion_mode', ['threads', 'async'])
+@pytest.mark.parametrize('sync_mode', ['full', 'incremental'])
+def test_branch_commits_behind_shared_history_are_collected(sfera, sync_mode, ingestion_mode):
+    collect(sync_mode, ingestion_mode)
+    assert {sha for (sha,) in db.session.query(Commit.sha)} == all_shas(sfera)
+    # Общие коммиты веток загружаются один раз
+    details = [params for params in sfera.requested('details')]
+    assert len(details) == len(all_shas(sfera))
+
+@pytest.mark.parametrize('ingestion_mode', ['threads', 'async'])
+def test_full_run_stops_listing_on_shared_history(sfera, ingestion_mode):
+    collect('full', ingestion_mode)
+    pages = {branch: sum(1 for params in sfera.requested('commits') if params['rev'] == branch) for branch in sfera.branches}
+    assert pages['main'] == 4
+    if sfera.with_parents:
+        # f0011, последний коммит только feature, на третьей странице; дальше лишь предки коммитов main
+        assert pages['feature'] == 3
+    else:
+        assert pages['feature'] == 5
+    assert {sha for (sha,) in db.session.query(Commit.sha)} == all_shas(sfera)
+
+@pytest.mark.parametrize('ingestion_mode', ['threads', 'async'])
+def test_incremental_rerun_stops_on_known_pages(sfera, ingestion_mode):
+    collect('incremental', ingestion_mode)
+    sfera.branches['feature'].insert(0, make_commit('f9999', NOW - timedelta(minutes=1)))
+    sfera.requests.clear()
+    collect('incremental', ingestion_mode)
+    assert db.session.get(Commit, 'f9999') is not None
+    assert len(sfera.requested('details')) == 1
+    # На каждой ветке: первая страница с новым или граничным коммитом и одна страница уже известной истории
+    assert len(sfera.requested('commits')) <= 4
+
+def test_full_run_walks_whole_branch_after_incremental(sfera):
+    collect('incremental')
+    # Коммит, датированный раньше водяного знака, но появившийся после синхронизации (например, при rebase)
+    late = make_commit('late0', NOW - timedelta(hours=40), parents=['m0029'] if sfera.with_parents else None)
+    feature = sfera.branches['feature']
+    if sfera.with_parents:
+        next(commit for commit in feature if commit['hash'] == 'f0011')['parents'] = [{'hash': 'late0'}]
+    feature.append(late)
+    feature.sort(key=lambda commit: commit['created_at'], reverse=True)
+    collect('full')
+    assert db.session.get(Commit, 'late0') is not None
+
+def test_async_collector_writes_outside_event_loop_thread(sfera, monkeypatch):
+    threads = set()
+    flush = data_collector._CommitBatchWriter.flush
+
+    def recording_flush(writer):
+        threads.add(threading.current_thread().name)
+        return flush(writer)
+
+    monkeypatch.setattr(data_collector._CommitBatchWriter, 'flush', recording_flush)
+    collect('full', 'async')
+    assert threads and all(name.startswith('collector_db') for name in threads)
+    assert db.session.query(Commit).count() == len(all_shas(sfera))
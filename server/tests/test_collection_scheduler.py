@@ -0,0 +1,202 @@
+import threading
+import pytest
+
+import collection_scheduler
+from collection_scheduler import CollectionScheduler
+
+CREDENTIALS = {'sfera_username': 'user', 'sfera_password': 'secret'}
+
+def _request(**fields):
+    return dict(CREDENTIALS, **fields)
+
+def _target(project_key='PRJ', repo_name='repo', since='2024-01-10T00:00:00Z', until='2024-01-20T00:00:00Z', **fields):
+    return dict(project_key=project_key, repo_name=repo_name, since=since, until=until, **fields)
+
+class FakeCollector:
+    # Подменяет collect_data_for_target: задачи висят в статусе running, пока тест их не отпустит
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self._started = threading.Semaphore(0)
+
+    def __call__(self, username, password, project_key, repo_name, branch_name, since, until, target_email, progress=None, **options):
+        self.calls.append((project_key, repo_name, since, until, options))
+        self._started.release()
+        self.release.wait(5)
+        return "Готово"
+
+    def wait_started(self, count):
+        for _ in range(count):
+            assert self._started.acquire(timeout=5)
+
+@pytest.fixture
+def collector(monkeypatch):
+    fake = FakeCollector()
+    monkeypatch.setattr(collection_scheduler, 'collect_data_for_target', fake)
+    yield fake
+    fake.release.set()
+
+def _queued_only():
+    # Без слотов задачи не запускаются, и очередь можно проверять без потоков
+    return CollectionScheduler(max_concurrent=0, max_per_project=1, history_size=10)
+
+def _wait_finished(scheduler, count):
+    for _ in range(500):
+        if sum(1 for job in scheduler.jobs() if job.status not in collection_scheduler.ACTIVE_STATUSES) >= count:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("Задачи сбора не завершились")
+
+@pytest.mark.parametrize('raw, error', [
+    ({'repo_name': 'repo', 'since': '2024-01-01T00:00:00Z', 'until': '2024-01-02T00:00:00Z'}, 'project_key'),
+    (_target(since=None), 'since'),
+    (_target(until='вчера'), 'Некорректный период'),
+    (_target(since='2024-02-01T00:00:00Z', until='2024-01-01T00:00:00Z'), 'позже'),
+])
+def test_invalid_targets_are_rejected(raw, error):
+    scheduler = _queued_only()
+    with pytest.raises(ValueError, match=error):
+        scheduler.submit(_request(targets=[_target(), raw]))
+    assert scheduler.jobs() == []
+
+def test_covered_target_reuses_job():
+    scheduler = _queued_only()
+    first, = scheduler.submit(_request(**_target()))
+    second, = scheduler.submit(_request(**_target(since='2024-01-12T00:00:00Z', until='2024-01-15T00:00:00Z')))
+    assert second is first
+    assert len(scheduler.jobs()) == 1
+    assert (first.target['since'], first.target['until']) == ('2024-01-10T00:00:00Z', '2024-01-20T00:00:00Z')
+
+def test_dedup_key_normalizes_email_and_ignores_missing_fields():
+    scheduler = _queued_only()
+    first, = scheduler.submit(_request(**_target(target_email=' Dev@Example.com ')))
+    second, = scheduler.submit(_request(**_target(target_email='dev@example.com', branch_name='')))
+    assert second is first
+
+@pytest.mark.parametrize('other', [
+    _target(project_key='OTHER'),
+    _target(repo_name='other-repo'),
+    _target(branch_name='feature'),
+    _target(target_email='someone@example.com'),
+    _target(since='2024-01-21T00:00:00Z', until='2024-01-25T00:00:00Z'),
+])
+def test_different_or_disjoint_targets_get_own_job(other):
+    scheduler = _queued_only()
+    first, = scheduler.submit(_request(**_target()))
+    second, = scheduler.submit(_request(**other))
+    assert second is not first
+    assert len(scheduler.jobs()) == 2
+
+@pytest.mark.parametrize('since, until, expected', [
+    ('2024-01-05T00:00:00Z', '2024-01-15T00:00:00Z', ('2024-01-05T00:00:00Z', '2024-01-20T00:00:00Z')),
+    ('2024-01-15T00:00:00Z', '2024-01-25T00:00:00Z', ('2024-01-10T00:00:00Z', '2024-01-25T00:00:00Z')),
+    ('2024-01-01T00:00:00Z', '2024-01-31T00:00:00Z', ('2024-01-01T00:00:00Z', '2024-01-31T00:00:00Z')),
+    ('2024-01-20T00:00:00Z', '2024-01-22T00:00:00Z', ('2024-01-10T00:00:00Z', '2024-01-22T00:00:00Z')),
+])
+def test_overlapping_target_widens_queued_job(since, until, expected):
+    scheduler = _queued_only()
+    first, = scheduler.submit(_request(**_target()))
+    second, = scheduler.submit(_request(**_target(since=since, until=until)))
+    assert second is first
+    assert (first.target['since'], first.target['until']) == expected
+    assert first.covers(first.target['since_dt'], first.target['until_dt'])
+    assert first.target['since_dt'].isoformat().startswith(expected[0][:10])
+
+def test_running_job_is_not_widened(collector):
+    scheduler = CollectionScheduler(max_concurrent=1, max_per_project=1, history_size=10)
+    running, = scheduler.submit(_request(**_target()))
+    collector.wait_started(1)
+    covered, = scheduler.submit(_request(**_target(since='2024-01-11T00:00:00Z', until='2024-01-12T00:00:00Z')))
+    wider, = scheduler.submit(_request(**_target(since='2024-01-15T00:00:00Z', until='2024-01-25T00:00:00Z')))
+
+    assert covered is running
+    assert wider is not running and wider.status == 'queued'
+    assert (running.target['since'], running.target['until']) == ('2024-01-10T00:00:00Z', '2024-01-20T00:00:00Z')
+
+    collector.release.set()
+    _wait_finished(scheduler, 2)
+    assert [call[2:4] for call in collector.calls] == [
+        ('2024-01-10T00:00:00Z', '2024-01-20T00:00:00Z'), ('2024-01-15T00:00:00Z', '2024-01-25T00:00:00Z'),
+    ]
+
+def test_finished_job_does_not_absorb_new_target(collector):
+    collector.release.set()
+    scheduler = CollectionScheduler(max_concurrent=1, max_per_project=1, history_size=10)
+    first, = scheduler.submit(_request(**_target()))
+    _wait_finished(scheduler, 1)
+    second, = scheduler.submit(_request(**_target()))
+    assert second is not first
+    _wait_finished(scheduler, 2)
+    assert len(collector.calls) == 2
+
+def test_projects_share_slots_round_robin(collector):
+    scheduler = CollectionScheduler(max_concurrent=2, max_per_project=1, history_size=10)
+    targets = [_target(project_key='BIG', repo_name=f'repo-{i}') for i in range(3)] + [_target(project_key='SMALL')]
+    jobs = scheduler.submit(_request(targets=targets))
+    collector.wait_started(2)
+
+    assert [job.status for job in jobs] == ['running', 'queued', 'queued', 'running']
+    collector.release.set()
+    _wait_finished(scheduler, 4)
+    assert all(job.status == 'done' for job in jobs)
+
+def test_passthrough_options_reach_collector(collector):
+    collector.release.set()
+    scheduler = CollectionScheduler(max_concurrent=1, max_per_project=1, history_size=10)
+    scheduler.submit(_request(ingestion_mode='async', sync_mode='incremental', **_target()))
+    _wait_finished(scheduler, 1)
+    assert collector.calls[0][4] == {'ingestion_mode': 'async', 'sync_mode': 'incremental'}
+
+def test_project_target_expands_into_repositories(collector, monkeypatch):
+    class FakeApi:
+        def __init__(self, username, password):
+            pass
+
+        def get_project_repos(self, project_key):
+            return [{'name': 'api'}, {'name': 'web'}, {'name': None}]
+
+    monkeypatch.setattr(collection_scheduler, 'SferaAPI', FakeApi)
+    collector.release.set()
+    scheduler = CollectionScheduler(max_concurrent=2, max_per_project=2, history_size=10)
+    project_job, = scheduler.submit(_request(**_target(repo_name=None)))
+    _wait_finished(scheduler, 3)
+
+    assert project_job.message == "Поставлено в очередь репозиториев: 2"
+    assert sorted(call[1] for call in collector.calls) == ['api', 'web']
+
+def test_history_keeps_active_jobs():
+    scheduler = CollectionScheduler(max_concurrent=0, max_per_project=1, history_size=2)
+    jobs = scheduler.submit(_request(targets=[_target(repo_name=f'repo-{i}') for i in range(3)]))
+    jobs[0].status = 'done'
+    scheduler.submit(_request(**_target(repo_name='repo-3')))
+    assert [job.target['repo_name'] for job in scheduler.jobs()] == ['repo-1', 'repo-2', 'repo-3']
+
+@pytest.mark.parametrize('first_options, second_options', [
+    ({'sync_mode': 'incremental'}, {'sync_mode': 'full'}),
+    ({'ingestion_mode': 'async'}, {'ingestion_mode': 'threads'}),
+    ({'sync_mode': 'incremental'}, {}),
+])
+def test_targets_with_different_options_are_not_merged(first_options, second_options):
+    scheduler = _queued_only()
+    first, = scheduler.submit(_request(**first_options, **_target()))
+    second, = scheduler.submit(_request(**second_options, **_target(since='2024-01-05T00:00:00Z')))
+    assert second is not first
+    assert (first.options, second.options) == (first_options, second_options)
+    assert first.target['since'] == '2024-01-10T00:00:00Z'
+
+def test_default_options_match_explicit_config_values():
+    scheduler = _queued_only()
+    first, = scheduler.submit(_request(**_target()))
+    second, = scheduler.submit(_request(sync_mode=collection_scheduler.Config.COLLECTOR_SYNC_MODE, **_target()))
+    assert second is first
+
+@pytest.mark.parametrize('fail', [False, True])
+def test_finished_jobs_drop_credentials(collector, monkeypatch, fail):
+    if fail:
+        monkeypatch.setattr(collection_scheduler, 'collect_data_for_target', lambda *args, **kwargs: 1 / 0)
+    collector.release.set()
+    scheduler = CollectionScheduler(max_concurrent=1, max_per_project=1, history_size=10)
+    job, = scheduler.submit(_request(**_target()))
+    _wait_finished(scheduler, 1)
+    assert job.status == ('failed' if fail else 'done')
+    assert job.credentials is None
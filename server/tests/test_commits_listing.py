@@ -0,0 +1,71 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+import pytest
+import routes
+from models import db, Commit, Project, Repository
+from commit_filters import apply_commit_cursor, encode_cursor
+
+START = datetime(2026, 9, 1, tzinfo=timezone.utc)
+
+@pytest.fixture
+def commits(app):
+    db.session.add(Project(key='PRJ', name='PRJ'))
+    db.session.add(Repository(id=1, name='repo', project_key='PRJ'))
+    # Пары коммитов с одинаковой датой проверяют порядок по sha внутри даты
+    rows = [
+        {'sha': f"{index:040x}", 'message': f"commit {index}\ndetails", 'author_name': 'dev', 'author_email': 'dev@example.com',
+         'commit_date': START + timedelta(hours=index // 2), 'repository_id': 1, 'project_key': 'PRJ'}
+        for index in range(25)
+    ]
+    db.session.execute(Commit.__table__.insert(), rows)
+    db.session.commit()
+    return sorted(rows, key=lambda row: (row['commit_date'], row['sha']), reverse=True)
+
+def test_cursor_pages_cover_all_commits_once(client, auth_headers, commits):
+    seen, cursor = [], None
+    while True:
+        params = {'project_key': 'PRJ', 'limit': 7, **({'cursor': cursor} if cursor else {})}
+        response = client.get('/api/data/commits', query_string=params, headers=auth_headers)
+        assert response.status_code == 200
+        seen += [item['sha'] for item in response.get_json()]
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    assert seen == [row['sha'] for row in commits]
+
+def test_cursor_round_trip(commits):
+    commit = db.session.get(Commit, commits[3]['sha'])
+    query = apply_commit_cursor(Commit.query.order_by(Commit.commit_date.desc(), Commit.sha.desc()), encode_cursor(commit))
+    assert [c.sha for c in query] == [row['sha'] for row in commits[4:]]
+
+@pytest.mark.parametrize('cursor', [
+    'not-base64!!',
+    base64.urlsafe_b64encode(b'{"not": "a list"}').decode(),
+    base64.urlsafe_b64encode(json.dumps(['not a date', 'abc']).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps(['2026-09-01T00:00:00+00:00']).encode()).decode(),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+])
+def test_tampered_cursor_is_rejected(client, auth_headers, commits, cursor):
+    response = client.get('/api/data/commits', query_string={'cursor': cursor}, headers=auth_headers)
+    assert response.status_code == 400
+
+@pytest.mark.parametrize('fmt', ['', 'ndjson'])
+@pytest.mark.parametrize('limit', ['0', '-1', 'abc'])
+def test_invalid_limit_is_rejected(client, auth_headers, commits, fmt, limit):
+    response = client.get('/api/data/commits', query_string={'limit': limit, 'format': fmt}, headers=auth_headers)
+    assert response.status_code == 400
+
+def test_ndjson_limit_is_applied_and_clamped(client, auth_headers, commits, monkeypatch):
+    response = client.get('/api/data/commits', query_string={'format': 'ndjson', 'limit': 5}, headers=auth_headers)
+    assert response.mimetype == 'application/x-ndjson'
+    assert len(response.get_data(as_text=True).splitlines()) == 5
+
+    monkeypatch.setattr(routes, 'COMMITS_STREAM_MAX_LIMIT', 10)
+    response = client.get('/api/data/commits', query_string={'format': 'ndjson', 'limit': 10 ** 9}, headers=auth_headers)
+    assert len(response.get_data(as_text=True).splitlines()) == 10
+
+def test_ndjson_without_limit_streams_everything(client, auth_headers, commits):
+    response = client.get('/api/data/commits', query_string={'format': 'ndjson'}, headers=auth_headers)
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['sha'] for line in lines] == [row['sha'] for row in commits]
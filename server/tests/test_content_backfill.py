@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+from sqlalchemy import text
+from models import db, Commit, CommitContent, Project, Repository
+from content_backfill import backfill_commit_contents, has_legacy_content_column
+
+def _legacy_schema_with_commits(contents):
+    # Схема до переноса diff: колонка commits.commit_content, таблицы commit_contents еще нет
+    db.session.execute(text("ALTER TABLE commits ADD COLUMN commit_content TEXT"))
+    CommitContent.__table__.drop(db.engine)
+    db.session.add(Project(key='PRJ', name='PRJ'))
+    db.session.add(Repository(id=1, name='repo', project_key='PRJ'))
+    for index, content in enumerate(contents):
+        db.session.add(Commit(sha=f"{index:040d}", message='m', author_name='a', commit_date=datetime.now(timezone.utc),
+                              repository_id=1, project_key='PRJ'))
+    db.session.flush()
+    for index, content in enumerate(contents):
+        db.session.execute(text("UPDATE commits SET commit_content = :content WHERE sha = :sha"),
+                           {'content': content, 'sha': f"{index:040d}"})
+    db.session.commit()
+
+def test_backfill_copies_legacy_diffs_in_batches(app):
+    _legacy_schema_with_commits(['diff один', None, 'diff три'])
+    assert backfill_commit_contents(batch_size=1) == 2
+    assert db.session.get(CommitContent, f"{0:040d}").text == 'diff один'
+    assert db.session.get(CommitContent, f"{1:040d}") is None
+    assert db.session.get(Commit, f"{2:040d}").commit_content == 'diff три'
+    # Повторный запуск ничего не дублирует
+    assert backfill_commit_contents() == 0
+    assert has_legacy_content_column()
+
+def test_backfill_can_drop_the_legacy_column(app):
+    _legacy_schema_with_commits(['diff'])
+    assert backfill_commit_contents(drop_column=True) == 1
+    assert not has_legacy_content_column()
+    assert backfill_commit_contents() == 0
@@ -0,0 +1,99 @@
+from diff_parser import parse_diff
+
+def _by_path(changes):
+    return {change.path: (change.added_lines, change.deleted_lines) for change in changes}
+
+def test_git_diff_with_several_files():
+    diff = """diff --git a/src/app.py b/src/app.py
+index 1111111..2222222 100644
+--- a/src/app.py
++++ b/src/app.py
+@@ -1,3 +1,4 @@
+ import os
+-import sys
++import json
++import re
+ print(os)
+diff --git a/web/index.ts b/web/index.ts
+--- a/web/index.ts
++++ b/web/index.ts
+@@ -10,2 +10,2 @@ export function main() {
+-  run(1)
++  run(2)
+   done()
+"""
+    assert _by_path(parse_diff(diff)) == {'src/app.py': (2, 1), 'web/index.ts': (1, 1)}
+
+def test_new_deleted_and_renamed_files():
+    diff = """diff --git a/new.py b/new.py
+new file mode 100644
+--- /dev/null
++++ b/new.py
+@@ -0,0 +1,2 @@
++a = 1
++b = 2
+diff --git a/old.py b/old.py
+deleted file mode 100644
+--- a/old.py
++++ /dev/null
+@@ -1 +0,0 @@
+-gone = True
+diff --git a/before.py b/after.py
+similarity index 90%
+rename from before.py
+rename to after.py
+--- a/before.py
++++ b/after.py
+@@ -1 +1 @@
+-x = 1
++x = 2
+"""
+    assert _by_path(parse_diff(diff)) == {'new.py': (2, 0), 'old.py': (0, 1), 'after.py': (1, 1)}
+
+def test_lines_that_look_like_headers_inside_a_hunk():
+    diff = """diff --git a/schema.sql b/schema.sql
+--- a/schema.sql
++++ b/schema.sql
+@@ -1,2 +1,2 @@
+--- old comment
++++ new comment
+ select 1;
+"""
+    assert _by_path(parse_diff(diff)) == {'schema.sql': (1, 1)}
+
+def test_plain_unified_diff_without_git_headers():
+    diff = """--- a/one.py
++++ b/one.py
+@@ -1,2 +1,2 @@
+-x
++y
+ z
+--- a/two.py
++++ b/two.py
+@@ -1 +1 @@
+-a
++b
+\\ No newline at end of file
+"""
+    assert _by_path(parse_diff(diff)) == {'one.py': (1, 1), 'two.py': (1, 1)}
+
+def test_quoted_paths_with_spaces_and_extension_filter():
+    diff = """diff --git "a/docs/read me.md" "b/docs/read me.md"
+--- "a/docs/read me.md"
++++ "b/docs/read me.md"
+@@ -1 +1,2 @@
+ title
++text
+diff --git a/lib/util.py b/lib/util.py
+--- a/lib/util.py
++++ b/lib/util.py
+@@ -1 +1 @@
+-a
++b
+"""
+    assert _by_path(parse_diff(diff)) == {'docs/read me.md': (1, 0), 'lib/util.py': (1, 1)}
+    assert _by_path(parse_diff(diff, {'.py'})) == {'lib/util.py': (1, 1)}
+
+def test_empty_diff():
+    assert parse_diff('') == []
+    assert parse_diff(None) == []
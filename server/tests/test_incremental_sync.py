@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+import data_collector
+from models import db, Commit, SyncState
+from tests.fake_sfera import FakeSfera, linear_history, make_commit
+
+NOW = datetime.now(timezone.utc)
+
+@pytest.fixture
+def sfera(app, monkeypatch):
+    fake = FakeSfera({'main': linear_history('a', 48, newest=NOW - timedelta(minutes=5))}, page_size=10)
+    monkeypatch.setattr(data_collector.Config, 'COLLECTOR_PAGE_SIZE', 10)
+    monkeypatch.setattr(data_collector, 'SferaAPI', lambda username, password: fake)
+    return fake
+
+def collect(since, until, sync_mode='incremental', branch='main'):
+    message = data_collector.collect_data_for_target(
+        'user', 'password', 'PRJ', 'repo', branch, since.isoformat(), until.isoformat(),
+        sync_mode=sync_mode, ingestion_mode='threads',
+    )
+    db.session.remove()
+    return message
+
+def saved_shas():
+    return {sha for (sha,) in db.session.query(Commit.sha)}
+
+def test_backfill_of_closed_window_does_not_move_watermark(sfera):
+    collect(NOW - timedelta(days=2), NOW - timedelta(hours=24))
+    assert db.session.get(SyncState, ('PRJ', 'repo', 'main')) is None
+
+    # Коммиты после until прошлого окна должны загрузиться инкрементальным запуском
+    collect(NOW - timedelta(days=2), NOW + timedelta(hours=1))
+    assert saved_shas() == {c['hash'] for c in sfera.branches['main']}
+
+def test_incremental_run_stops_at_watermark_when_since_is_covered(sfera):
+    collect(NOW - timedelta(days=3), NOW + timedelta(hours=1))
+    state = db.session.get(SyncState, ('PRJ', 'repo', 'main'))
+    assert state.last_commit_sha == 'a0000'
+
+    sfera.branches['main'].insert(0, make_commit('b0000', NOW - timedelta(minutes=1)))
+    sfera.requests.clear()
+    collect(NOW - timedelta(days=3), NOW + timedelta(hours=1))
+    assert 'b0000' in saved_shas()
+    assert len(sfera.requested('details')) == 1
+    # Первая страница содержит новый коммит, вторая целиком из синхронизированной истории
+    assert len(sfera.requested('commits')) == 2
+    assert db.session.get(SyncState, ('PRJ', 'repo', 'main')).last_commit_sha == 'b0000'
+
+def test_earlier_since_walks_history_past_watermark(sfera):
+    collect(NOW - timedelta(hours=10), NOW + timedelta(hours=1))
+    assert len(saved_shas()) == 10
+
+    collect(NOW - timedelta(days=3), NOW + timedelta(hours=1))
+    assert saved_shas() == {c['hash'] for c in sfera.branches['main']}
+    state = db.session.get(SyncState, ('PRJ', 'repo', 'main'))
+    assert state.synced_since.replace(tzinfo=timezone.utc) <= NOW - timedelta(days=3) + timedelta(seconds=1)
+
+def test_legacy_watermark_without_coverage_is_not_trusted(sfera):
+    db.session.add(SyncState(project_key='PRJ', repo_name='repo', branch='main', last_commit_sha='a0002'))
+    db.session.commit()
+    collect(NOW - timedelta(days=3), NOW + timedelta(hours=1))
+    assert saved_shas() == {c['hash'] for c in sfera.branches['main']}
+
+@pytest.mark.parametrize('autostart', [False, True])
+def test_analysis_worker_follows_autostart_setting(sfera, monkeypatch, autostart):
+    started = []
+    monkeypatch.setattr(data_collector.Config, 'LLM_ANALYSIS_AUTOSTART', autostart)
+    monkeypatch.setattr(data_collector, 'start_analysis_worker', started.append)
+    collect(NOW - timedelta(days=3), NOW + timedelta(hours=1), sync_mode='full')
+    assert saved_shas() == {c['hash'] for c in sfera.branches['main']}
+    assert bool(started) == autostart
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import kpi_calculator
+from kpi_calculator import (
+    calculate_deterministic_kpi, calculate_deterministic_kpi_array,
+    calculate_final_score, calculate_final_score_array,
+)
+
+def _scalar(added, deleted, llm_sums):
+    kpis = [calculate_deterministic_kpi(int(a), int(d)) for a, d in zip(added, deleted)]
+    scores = [calculate_final_score(kpi, {"sum": int(s)}) for kpi, s in zip(kpis, llm_sums)]
+    return kpis, scores
+
+def _assert_equivalent(added, deleted, llm_sums):
+    kpis, scores = _scalar(added, deleted, llm_sums)
+    difficulty, quality, size = calculate_deterministic_kpi_array(added, deleted)
+    assert difficulty.tolist() == [kpi["difficulty"] for kpi in kpis]
+    assert quality.tolist() == [kpi["quality"] for kpi in kpis]
+    assert size.tolist() == [kpi["size"] for kpi in kpis]
+    assert calculate_final_score_array(added, deleted, llm_sums).tolist() == scores
+
+def test_limit_is_where_kpi_saturates():
+    limit = kpi_calculator.KPI_LINES_LIMIT
+    assert kpi_calculator.KPI_SATURATED
+    saturated = kpi_calculator._kpi_signature(limit)
+    assert kpi_calculator._kpi_signature(limit - 1) != saturated
+    assert all(kpi_calculator._kpi_signature(n) == saturated for n in (limit + 1, 10 * limit, 10 ** 9))
+
+def test_edge_inputs_match_scalar():
+    limit = kpi_calculator.KPI_LINES_LIMIT
+    lines = [0, 1, 10, 11, 20, 21, 50, 51, 80, 81, limit - 1, limit, limit + 1, 10 * limit, 10 ** 7]
+    added = np.array(lines * 4)
+    deleted = np.array([0] * len(lines) + [1] * len(lines) + [5] * len(lines) + [0] * len(lines))
+    llm_sums = np.array([0] * len(lines) + [kpi_calculator.LLM_SUM_LIMIT] * len(lines) + [-3] * len(lines) + [120] * len(lines))
+    _assert_equivalent(added, deleted, llm_sums)
+
+def test_random_inputs_match_scalar():
+    rng = np.random.default_rng(20240601)
+    size = 20000
+    added = np.concatenate([rng.integers(0, 400, size), rng.integers(0, 10 ** 6, size // 10)])
+    deleted = np.concatenate([rng.integers(0, 400, size), rng.integers(0, 10 ** 6, size // 10)])
+    llm_sums = rng.integers(-10, 100, len(added))
+    _assert_equivalent(added, deleted, llm_sums)
+
+def test_search_follows_formula_changes(monkeypatch):
+    def slower_kpi(added_lines, deleted_lines):
+        lines = added_lines + deleted_lines
+        return {"difficulty": round(min(lines * 0.01, 5), 2), "quality": 1, "size": 1}
+
+    monkeypatch.setattr(kpi_calculator, "calculate_deterministic_kpi", slower_kpi)
+    assert kpi_calculator._find_saturation() == 500
+
+def test_search_reports_missing_saturation(monkeypatch):
+    monkeypatch.setattr(kpi_calculator, "calculate_deterministic_kpi",
+                        lambda added, deleted: {"difficulty": added + deleted, "quality": 1, "size": 1})
+    assert kpi_calculator._find_saturation(max_lines=1 << 12) is None
+
+@pytest.mark.parametrize("lines", [0, 5000, 10 ** 6])
+def test_unsaturated_formula_falls_back_to_scalar(monkeypatch, lines):
+    def growing_kpi(added_lines, deleted_lines):
+        total = added_lines + deleted_lines
+        return {"difficulty": round(total * 0.001, 2), "quality": 1, "size": 1}
+
+    monkeypatch.setattr(kpi_calculator, "calculate_deterministic_kpi", growing_kpi)
+    monkeypatch.setattr(kpi_calculator, "KPI_SATURATED", False)
+    monkeypatch.setattr(kpi_calculator, "KPI_LINES_LIMIT", 4096)
+    for name, table in zip(("_DIFFICULTY", "_QUALITY", "_SIZE", "_FINAL"), kpi_calculator._build_tables()):
+        monkeypatch.setattr(kpi_calculator, name, table)
+    difficulty, _, _ = calculate_deterministic_kpi_array(np.array([lines]), np.array([0]))
+    assert difficulty.tolist() == [growing_kpi(lines, 0)["difficulty"]]
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+import analysis_queue
+import data_collector
+import llm_analyzer
+import llm_cache
+from llm_cache import evaluation_cache_key, normalize_diff
+from models import db, AnalysisJob
+from tests.fake_sfera import FakeSfera, linear_history
+
+DIFF = """diff --git a/app/main.py b/app/main.py
+index 1a2b3c4..5d6e7f8 100644
+--- a/app/main.py
++++ b/app/main.py
+@@ -10,3 +10,4 @@ def main():
+     run()
+-    stop()
++    shutdown()
++    cleanup()
+"""
+
+def test_index_line_and_hunk_positions_do_not_change_key():
+    cherry_pick = DIFF.replace('index 1a2b3c4..5d6e7f8', 'index 9999999..8888888').replace('@@ -10,3 +10,4 @@', '@@ -42,3 +45,4 @@')
+    assert evaluation_cache_key(cherry_pick, 'Fix shutdown') == evaluation_cache_key(DIFF, 'Fix shutdown')
+
+def test_line_endings_and_trailing_spaces_do_not_change_key():
+    windows = DIFF.replace('\n', '   \r\n')
+    assert normalize_diff(windows) == normalize_diff(DIFF)
+
+def test_revert_has_its_own_key():
+    revert = DIFF.replace('-    stop()', '+    stop()').replace('+    shutdown()', '-    shutdown()').replace('+    cleanup()', '-    cleanup()')
+    assert evaluation_cache_key(revert, 'Fix shutdown') != evaluation_cache_key(DIFF, 'Fix shutdown')
+
+def test_message_is_part_of_key():
+    assert evaluation_cache_key(DIFF, 'Fix shutdown') != evaluation_cache_key(DIFF, 'Refactor')
+    assert evaluation_cache_key(DIFF, ' Fix shutdown\n') == evaluation_cache_key(DIFF, 'Fix shutdown')
+    assert evaluation_cache_key(DIFF, None) == evaluation_cache_key(DIFF, '')
+
+def test_each_collected_commit_is_counted_once(app, monkeypatch):
+    now = datetime.now(timezone.utc)
+    fake = FakeSfera({'main': linear_history('c', 12, newest=now - timedelta(minutes=5))})
+    monkeypatch.setattr(data_collector, 'SferaAPI', lambda username, password: fake)
+    monkeypatch.setattr(data_collector, 'start_analysis_worker', lambda app: False)
+    monkeypatch.setattr(llm_analyzer, 'giga', object())
+    monkeypatch.setattr(llm_analyzer, 'analyze_commit_code', lambda diff, message: {
+        'scores': {'size': 5, 'quality': 5, 'complexity': 5, 'comment': 5, 'sum': 20}, 'raw_text': 'ok',
+    })
+    before = llm_cache.cache_stats()
+
+    data_collector.collect_data_for_target(
+        'user', 'password', 'PRJ', 'repo', 'main', (now - timedelta(days=1)).isoformat(), (now + timedelta(hours=1)).isoformat(),
+        ingestion_mode='threads',
+    )
+    analysis_queue.drain_pending_analyses(app, max_workers=2)
+
+    after = llm_cache.cache_stats()
+    assert (after['hits'] - before['hits'], after['misses'] - before['misses']) == (0, 12)
+    with app.app_context():
+        assert {job.status for job in db.session.query(AnalysisJob)} == {'done'}
@@ -0,0 +1,24 @@
+import pytest
+
+from config import Config
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_TOKEN', 'секрет-metrics')
+    return Config.METRICS_TOKEN
+
+def test_static_token_is_accepted(client, metrics_token):
+    response = client.get('/api/admin/metrics', headers={'Authorization': 'Bearer секрет-metrics'.encode('utf-8').decode('latin-1')})
+    assert response.status_code == 200
+
+@pytest.mark.parametrize('header', ['Bearer wrong', 'Bearer ÿé-non-ascii', 'Basic ×'])
+def test_wrong_token_is_rejected_without_error(client, metrics_token, header):
+    response = client.get('/api/admin/metrics', headers={'Authorization': header})
+    assert 400 <= response.status_code < 500
+
+def test_jwt_is_accepted_with_static_token_configured(client, metrics_token, auth_headers):
+    assert client.get('/api/admin/metrics', headers=auth_headers).status_code == 200
+
+def test_jwt_is_required_without_static_token(client, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_TOKEN', None)
+    assert client.get('/api/admin/metrics').status_code == 401
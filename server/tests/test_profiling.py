@@ -0,0 +1,60 @@
+import logging
+import pytest
+from flask import Flask, Response, jsonify, stream_with_context
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+
+import profiling
+from config import Config
+
+@pytest.fixture
+def profiled_client(monkeypatch):
+    # Отдельное приложение: основное уже обработало запросы, и хуки к нему добавить нельзя
+    monkeypatch.setattr(Config, 'PROFILING_ENABLED', True)
+    monkeypatch.setattr(Config, 'PROFILING_SAMPLE_RATE', 0)
+    monkeypatch.setattr(Config, 'PROFILING_SLOW_REQUEST_MS', 0)
+    engine = create_engine('sqlite://')
+    app = Flask(__name__)
+
+    def query(count):
+        with engine.connect() as conn:
+            for _ in range(count):
+                conn.execute(text('SELECT 1'))
+
+    @app.route('/profiling-test/plain')
+    def plain():
+        query(2)
+        return jsonify({'ok': True})
+
+    @app.route('/profiling-test/stream')
+    def stream():
+        def generate():
+            for index in range(3):
+                query(1)
+                yield f"{index}\n"
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    profiling.init_profiling(app)
+    yield app.test_client()
+    event.remove(Engine, 'before_cursor_execute', profiling._before_cursor_execute)
+    event.remove(Engine, 'after_cursor_execute', profiling._after_cursor_execute)
+
+def _sql_statements(route):
+    counts, total = profiling.HTTP_REQUEST_SQL_STATEMENTS._values[(route,)]
+    return sum(counts), total
+
+def test_plain_response_reports_sql_in_server_timing(profiled_client):
+    response = profiled_client.get('/profiling-test/plain')
+    assert 'desc="2 queries"' in response.headers['Server-Timing']
+    assert _sql_statements('/profiling-test/plain') == (1, 2)
+
+def test_streamed_response_is_measured_when_closed(profiled_client, caplog):
+    caplog.set_level(logging.WARNING, logger='profiling')
+    response = profiled_client.get('/profiling-test/stream')
+    assert 'queries' not in response.headers['Server-Timing']
+    assert ('/profiling-test/stream',) not in profiling.HTTP_REQUEST_SQL_STATEMENTS._values
+
+    assert response.get_data(as_text=True) == "0\n1\n2\n"
+    response.close()
+    assert _sql_statements('/profiling-test/stream') == (1, 3)
+    assert any('/profiling-test/stream' in message and 'SQL-запросов 3' in message for message in caplog.messages)
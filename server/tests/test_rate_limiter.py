@@ -0,0 +1,50 @@
+import time
+import pytest
+from sfera_api import AdaptiveRateLimiter, backoff_delay, parse_retry_after
+
+def test_throttle_halves_rate_and_blocks_for_retry_after():
+    limiter = AdaptiveRateLimiter(rate=20, max_rate=100)
+    limiter.on_throttle(2.0)
+    assert limiter.rate == 10
+    wait = limiter.reserve()
+    assert 1.5 < wait <= 2.0
+
+def test_throttle_does_not_go_below_min_rate():
+    limiter = AdaptiveRateLimiter(rate=1, max_rate=100, min_rate=0.5)
+    for _ in range(5):
+        limiter.on_throttle(None)
+    assert limiter.rate == 0.5
+    assert limiter.blocked_until == 0.0
+
+def test_stable_latency_increases_rate_up_to_max():
+    limiter = AdaptiveRateLimiter(rate=10, max_rate=12)
+    for _ in range(10):
+        limiter.on_response(0.05)
+    assert limiter.rate == 12
+
+def test_latency_spike_decreases_rate_once_per_response_time():
+    limiter = AdaptiveRateLimiter(rate=10, max_rate=100)
+    limiter.on_response(0.01)
+    for _ in range(20):
+        limiter.on_response(1.0)
+    # Между снижениями должно пройти не меньше средней задержки, поэтому пачка медленных ответов снижает темп один раз
+    assert limiter.rate == pytest.approx(10.5 * 0.9)
+
+def test_reserve_spends_tokens_then_asks_to_wait():
+    limiter = AdaptiveRateLimiter(rate=2, max_rate=2)
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == 0.0
+    wait = limiter.reserve()
+    assert 0 < wait <= 0.5
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after('-1') == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('garbage') is None
+    http_date = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(time.time() + 30))
+    assert 25 < parse_retry_after(http_date) <= 30
+
+def test_backoff_respects_retry_after_and_cap():
+    assert backoff_delay(0, retry_after=5) >= 5
+    assert backoff_delay(30) <= 60
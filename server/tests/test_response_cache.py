@@ -0,0 +1,50 @@
+import pytest
+import response_cache
+
+URL = '/api/metrics/hotspots'
+
+@pytest.fixture
+def epoch(monkeypatch):
+    current = {'value': 1000}
+    monkeypatch.setattr(response_cache, '_ttl_epoch', lambda: current['value'])
+    return current
+
+def test_parameter_order_and_empty_values_share_cache_entry(client, auth_headers, count_queries, epoch):
+    client.get(f"{URL}?project_key=PRJ&author_email=a@b.c", headers=auth_headers)
+    with count_queries() as counter:
+        response = client.get(f"{URL}?author_email=a@b.c&repo_name=&project_key=PRJ", headers=auth_headers)
+    assert response.status_code == 200
+    assert counter.count == 0
+
+def test_matching_etag_returns_304_without_running_the_view(client, auth_headers, count_queries, epoch):
+    first = client.get(f"{URL}?project_key=PRJ", headers=auth_headers)
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    response_cache.response_cache.clear()
+    with count_queries() as counter:
+        response = client.get(f"{URL}?project_key=PRJ", headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert counter.count == 0
+
+def test_etag_changes_with_generation(client, auth_headers, epoch):
+    etag = client.get(URL, headers=auth_headers).headers['ETag']
+    response_cache.bump_generation()
+    response = client.get(URL, headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_etag_expires_with_ttl_interval(client, auth_headers, count_queries, epoch):
+    # Данные, измененные другим процессом, не меняют поколение этого процесса: ETag обязан устареть по TTL
+    etag = client.get(URL, headers=auth_headers).headers['ETag']
+    assert client.get(URL, headers={**auth_headers, 'If-None-Match': etag}).status_code == 304
+    epoch['value'] += 1
+    with count_queries() as counter:
+        response = client.get(URL, headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert counter.count > 0
+
+def test_ttl_epoch_uses_configured_ttl(monkeypatch):
+    monkeypatch.setattr(response_cache.Config, 'RESPONSE_CACHE_TTL', 300)
+    monkeypatch.setattr(response_cache.time, 'time', lambda: 1200.0)
+    assert response_cache._ttl_epoch() == 4
@@ -0,0 +1,111 @@
+from datetime import datetime, time, timedelta, timezone
+import pytest
+from models import db, Commit, Project, Repository
+from authors import resolve_author_ids
+from rollups import REPORT_TZ, add_commits_to_rollups, time_bucket, totals_by_author
+
+START = datetime(2026, 9, 20, 0, 7, tzinfo=timezone.utc)
+AUTHORS = ['ann@example.com', 'bob@example.com', 'cat@example.com']
+
+@pytest.fixture
+def commits(app):
+    db.session.add(Project(key='PRJ', name='PRJ'))
+    db.session.add_all([Repository(id=1, name='api', project_key='PRJ'), Repository(id=2, name='web', project_key='PRJ')])
+    author_ids = resolve_author_ids({email: email.split('@')[0] for email in AUTHORS})
+    rows = []
+    # Коммит каждые 37 минут в течение 8 суток: попадают на все часы и на границы суток отчетного пояса
+    for index in range(8 * 24 * 60 // 37):
+        commit_date = START + timedelta(minutes=37 * index)
+        email = AUTHORS[index % len(AUTHORS)]
+        rows.append({
+            'sha': f"{index:040x}", 'message': f"commit {index}", 'author_name': email.split('@')[0], 'author_email': email,
+            'author_id': author_ids[email], 'commit_date': commit_date, 'time_bucket': time_bucket(commit_date),
+            'added_lines': index % 17, 'deleted_lines': index % 5, 'repository_id': 1 + index % 2, 'project_key': 'PRJ',
+            'final_commit_score': None if index % 4 == 0 else float(index % 9),
+        })
+    db.session.execute(Commit.__table__.insert(), rows)
+    add_commits_to_rollups(rows)
+    db.session.commit()
+    return rows
+
+def _raw_totals(rows, since=None, until=None, repository_id=None):
+    totals = {}
+    for row in rows:
+        if since and row['commit_date'] < since or until and row['commit_date'] > until:
+            continue
+        if repository_id and row['repository_id'] != repository_id:
+            continue
+        entry = totals.setdefault(row['author_id'], {
+            'commit_count': 0, 'added_lines': 0, 'deleted_lines': 0, 'score_sum': 0.0, 'score_count': 0, 'last_commit_at': None,
+        })
+        entry['commit_count'] += 1
+        entry['added_lines'] += row['added_lines']
+        entry['deleted_lines'] += row['deleted_lines']
+        if row['final_commit_score'] is not None:
+            entry['score_sum'] += row['final_commit_score']
+            entry['score_count'] += 1
+        entry['last_commit_at'] = max(filter(None, [entry['last_commit_at'], row['commit_date']]))
+    return totals
+
+def _assert_totals_match(args, expected):
+    assert expected
+    actual = totals_by_author(args)
+    assert set(actual) == set(expected)
+    for author_id, entry in expected.items():
+        for key in ('commit_count', 'added_lines', 'deleted_lines', 'score_count', 'last_commit_at'):
+            assert actual[author_id][key] == entry[key], (author_id, key)
+        assert actual[author_id]['score_sum'] == pytest.approx(entry['score_sum'])
+
+def _local_day(day, end=False):
+    value = datetime.combine(day, time(23, 59, 59, 999000) if end else time.min, REPORT_TZ)
+    return value.astimezone(timezone.utc)
+
+RANGES = {
+    # Меньше суток и через полночь по Москве: ни одних целых суток, только коммиты
+    'sub_day': (datetime(2026, 9, 25, 18, 23, 56, tzinfo=timezone.utc), datetime(2026, 9, 26, 2, 23, 56, tzinfo=timezone.utc)),
+    # Края периода - неполные сутки, середина из агрегатов
+    'partial_days': (datetime(2026, 9, 21, 9, 30, tzinfo=timezone.utc), datetime(2026, 9, 25, 14, 45, tzinfo=timezone.utc)),
+    # Целые сутки, как их передает фронтенд
+    'whole_days': (_local_day(datetime(2026, 9, 22).date()), _local_day(datetime(2026, 9, 24).date(), end=True)),
+    'open_start': (None, datetime(2026, 9, 23, 12, 0, tzinfo=timezone.utc)),
+    'open_end': (datetime(2026, 9, 23, 12, 0, tzinfo=timezone.utc), None),
+    'unbounded': (None, None),
+}
+
+def _args(since, until, **extra):
+    args = {'project_key': 'PRJ', **extra}
+    if since:
+        args['since'] = since.isoformat()
+    if until:
+        args['until'] = until.isoformat()
+    return args
+
+@pytest.mark.parametrize('name', RANGES)
+def test_totals_match_raw_aggregation(commits, name):
+    since, until = RANGES[name]
+    _assert_totals_match(_args(since, until), _raw_totals(commits, since, until))
+
+@pytest.mark.parametrize('name', ['sub_day', 'partial_days', 'whole_days'])
+def test_totals_for_repository_match_raw_aggregation(commits, name):
+    since, until = RANGES[name]
+    _assert_totals_match(_args(since, until, repo_name='web'), _raw_totals(commits, since, until, repository_id=2))
+
+@pytest.mark.parametrize('name', RANGES)
+def test_dashboard_stats_uses_one_query(client, auth_headers, count_queries, commits, name):
+    since, until = RANGES[name]
+    with count_queries() as counter:
+        response = client.get('/api/metrics/dashboard_stats', query_string=_args(since, until), headers=auth_headers)
+    assert response.status_code == 200
+    expected = _raw_totals(commits, since, until)
+    assert response.get_json()['summary']['total_commits'] == sum(entry['commit_count'] for entry in expected.values())
+    assert counter.count == 1
+
+def test_dashboard_stats_for_repository_uses_at_most_two_queries(client, auth_headers, count_queries, commits):
+    since, until = RANGES['partial_days']
+    with count_queries() as counter:
+        assert client.get('/api/metrics/dashboard_stats', query_string=_args(since, until, repo_name='api'), headers=auth_headers).status_code == 200
+    # Второй запрос - поиск id репозитория, дальше он берется из кэша процесса
+    assert counter.count == 2
+    with count_queries() as counter:
+        assert client.get('/api/metrics/dashboard_stats', query_string=_args(until=until, since=None, repo_name='api'), headers=auth_headers).status_code == 200
+    assert counter.count == 1